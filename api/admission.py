@@ -0,0 +1,255 @@
+"""
+Admission control and degraded logging for the prediction endpoints.
+
+`AdmissionController` caps the number of scoring requests running at once in a
+worker. A request over the limit waits in a bounded FIFO queue for at most
+`queue_timeout` seconds; when the queue is full or the wait expires it is
+answered 503 with a `Retry-After` header straight away, before its body is
+read. Latency then stays bounded by (limit + queue) x service time instead of
+growing with the backlog until clients time out.
+
+`CircuitBreaker` guards the prediction log writes. After `failure_threshold`
+consecutive failures (errors or writes slower than the timeout) it opens: the
+endpoints keep scoring but skip the database write (degraded mode) until
+`reset_timeout` has passed; then a single probe write is let through and
+closes the breaker again if it succeeds.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from starlette.responses import JSONResponse
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# Valeur de la jauge Prometheus par état
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class Overloaded(Exception):
+    """The request was not admitted (`reason`: queue_full or queue_timeout)."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("fut", "granted")
+
+    def __init__(self, fut: asyncio.Future):
+        self.fut = fut
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Concurrency limit plus bounded wait queue.
+
+    Safe across event loops (the test client runs each request on its own loop): waiters
+    are futures woken on their own loop. `max_concurrent=0` disables the limit.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int = 0,
+        queue_timeout: float = 1.0,
+        retry_after: float = 1.0,
+        wait_hist=None,
+    ):
+        if max_concurrent < 0 or max_queue < 0:
+            raise ValueError("max_concurrent and max_queue must be >= 0")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.wait_hist = wait_hist  # attente des requêtes passées par la file
+        self._lock = threading.Lock()
+        self._waiters: deque[_Waiter] = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the queue if needed; raises Overloaded when the request is shed."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.in_flight < self.max_concurrent and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.rejected["queue_full"] += 1
+                raise Overloaded("queue_full")
+            waiter = _Waiter(asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+            self.queued += 1
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.fut), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if waiter.granted:
+                    # Créneau transmis juste avant l'expiration: on le rend au suivant
+                    self.admitted -= 1
+                    self._release_locked()
+                else:
+                    self._waiters.remove(waiter)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.rejected["queue_timeout"] += 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Overloaded("queue_timeout") from None
+        finally:
+            if self.wait_hist is not None:
+                self.wait_hist.observe(time.perf_counter() - start)
+
+    def release(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._release_locked()
+
+    def _release_locked(self) -> None:
+        # Le créneau passe directement au plus ancien en attente (in_flight inchangé)
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.admitted += 1
+            waiter.fut.get_loop().call_soon_threadsafe(_wake, waiter.fut)
+        else:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queue_depth": len(self._waiters),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": dict(self.rejected),
+            }
+
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to the POST requests on `paths`.
+
+    Rejected requests get a 503 with `Retry-After` before their body is read. `router`
+    resolves their route, so that an outer MetricsMiddleware labels them like the others.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: frozenset, router=None, rejected=None):
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+        self.router = router
+        self.rejected = rejected  # compteur par raison
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire()
+        except Overloaded as e:
+            if self.rejected is not None:
+                self.rejected.inc(e.reason)
+            if self.router is not None:
+                scope["route"] = next((r for r in self.router.routes if getattr(r, "path", None) == scope["path"]), None)
+            response = overloaded_response(
+                "Server overloaded, retry later.", self.controller.retry_after, reason=e.reason
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+
+def overloaded_response(detail: str, retry_after: float, reason: Optional[str] = None) -> JSONResponse:
+    body = {"detail": detail}
+    if reason is not None:
+        body["reason"] = reason
+    return JSONResponse(body, status_code=503, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open probe -> closed)."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be >= 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """True if a write may be attempted (closed, or the single probe of a half-open breaker)."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state, self._failures, self._probing = CLOSED, 0, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                self._state, self._opened_at, self._probing = OPEN, self.clock(), False
+
+    def abort_probe(self) -> None:
+        """Release the probe of an attempt that ended with neither outcome (e.g. cancelled), so another one can run."""
+        with self._lock:
+            self._probing = False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe (0 when closed)."""
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self.clock() - self._opened_at))
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures, "opened": self.opened}
@@ -0,0 +1,136 @@
+"""
+Model artifacts loaded into shared memory.
+
+Uncompressed joblib artifacts can be opened with `mmap_mode="r"`: the NumPy
+arrays of the model are then mapped read-only from the file and shared between
+uvicorn/gunicorn workers through the page cache, instead of being copied into
+each process.
+
+Usage:
+    python -m api.artifacts export <source.pkl> <destination.pkl>
+    python -m api.artifacts schema <artifact.pkl> [...]
+
+`export` and `schema` also write `<artifact>.schema.json` (feature order), read
+by the API to start without loading the model. The file is generated here or
+when the image is built, never by the server.
+"""
+import argparse
+import mmap
+import os
+import resource
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+MODEL_MMAP = os.getenv("MODEL_MMAP", "1") == "1"
+
+
+def load_artifact(path: Path, mmap: bool = MODEL_MMAP) -> dict:
+    """Load a joblib artifact, memory-mapping its arrays read-only when possible."""
+    # Import différé: joblib (et sklearn au dépicklage) ne pèsent que sur le chargement du modèle
+    import joblib
+
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+
+def export_mmap_artifact(source: Path, destination: Path) -> Path:
+    """Rewrite an artifact (possibly compressed) as an uncompressed, mmap-able joblib file."""
+    import joblib
+
+    joblib.dump(joblib.load(source), destination, compress=0)
+    return Path(destination)
+
+
+def _iter_arrays(obj: Any, seen: set[int], depth: int = 0):
+    if id(obj) in seen or depth > 6:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        yield obj
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            yield from _iter_arrays(v, seen, depth + 1)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            yield from _iter_arrays(v, seen, depth + 1)
+    elif hasattr(obj, "__dict__"):
+        yield from _iter_arrays(vars(obj), seen, depth + 1)
+
+
+def _is_mapped(arr: Any) -> bool:
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+def array_footprint(*objs: Any) -> dict:
+    """Bytes held in NumPy arrays by the given objects, split between memory-mapped and private."""
+    mapped = private = 0
+    seen: set[int] = set()
+    for obj in objs:
+        for arr in _iter_arrays(obj, seen):
+            if _is_mapped(arr):
+                mapped += arr.nbytes
+            else:
+                private += arr.nbytes
+    return {"mapped_bytes": mapped, "private_bytes": private}
+
+
+def memory_report() -> dict:
+    """
+    Memory of the current worker process, in bytes.
+
+    `rss` counts shared pages in every process that maps them and `pss` splits
+    them between processes. `anon` is memory not backed by a file: memory-mapped
+    model arrays live in the page cache instead, so `anon` is what each extra
+    worker really costs. These are read from /proc on Linux; elsewhere only
+    `peak_rss`, the highest RSS since the process started, is reported.
+    """
+    report = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[-1] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+        report["rss"] = fields.get("Rss", 0)
+        report["pss"] = fields.get("Pss", 0)
+        report["private"] = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+        report["shared"] = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+        report["anon"] = fields.get("Anonymous", 0)
+    except OSError:
+        # ru_maxrss: pic et non valeur courante, en kilo-octets (octets sous macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["peak_rss"] = peak if sys.platform == "darwin" else peak * 1024
+    return report
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Rewrite an artifact as an uncompressed, mmap-able file.")
+    export.add_argument("source", type=Path)
+    export.add_argument("destination", type=Path)
+    schema = sub.add_parser("schema", help="Write the schema file (feature order) of joblib artifacts.")
+    schema.add_argument("artifacts", type=Path, nargs="+")
+    args = parser.parse_args(argv)
+
+    # Import différé: api.registry importe ce module
+    from api.registry import write_schema
+
+    if args.command == "export":
+        dst = export_mmap_artifact(args.source, args.destination)
+        print(f"Mmap-able artifact written to {dst}, schema to {write_schema(dst)}")
+    else:
+        for path in args.artifacts:
+            out = write_schema(path)
+            print(f"{path}: {out if out is not None else 'flat artifact, schema in its header'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Read access to the prediction log for audits.
+
+Listings are ordered by `(predicted_at, request_id)` descending and paginated
+with an opaque keyset cursor (the last row's sort key) instead of OFFSET, so
+that page N costs the same as page 1: with the composite indexes of
+`db/schema.sql` every page is one index range scan of `limit` rows plus a
+primary-key lookup of the matching request and of its feature vector.
+
+Requests and results share their timestamp (`requested_at == predicted_at`), and
+are joined on it as well, so each lookup only reads the matching monthly partition.
+A lookup by `request_id` alone cannot be pruned: it probes the primary-key index of
+every monthly partition, a cost that grows with the retention. Give it a
+`since`/`until` bound around the prediction time to read only the months in range.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import Select, and_, select, tuple_
+
+from api.db import feature_vectors, prediction_requests, prediction_results
+
+MAX_PAGE_SIZE = 1000
+STREAM_FETCH_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    """Cursor that was not produced by `encode_cursor`."""
+
+
+def encode_cursor(predicted_at: datetime, request_id: str) -> str:
+    raw = json.dumps([predicted_at.isoformat(), str(request_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, request_id = json.loads(raw)
+        return datetime.fromisoformat(ts), str(request_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def _columns(include_features: bool) -> list:
+    cols = [
+        prediction_results.c.request_id,
+        prediction_results.c.probability,
+        prediction_results.c.prediction,
+        prediction_results.c.threshold,
+        prediction_results.c.predicted_at,
+        prediction_results.c.cached,
+        prediction_results.c.model_version,
+        prediction_requests.c.requested_at,
+    ]
+    if include_features:
+        cols.append(feature_vectors.c.features)
+    return cols
+
+
+def _log_join(include_features: bool):
+    r, q = prediction_results.c, prediction_requests.c
+    joined = prediction_results.join(
+        prediction_requests, and_(q.request_id == r.request_id, q.requested_at == r.predicted_at)
+    )
+    if include_features:
+        # Vecteur archivé ou purgé: features à null plutôt que ligne perdue
+        joined = joined.outerjoin(feature_vectors, feature_vectors.c.features_hash == q.features_hash)
+    return joined
+
+
+def prediction_query(
+    request_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> Select:
+    """
+    One logged prediction (request joined with its result and its feature vector).
+
+    `since` (inclusive) and `until` (exclusive) bound the prediction time: they are
+    applied to the partition key of both tables so that only the matching months
+    are read. Without them every partition is probed.
+    """
+    r, q = prediction_results.c, prediction_requests.c
+    stmt = select(*_columns(True)).select_from(_log_join(True)).where(r.request_id == request_id)
+    # Bornes répétées sur les deux tables: l'élagage des partitions ne passe pas par la jointure
+    if since is not None:
+        stmt = stmt.where(r.predicted_at >= since, q.requested_at >= since)
+    if until is not None:
+        stmt = stmt.where(r.predicted_at < until, q.requested_at < until)
+    return stmt
+
+
+def list_query(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    prediction: Optional[int] = None,
+    min_probability: Optional[float] = None,
+    max_probability: Optional[float] = None,
+    model_version: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    include_features: bool = True,
+) -> Select:
+    """
+    Logged predictions, newest first, after `cursor` if given.
+
+    `since` is inclusive and `until` exclusive on `predicted_at`; the probability
+    band is inclusive on both ends.
+    """
+    r = prediction_results.c
+    stmt = select(*_columns(include_features)).select_from(_log_join(include_features))
+    if since is not None:
+        stmt = stmt.where(r.predicted_at >= since)
+    if until is not None:
+        stmt = stmt.where(r.predicted_at < until)
+    if prediction is not None:
+        stmt = stmt.where(r.prediction == prediction)
+    if min_probability is not None:
+        stmt = stmt.where(r.probability >= min_probability)
+    if max_probability is not None:
+        stmt = stmt.where(r.probability <= max_probability)
+    if model_version is not None:
+        stmt = stmt.where(r.model_version == model_version)
+    if cursor is not None:
+        ts, request_id = decode_cursor(cursor)
+        # Comparaison de tuples: parcours d'index à partir de la clé, sans OFFSET
+        stmt = stmt.where(tuple_(r.predicted_at, r.request_id) < tuple_(ts, request_id))
+    stmt = stmt.order_by(r.predicted_at.desc(), r.request_id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def row_to_item(row: Any, features_order: Sequence[str]) -> dict:
+    """
+    Plain dict of a result row (datetimes as ISO 8601 strings, UUIDs as str), with the
+    stored feature vector turned back into the `input_features` mapping.
+    """
+    # Clés en str natif: orjson refuse les sous-classes de str (quoted_name)
+    item = {str(k): v for k, v in row._mapping.items()}
+    item["request_id"] = str(item["request_id"])
+    if "features" in item:
+        features = item.pop("features")
+        item["input_features"] = dict(zip(features_order, features)) if features is not None else None
+    for key in ("predicted_at", "requested_at"):
+        if item.get(key) is not None:
+            item[key] = item[key].isoformat()
+    return item
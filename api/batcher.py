@@ -0,0 +1,125 @@
+"""
+Micro-batching of concurrent single-row predictions.
+
+Concurrent `/predict` calls hand their feature vector to a `MicroBatcher` and
+await a future. The batcher collects rows for at most `max_wait` seconds or
+`max_batch` rows, whichever comes first, scores them with one vectorized
+`predict_proba` call and resolves each caller's future with its own
+probability. Rows are collected on the event loop (no lock needed); the
+scoring itself runs in the threadpool, so a full batch does not stall the
+other requests of the worker. Pending rows and the flush timer are kept per
+event loop: a batcher outliving a loop (tests, worker restart) starts afresh
+on the next one.
+"""
+import asyncio
+import time
+import weakref
+from typing import Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from api.registry import LoadedModel
+
+
+class _LoopQueue:
+    """Rows waiting on one event loop, its flush timer and the batches being scored."""
+
+    __slots__ = ("pending", "timer", "tasks")
+
+    def __init__(self):
+        self.pending: list[tuple[LoadedModel, list, asyncio.Future, float]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: set[asyncio.Task] = set()
+
+
+class MicroBatcher:
+    def __init__(self, max_batch: int = 64, max_wait: float = 0.002, size_hist=None, wait_hist=None):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.size_hist = size_hist  # distribution des tailles de lot
+        self.wait_hist = wait_hist  # attente de chaque ligne avant scoring
+        self._queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopQueue]" = weakref.WeakKeyDictionary()
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, m: LoadedModel, values: list) -> float:
+        """Queue one row (in FEATURES_ORDER order) for model `m` and wait for its probability."""
+        loop = asyncio.get_running_loop()
+        q = self._queues.get(loop)
+        if q is None:
+            q = self._queues[loop] = _LoopQueue()
+        fut = loop.create_future()
+        q.pending.append((m, values, fut, time.perf_counter()))
+        if len(q.pending) >= self.max_batch:
+            self._flush(loop, q)
+        elif q.timer is None:
+            q.timer = loop.call_later(self.max_wait, self._flush, loop, q)
+        return await fut
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, q: _LoopQueue) -> None:
+        if q.timer is not None:
+            q.timer.cancel()
+            q.timer = None
+        pending, q.pending = q.pending, []
+        if not pending:
+            return
+        task = loop.create_task(self._score(pending))
+        q.tasks.add(task)  # référence forte jusqu'à la fin du scoring
+        task.add_done_callback(q.tasks.discard)
+
+    @staticmethod
+    def _predict(groups: list[list]) -> list:
+        """Probabilities of each group (or the exception it raised); runs in the threadpool."""
+        results = []
+        for items in groups:
+            m = items[0][0]
+            try:
+                X = np.array([v for _, v, _, _ in items], dtype=float, order="F")
+                results.append(m.predictor.predict_proba(X, copy=False).tolist())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _score(self, pending: list) -> None:
+        now = time.perf_counter()
+        # Un lot par version: une activation de modèle peut survenir pendant l'attente
+        by_model: dict[str, list] = {}
+        for item in pending:
+            by_model.setdefault(item[0].version, []).append(item)
+        groups = list(by_model.values())
+        try:
+            results = await run_in_threadpool(self._predict, groups)
+        except asyncio.CancelledError:
+            for _, _, fut, _ in pending:
+                fut.cancel()
+            raise
+
+        for items, probas in zip(groups, results):
+            if isinstance(probas, Exception):
+                for _, _, fut, _ in items:
+                    if not fut.done():
+                        fut.set_exception(probas)
+                continue
+
+            self.batches += 1
+            self.rows += len(items)
+            if self.size_hist is not None:
+                self.size_hist.observe(len(items))
+            for (_, _, fut, queued_at), p in zip(items, probas):
+                if self.wait_hist is not None:
+                    self.wait_hist.observe(now - queued_at)
+                if not fut.done():  # appelant annulé (client déconnecté)
+                    fut.set_result(p)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1e3,
+            "pending": sum(len(q.pending) for q in list(self._queues.values())),
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+        }
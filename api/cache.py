@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+
+def canonical_key(vector, model_version: str) -> bytes:
+    """
+    Hash of a feature vector (already in FEATURES_ORDER order) and the model version.
+
+    Values are canonicalized to float64 and -0.0 is folded into 0.0, so equal
+    inputs always give the same key whatever their JSON spelling (1, 1.0, -0.0...).
+    """
+    arr = np.asarray(vector, dtype=np.float64) + 0.0
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model_version.encode())
+    h.update(b"\0")
+    h.update(np.ascontiguousarray(arr).tobytes())
+    return h.digest()
+
+
+class PredictionCache:
+    """
+    Thread-safe in-process LRU cache with optional TTL.
+
+    Entries are bound to a model version: `bind_version` drops everything as soon
+    as a different model is served.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[bytes, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.model_version: Optional[str] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def bind_version(self, model_version: str) -> None:
+        """Invalidate the cache if the served model version changed."""
+        with self._lock:
+            if self.model_version is not None and model_version != self.model_version:
+                self._data.clear()
+                self.invalidations += 1
+            self.model_version = model_version
+
+    def get(self, key: bytes) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl is not None and self._clock() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: bytes, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (self._clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "model_version": self.model_version,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,130 @@
+"""
+Wire formats for high-volume clients.
+
+JSON is always available (orjson when installed, stdlib otherwise).
+MessagePack (`msgpack`) and Arrow IPC streams (`pyarrow`) are optional
+dependencies: when missing, the corresponding content type is answered with
+415 Unsupported Media Type instead of failing at import. pyarrow is only
+imported by the first Arrow request.
+"""
+import hashlib
+import importlib.util
+import json
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# pyarrow (bibliothèques natives lourdes) n'est importé qu'à la première requête Arrow
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+class UnsupportedMediaType(Exception):
+    """Content type unknown, or its optional codec is not installed."""
+
+
+def schema_hash(features_order: Iterable[str]) -> str:
+    """Short fingerprint of the ordered feature list (positional payloads must match it)."""
+    return hashlib.sha256("\n".join(features_order).encode("utf-8")).hexdigest()[:16]
+
+
+def media_type(header: Optional[str]) -> str:
+    """Normalized media type of a Content-Type / Accept item (parameters dropped)."""
+    if not header:
+        return JSON
+    mt = header.split(";", 1)[0].strip().lower()
+    return _ALIASES.get(mt, mt)
+
+
+def is_available(mt: str) -> bool:
+    if mt == JSON:
+        return True
+    if mt == MSGPACK:
+        return msgpack is not None
+    if mt == ARROW:
+        return HAS_PYARROW
+    return False
+
+
+def available_formats() -> list[str]:
+    return [mt for mt in (JSON, MSGPACK, ARROW) if is_available(mt)]
+
+
+def negotiate(accept: Optional[str], allowed: tuple[str, ...] = (JSON, MSGPACK)) -> str:
+    """First media type of the Accept header that is allowed and installed; JSON otherwise."""
+    for item in (accept or "").split(","):
+        mt = media_type(item)
+        if mt in allowed and is_available(mt):
+            return mt
+    return JSON
+
+
+def decode(body: bytes, content_type: Optional[str]) -> Any:
+    """Decode a JSON or MessagePack body. Raises UnsupportedMediaType or ValueError (malformed)."""
+    mt = media_type(content_type)
+    if mt == JSON:
+        try:
+            return orjson.loads(body) if orjson is not None else json.loads(body)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Malformed JSON body: {e}") from None
+    if mt == MSGPACK:
+        if msgpack is None:
+            raise UnsupportedMediaType("MessagePack support requires the `msgpack` package")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(f"Malformed MessagePack body: {e}") from None
+    raise UnsupportedMediaType(f"Unsupported content type: {mt}")
+
+
+def encode(obj: Any, mt: str) -> bytes:
+    """Encode a plain object (dicts, lists, str, numbers, None) as JSON or MessagePack."""
+    if mt == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def read_arrow(body: bytes) -> "pa.Table":
+    """Read an Arrow IPC stream into a Table. Raises UnsupportedMediaType or ValueError."""
+    if not HAS_PYARROW:
+        raise UnsupportedMediaType("Arrow support requires the `pyarrow` package")
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    try:
+        return pa.ipc.open_stream(body).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(f"Malformed Arrow IPC stream: {e}") from None
+
+
+def write_arrow(columns: dict[str, list], metadata: Optional[dict[str, str]] = None) -> bytes:
+    """Serialize columns (name -> values) as an Arrow IPC stream, with optional schema metadata."""
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    table = pa.table(columns, metadata=metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,330 @@
+"""
+Streaming drift monitor for live model inputs.
+
+Each prediction updates, per feature and in O(1), a count, a running mean and
+variance (Welford) and a fixed-bin histogram whose bins come from a reference
+profile computed once from the training CSV. The state of a worker is a few
+small arrays: it is checkpointed periodically to `drift_checkpoints` (one row
+per worker process) and compared to the reference with PSI and a binned
+Kolmogorov-Smirnov statistic, without ever scanning `prediction_requests`.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+
+from api.db import drift_checkpoints
+
+logger = logging.getLogger(__name__)
+
+# Au-delà, une feature est traitée comme continue (bins = déciles du dataset de référence)
+MAX_DISCRETE_VALUES = 20
+N_QUANTILE_BINS = 10
+PSI_EPS = 1e-4
+# Seuils usuels du PSI: < 0.1 stable, 0.1 - 0.25 modéré, > 0.25 significatif
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Checkpoint plus vieux que ce nombre d'intervalles: worker mort (crash, recyclage), ignoré à la fusion
+STALE_CHECKPOINT_INTERVALS = 3
+
+
+def _bin_edges(values: np.ndarray) -> np.ndarray:
+    """Inner bin edges: one bin per value for discrete features, deciles otherwise."""
+    uniques = np.unique(values)
+    if len(uniques) <= MAX_DISCRETE_VALUES:
+        return (uniques[:-1] + uniques[1:]) / 2
+    qs = np.quantile(values, np.linspace(0, 1, N_QUANTILE_BINS + 1)[1:-1])
+    return np.unique(qs)
+
+
+class ReferenceProfile:
+    """Per-feature reference statistics and bin layout (bins: (-inf, e0], (e0, e1], ..., (e_k, +inf))."""
+
+    def __init__(self, features_order: Sequence[str], X: np.ndarray):
+        self.features_order = list(features_order)
+        self.n = X.shape[0]
+        self.mean = X.mean(axis=0)
+        self.std = X.std(axis=0, ddof=1) if self.n > 1 else np.zeros(X.shape[1])
+        edges = [_bin_edges(X[:, j]) for j in range(X.shape[1])]
+        self.n_bins = np.array([len(e) + 1 for e in edges])
+        # Bords complétés à +inf pour un tableau rectangulaire (F, max_edges)
+        self.edges = np.full((X.shape[1], max(len(e) for e in edges) if edges else 0), np.inf)
+        for j, e in enumerate(edges):
+            self.edges[j, :len(e)] = e
+        self.counts = histogram_counts(self.edges, self.n_bins.max(), X)
+        self.fingerprint = hashlib.sha256(
+            json.dumps([self.features_order, self.edges.tolist()], default=str).encode()
+        ).hexdigest()[:16]
+
+    @classmethod
+    def from_csv(cls, path: Path, features_order: Sequence[str]) -> "ReferenceProfile":
+        with open(path, newline="", encoding="utf-8") as fh:
+            reader = csv.DictReader(fh)
+            X = np.array([[float(row[f]) for f in features_order] for row in reader], dtype=float)
+        return cls(features_order, X)
+
+
+def histogram_counts(edges: np.ndarray, n_cols: int, X: np.ndarray) -> np.ndarray:
+    """(F, n_cols) bin counts of the rows of X (n, F) for padded per-feature edges."""
+    # Indice de bin = nombre de bords strictement inférieurs à la valeur
+    idx = (X[:, :, None] > edges[None, :, :]).sum(axis=2)  # (n, F)
+    F = X.shape[1]
+    flat = (np.arange(F)[None, :] * n_cols + idx).ravel()
+    return np.bincount(flat, minlength=F * n_cols).reshape(F, n_cols)
+
+
+class DriftState:
+    """Mergeable running statistics: count, Welford mean / M2 and bin counts per feature."""
+
+    def __init__(self, n_features: int, n_cols: int):
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.counts = np.zeros((n_features, n_cols), dtype=np.int64)
+
+    def merge(self, n: int, mean: np.ndarray, m2: np.ndarray, counts: np.ndarray) -> None:
+        """Chan et al. parallel update: combine another state (or a batch) into this one."""
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.n * n / total)
+        self.n = total
+        self.counts += counts
+
+    def to_dict(self) -> dict:
+        return {"n": self.n, "mean": self.mean.tolist(), "m2": self.m2.tolist(), "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DriftState":
+        counts = np.asarray(d["counts"], dtype=np.int64)
+        state = cls(counts.shape[0], counts.shape[1])
+        state.merge(int(d["n"]), np.asarray(d["mean"], dtype=float), np.asarray(d["m2"], dtype=float), counts)
+        return state
+
+
+class DriftMonitor:
+    """
+    Thread-safe drift statistics of the inputs seen by this worker.
+
+    `observe` only appends the row to a small buffer; every `fold_size` rows (and
+    before any read) the buffer is merged into the state with one vectorized
+    Welford / histogram update, i.e. O(features) amortized per row and bounded
+    memory. `report` compares the current (optionally merged) state with the
+    reference profile.
+    """
+
+    def __init__(self, reference: ReferenceProfile, fold_size: int = 256):
+        self.reference = reference
+        self.n_cols = int(reference.n_bins.max())
+        self.state = DriftState(len(reference.features_order), self.n_cols)
+        self.fold_size = fold_size
+        self._buffer: list[Sequence[float]] = []
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def observe(self, values: Sequence[float]) -> None:
+        """Record one row (FEATURES_ORDER order); rows are folded into the state in vectorized blocks."""
+        with self._lock:
+            self._buffer.append(values)
+            self.dirty = True
+            if len(self._buffer) >= self.fold_size:
+                self._fold()
+
+    def observe_many(self, X: np.ndarray) -> None:
+        """Record a block of rows (n, features); the statistics are computed outside the lock."""
+        if X.shape[0] == 0:
+            return
+        block = self._block_stats(X)
+        with self._lock:
+            self.state.merge(*block)
+            self.dirty = True
+
+    def _block_stats(self, X: np.ndarray) -> tuple:
+        mean = X.mean(axis=0)
+        m2 = ((X - mean) ** 2).sum(axis=0)
+        return X.shape[0], mean, m2, histogram_counts(self.reference.edges, self.n_cols, X)
+
+    def _fold(self) -> None:
+        if self._buffer:
+            X = np.array(self._buffer, dtype=float)
+            self._buffer = []
+            self.state.merge(*self._block_stats(X))
+
+    def snapshot(self) -> DriftState:
+        with self._lock:
+            self._fold()
+            return DriftState.from_dict(self.state.to_dict())
+
+    def report(self, state: Optional[DriftState] = None) -> dict:
+        """Per-feature PSI, binned KS and mean shift (in reference std units) against the reference."""
+        state = state if state is not None else self.snapshot()
+        ref = self.reference
+        features = []
+        for j, name in enumerate(ref.features_order):
+            k = ref.n_bins[j]
+            p_ref = ref.counts[j, :k] / max(ref.n, 1)
+            entry = {
+                "feature": name,
+                "count": state.n,
+                "mean": float(state.mean[j]) if state.n else None,
+                "std": float(np.sqrt(state.m2[j] / (state.n - 1))) if state.n > 1 else None,
+                "reference_mean": float(ref.mean[j]),
+                "reference_std": float(ref.std[j]),
+                "mean_shift": None,
+                "psi": None,
+                "ks": None,
+                "status": "no_data",
+            }
+            if state.n:
+                p_cur = state.counts[j, :k] / state.n
+                a, b = np.clip(p_cur, PSI_EPS, None), np.clip(p_ref, PSI_EPS, None)
+                psi = float(np.sum((a - b) * np.log(a / b)))
+                entry["psi"] = psi
+                entry["ks"] = float(np.max(np.abs(np.cumsum(p_cur) - np.cumsum(p_ref))))
+                if ref.std[j] > 0:
+                    entry["mean_shift"] = float((state.mean[j] - ref.mean[j]) / ref.std[j])
+                entry["status"] = (
+                    "significant" if psi > PSI_SIGNIFICANT else "moderate" if psi > PSI_MODERATE else "stable"
+                )
+            features.append(entry)
+
+        psis = [f["psi"] for f in features if f["psi"] is not None]
+        return {
+            "n_observations": state.n,
+            "reference_rows": ref.n,
+            "reference_fingerprint": ref.fingerprint,
+            "max_psi": max(psis) if psis else None,
+            "n_drifting": sum(f["status"] == "significant" for f in features),
+            "features": sorted(features, key=lambda f: -(f["psi"] or 0)),
+        }
+
+
+def write_checkpoint(engine: Engine, monitor: DriftMonitor) -> None:
+    """Replace this worker's row of `drift_checkpoints` with its current state."""
+    state = monitor.snapshot()
+    with engine.begin() as conn:
+        conn.execute(delete(drift_checkpoints).where(drift_checkpoints.c.instance_id == monitor.instance_id))
+        conn.execute(insert(drift_checkpoints), {
+            "instance_id": monitor.instance_id,
+            "reference_fingerprint": monitor.reference.fingerprint,
+            "n_observations": state.n,
+            "state": state.to_dict(),
+            "updated_at": datetime.now(timezone.utc),
+        })
+
+
+def touch_checkpoint(engine: Engine, monitor: DriftMonitor) -> None:
+    """Refresh `updated_at` of this worker's row: an idle worker is still alive."""
+    with engine.begin() as conn:
+        conn.execute(
+            update(drift_checkpoints)
+            .where(drift_checkpoints.c.instance_id == monitor.instance_id)
+            .values(updated_at=datetime.now(timezone.utc))
+        )
+
+
+def delete_checkpoint(engine: Engine, monitor: DriftMonitor) -> None:
+    """Remove this worker's row (its statistics end with the process)."""
+    with engine.begin() as conn:
+        conn.execute(delete(drift_checkpoints).where(drift_checkpoints.c.instance_id == monitor.instance_id))
+
+
+def merged_state(engine: Engine, monitor: DriftMonitor, max_age: Optional[float] = None) -> DriftState:
+    """
+    Live state of this worker merged with the checkpoints of the other workers (same reference).
+
+    With `max_age`, rows not refreshed for that many seconds are skipped: they belong to
+    processes that died without removing their row.
+    """
+    state = monitor.snapshot()
+    query = select(drift_checkpoints.c.state).where(
+        drift_checkpoints.c.reference_fingerprint == monitor.reference.fingerprint,
+        drift_checkpoints.c.instance_id != monitor.instance_id,
+    )
+    if max_age is not None:
+        query = query.where(
+            drift_checkpoints.c.updated_at >= datetime.now(timezone.utc) - timedelta(seconds=max_age)
+        )
+    with engine.connect() as conn:
+        rows = conn.execute(query).scalars().all()
+    for d in rows:
+        other = DriftState.from_dict(d)
+        state.merge(other.n, other.mean, other.m2, other.counts)
+    return state
+
+
+class DriftCheckpointer:
+    """
+    Background thread writing the monitor state every `interval` seconds (only when it changed).
+
+    `touch` refreshes the row of an idle worker instead, so that it does not look stale;
+    `remove` deletes the row on stop instead of writing a last checkpoint.
+    """
+
+    def __init__(
+        self,
+        monitor: DriftMonitor,
+        write: Callable[[DriftMonitor], None],
+        interval: float = 60.0,
+        touch: Optional[Callable[[DriftMonitor], None]] = None,
+        remove: Optional[Callable[[DriftMonitor], None]] = None,
+    ):
+        self.monitor = monitor
+        self.write = write
+        self.interval = interval
+        self.touch = touch
+        self.remove = remove
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="drift-checkpointer", daemon=True)
+            self._thread.start()
+
+    def checkpoint(self) -> bool:
+        if not self.monitor.dirty:
+            if self.touch is not None:
+                try:
+                    self.touch(self.monitor)
+                except Exception:
+                    logger.exception("Drift checkpoint refresh failed")
+            return False
+        self.monitor.dirty = False
+        try:
+            self.write(self.monitor)
+            return True
+        except Exception:
+            self.monitor.dirty = True
+            logger.exception("Drift checkpoint failed")
+            return False
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.checkpoint()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.remove is None:
+            self.checkpoint()
+            return
+        try:
+            self.remove(self.monitor)
+        except Exception:
+            logger.exception("Drift checkpoint removal failed")
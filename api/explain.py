@@ -0,0 +1,160 @@
+"""
+Per-feature attributions of the served model's predictions.
+
+For a logistic regression on standardized features, the Shapley values of the
+log-odds against a background distribution (features taken as independent)
+have a closed form: feature i contributes `w_i * (x_i - E[x_i])`, where `w_i`
+is the coefficient folded with the standardization and `E[x_i]` the background
+mean. The background is summarized once, at load, as the mean row of the
+training dataset, so explaining a batch is one subtraction and one product on
+the feature matrix: about the cost of scoring it.
+
+Contributions are in log-odds and add up exactly to the model's margin:
+`base_value + sum(contributions) == logit(probability)`.
+
+Tree ensembles have no such closed form: `Explainer.for_model` raises
+`ExplanationUnsupported` for them.
+"""
+import csv
+import threading
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from api.cache import PredictionCache, canonical_key
+from api.flat_model import FlatModel
+from api.registry import LoadedModel
+
+
+class ExplanationUnsupported(ValueError):
+    """The served model has no exact fast attribution (non-linear estimator)."""
+
+
+def background_mean_from_csv(path: Path, features_order: Sequence[str]) -> np.ndarray:
+    """Mean row of the training CSV in `features_order` order (the attribution background)."""
+    with open(path, newline="", encoding="utf-8") as fh:
+        reader = csv.DictReader(fh)
+        X = np.array([[float(row[f]) for f in features_order] for row in reader], dtype=float)
+    if X.shape[0] == 0:
+        raise ValueError(f"{path}: empty background dataset")
+    return X.mean(axis=0)
+
+
+def linear_terms(m: LoadedModel) -> tuple[np.ndarray, float]:
+    """(weights, bias) of the model's log-odds as a function of the raw (unscaled) features."""
+    predictor = m.predictor
+    if isinstance(predictor, FlatModel):
+        if predictor.kind != "linear":
+            raise ExplanationUnsupported(f"No fast attribution for {predictor.header['estimator']} models")
+        return np.asarray(predictor.weights, dtype=float), predictor.bias
+
+    estimator = predictor.estimator
+    coef = getattr(estimator, "coef_", None)
+    if coef is None or np.asarray(coef).shape[0] != 1:
+        raise ExplanationUnsupported(f"No fast attribution for {type(estimator).__name__} models")
+    # w.(x - mean)/scale + b == (w/scale).x + (b - (w/scale).mean), comme le repli de flat_model
+    pre = predictor.preprocessor
+    offset = np.zeros(pre.n_features)
+    scale = np.ones(pre.n_features)
+    if pre.mean is not None:
+        offset[pre.idx] = pre.mean
+    if pre.scale is not None:
+        scale[pre.idx] = pre.scale
+    weights = np.asarray(coef, dtype=float).ravel() / scale
+    bias = float(np.asarray(estimator.intercept_).ravel()[0]) - float(np.dot(weights, offset))
+    return weights, bias
+
+
+class Explainer:
+    """Attributions of one model version against a fixed background mean row."""
+
+    def __init__(self, model_version: str, weights: np.ndarray, bias: float, background_mean: np.ndarray):
+        self.model_version = model_version
+        self.weights = weights
+        self.background_mean = background_mean
+        # Log-odds de la ligne moyenne: point de départ des contributions
+        self.base_value = float(np.dot(weights, background_mean) + bias)
+
+    @classmethod
+    def for_model(cls, m: LoadedModel, background_mean: np.ndarray) -> "Explainer":
+        weights, bias = linear_terms(m)
+        return cls(m.version, weights, bias, background_mean)
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_features) log-odds contributions of the rows of X (FEATURES_ORDER order)."""
+        return (np.asarray(X, dtype=float) - self.background_mean) * self.weights
+
+
+class ExplanationService:
+    """
+    Explainer of the served model plus a cache of single-row attributions.
+
+    `load` is called when a model is activated (the explainer is built once per
+    version); single rows are cached per canonical input and model version, like
+    the prediction cache. Batches go straight to `Explainer.contributions`, one
+    vectorized pass.
+    """
+
+    def __init__(self, background_mean: np.ndarray, cache: PredictionCache):
+        self.background_mean = background_mean
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._explainer: Optional[Explainer] = None
+        self._error: Optional[ExplanationUnsupported] = None
+        self._version: Optional[str] = None
+
+    def load(self, m: LoadedModel) -> None:
+        """Build the explainer of a newly served model (a non-linear model is recorded as unsupported)."""
+        try:
+            explainer, error = Explainer.for_model(m, self.background_mean), None
+        except ExplanationUnsupported as e:
+            explainer, error = None, e
+        with self._lock:
+            self._explainer, self._error, self._version = explainer, error, m.version
+        self.cache.bind_version(m.version)
+
+    def get(self, m: LoadedModel) -> Explainer:
+        """Explainer for `m`; raises ExplanationUnsupported for non-linear models."""
+        with self._lock:
+            if self._version == m.version:
+                if self._error is not None:
+                    raise self._error
+                return self._explainer
+        # Requête ayant lu l'ancien modèle pendant une activation: explainer à la volée
+        return Explainer.for_model(m, self.background_mean)
+
+    def explain_one(self, m: LoadedModel, values: Sequence[float]) -> np.ndarray:
+        explainer = self.get(m)
+        key = canonical_key(values, m.version) if self.cache.enabled else None
+        phi = self.cache.get(key) if key is not None else None
+        if phi is None:
+            phi = explainer.contributions(np.asarray(values, dtype=float)[None, :])[0]
+            phi.flags.writeable = False
+            if key is not None:
+                self.cache.set(key, phi)
+        return phi
+
+
+def explanation_payloads(
+    phi: np.ndarray, X: np.ndarray, features_order: Sequence[str], base_value: float, top: Optional[int] = None
+) -> list[dict]:
+    """
+    Explanations of the rows of X: contributions sorted by decreasing magnitude, optionally the `top` first.
+
+    Sorting and gathering are done for all rows at once; only the dicts are built per row.
+    """
+    order = np.argsort(-np.abs(phi), axis=1, kind="stable")[:, :top]
+    rows = np.arange(phi.shape[0])[:, None]
+    names = np.asarray(features_order, dtype=object)[order].tolist()
+    values = np.asarray(X, dtype=float)[rows, order].tolist()
+    contributions = phi[rows, order].tolist()
+    return [
+        {
+            "base_value": base_value,
+            "contributions": [
+                {"feature": f, "value": v, "contribution": c} for f, v, c in zip(row_names, row_values, row_phi)
+            ],
+        }
+        for row_names, row_values, row_phi in zip(names, values, contributions)
+    ]
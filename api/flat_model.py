@@ -0,0 +1,325 @@
+"""
+Flat NumPy export of a fitted artifact.
+
+`compile_flat` turns the joblib artifact (`model`, `scaler`, `seuil`,
+`cols_to_scale`) into a few flat arrays plus a small JSON header, and
+`FlatModel` scores from those arrays with NumPy alone: no sklearn object is
+unpickled or called at inference time.
+
+- Logistic regression: the standardization is folded into the coefficients,
+  so scoring a row is one dot product and a sigmoid.
+- Tree ensembles (DecisionTree, RandomForest, ExtraTrees, binary
+  GradientBoosting): the nodes of every tree are concatenated into
+  `left/right/feature/threshold/value` arrays and all the trees are walked
+  together, one vectorized step per depth level.
+
+The artifact is an uncompressed `.npz`: with MODEL_MMAP=1 its members are
+memory-mapped read-only, like the joblib artifacts.
+
+Usage:
+    python -m api.flat_model export <source.pkl> <destination.npz> [--float32]
+    python -m api.flat_model check <artifact.npz> [--source <source.pkl>] [--data data/dataset_clean.csv]
+"""
+import argparse
+import json
+import threading
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from api.artifacts import MODEL_MMAP
+
+FORMAT_VERSION = 1
+FLAT_SUFFIX = ".npz"
+# Nombre max de cellules (lignes x arbres) parcourues à la fois
+TREE_CHUNK_CELLS = 1 << 20
+
+
+def _preprocessing(scaler, cols_to_scale, features_order) -> tuple[np.ndarray, np.ndarray]:
+    """Per-feature (offset, scale) such that the model input is (x - offset) / scale."""
+    position = {f: i for i, f in enumerate(features_order)}
+    idx = np.array([position[str(c)] for c in cols_to_scale], dtype=np.intp)
+    offset = np.zeros(len(features_order))
+    scale = np.ones(len(features_order))
+    if scaler.with_mean:
+        offset[idx] = scaler.mean_
+    if scaler.with_std:
+        scale[idx] = scaler.scale_
+    return offset, scale
+
+
+def _tree_arrays(trees: list, leaf_value) -> dict[str, np.ndarray]:
+    """Concatenate sklearn trees; leaves point to themselves so every row can take `depth` steps."""
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    start = 0
+    for tree in trees:
+        t = tree.tree_
+        nodes = np.arange(t.node_count)
+        is_leaf = t.children_left == -1
+        left.append(np.where(is_leaf, nodes, t.children_left) + start)
+        right.append(np.where(is_leaf, nodes, t.children_right) + start)
+        feature.append(np.where(is_leaf, 0, t.feature))
+        threshold.append(np.where(is_leaf, np.inf, t.threshold))
+        value.append(leaf_value(t.value))
+        roots.append(start)
+        start += t.node_count
+    return {
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "value": np.concatenate(value).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "depth": np.array(max(tree.tree_.max_depth for tree in trees), dtype=np.int32),
+    }
+
+
+def compile_flat(obj: dict) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Compile a loaded joblib artifact into (header, arrays).
+
+    Raises ValueError for estimators this format does not cover (multiclass,
+    custom GradientBoosting init, other model families).
+    """
+    from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.tree import DecisionTreeClassifier
+
+    model = obj["model"]
+    features_order = [str(f) for f in model.feature_names_in_]
+    cols_to_scale = [str(c) for c in obj["cols_to_scale"]]
+    if len(model.classes_) != 2:
+        raise ValueError("Only binary classifiers can be exported")
+    offset, scale = _preprocessing(obj["scaler"], cols_to_scale, features_order)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "estimator": type(model).__name__,
+        "features_order": features_order,
+        "cols_to_scale": cols_to_scale,
+        "threshold": float(obj["seuil"]),
+    }
+
+    if isinstance(model, LogisticRegression):
+        coef = np.asarray(model.coef_, dtype=float).ravel()
+        intercept = float(np.asarray(model.intercept_).ravel()[0])
+        # w.(x - offset)/scale + b == (w/scale).x + (b - w.offset/scale)
+        weights = coef / scale
+        header["kind"] = "linear"
+        arrays = {
+            "offset": offset,
+            "scale": scale,
+            "weights": weights,
+            "bias": np.array(intercept - np.dot(weights, offset)),
+        }
+    elif isinstance(model, (DecisionTreeClassifier, RandomForestClassifier, ExtraTreesClassifier)):
+        trees = [model] if isinstance(model, DecisionTreeClassifier) else list(model.estimators_)
+        header["kind"] = "forest"
+        arrays = {
+            "offset": offset,
+            "scale": scale,
+            **_tree_arrays(trees, lambda v: v[:, 0, 1] / v[:, 0, :].sum(axis=1)),
+        }
+    elif isinstance(model, GradientBoostingClassifier):
+        if not (isinstance(model.init_, str) and model.init_ == "zero") and type(model.init_).__name__ != "DummyClassifier":
+            raise ValueError("GradientBoosting with a custom init estimator cannot be exported")
+        lr = model.learning_rate
+        header["kind"] = "boosting"
+        arrays = {
+            "offset": offset,
+            "scale": scale,
+            **_tree_arrays(list(model.estimators_[:, 0]), lambda v: lr * v[:, 0, 0]),
+            # Prédiction initiale constante (log-odds de la classe positive)
+            "init": np.array(model._raw_predict_init(np.zeros((1, len(features_order)), dtype=np.float32))[0, 0]),
+        }
+    else:
+        raise ValueError(f"Unsupported estimator for flat export: {type(model).__name__}")
+    return header, arrays
+
+
+def save_flat(path: Path, header: dict, arrays: dict[str, np.ndarray], dtype=np.float64) -> Path:
+    """Write an uncompressed `.npz`; float arrays are stored as `dtype` (tree thresholds stay float64)."""
+    dtype = np.dtype(dtype)
+    stored = {}
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        if arr.dtype.kind == "f" and name != "threshold":
+            arr = arr.astype(dtype)
+        stored[name] = arr
+    header = {**header, "dtype": dtype.name}
+    np.savez(path, header=np.array(json.dumps(header)), **stored)
+    return Path(path)
+
+
+def _mmap_npz(path: Path) -> dict[str, np.ndarray]:
+    """Map the members of an uncompressed `.npz` read-only, without copying them."""
+    arrays = {}
+    with open(path, "rb") as f, zipfile.ZipFile(f) as zf:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: member {info.filename} is compressed")
+            # En-tête local: 30 octets fixes + nom + champ extra
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+            data_start = info.header_offset + 30 + int(name_len) + int(extra_len)
+            f.seek(data_start)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = read_header(f)
+            name = info.filename.removesuffix(".npy")
+            if dtype.hasobject or dtype.kind == "U" or not shape:
+                # En-tête JSON et scalaires: lus normalement
+                f.seek(data_start)
+                arrays[name] = np.lib.format.read_array(f, allow_pickle=False)
+            else:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode="r", offset=f.tell(), shape=shape, order="F" if fortran else "C"
+                )
+    return arrays
+
+
+def load_flat(path: Path, mmap: bool = MODEL_MMAP) -> "FlatModel":
+    if mmap:
+        arrays = _mmap_npz(path)
+    else:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+    header = json.loads(str(arrays.pop("header")))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported flat artifact format {header.get('format_version')}")
+    return FlatModel(header, arrays)
+
+
+class FlatModel:
+    """
+    NumPy-only evaluator for a compiled artifact.
+
+    Same interface as `CompiledPredictor` (`predict_proba`, `scale_one`,
+    `proba_one`, `predict_one`) so the API can serve from either.
+    """
+
+    def __init__(self, header: dict, arrays: dict[str, np.ndarray]):
+        self.header = header
+        self.kind = header["kind"]
+        self.features_order = list(header["features_order"])
+        self.cols_to_scale = list(header["cols_to_scale"])
+        self.threshold = float(header["threshold"])
+        self.dtype = np.dtype(header.get("dtype", "float64"))
+        self.n_features = len(self.features_order)
+        self.arrays = arrays
+        self.offset = arrays["offset"]
+        self.scale = arrays["scale"]
+        if self.kind == "linear":
+            self.weights = arrays["weights"]
+            self.bias = float(arrays["bias"])
+        else:
+            self.depth = int(arrays["depth"])
+            self.roots = arrays["roots"]
+            self.init = float(arrays["init"]) if "init" in arrays else 0.0
+        self._local = threading.local()
+
+    @classmethod
+    def from_artifact(cls, obj: dict, dtype=np.float64) -> "FlatModel":
+        """Compile in memory, without going through a file."""
+        header, arrays = compile_flat(obj)
+        dtype = np.dtype(dtype)
+        arrays = {k: v.astype(dtype) if v.dtype.kind == "f" and k != "threshold" else v for k, v in arrays.items()}
+        return cls({**header, "dtype": dtype.name}, arrays)
+
+    @staticmethod
+    def _sigmoid(z: np.ndarray) -> np.ndarray:
+        e = np.exp(-np.abs(z))
+        return np.where(z >= 0, 1.0 / (1.0 + e), e / (1.0 + e))
+
+    def _trees(self, Xs: np.ndarray) -> np.ndarray:
+        a = self.arrays
+        n_trees = len(self.roots)
+        out = np.empty(Xs.shape[0], dtype=np.float64)
+        step = max(TREE_CHUNK_CELLS // n_trees, 1)
+        for start in range(0, Xs.shape[0], step):
+            # Les arbres sklearn comparent des entrées float32
+            X = np.ascontiguousarray(Xs[start:start + step], dtype=np.float32)
+            rows = np.arange(X.shape[0])[:, None]
+            nodes = np.broadcast_to(self.roots, (X.shape[0], n_trees)).copy()
+            for _ in range(self.depth):
+                go_left = X[rows, a["feature"][nodes]] <= a["threshold"][nodes]
+                nodes = np.where(go_left, a["left"][nodes], a["right"][nodes])
+            total = a["value"][nodes].sum(axis=1, dtype=np.float64)
+            out[start:start + step] = total / n_trees if self.kind == "forest" else total
+        if self.kind == "boosting":
+            return self._sigmoid(out + self.init)
+        return out
+
+    def predict_proba(self, X: np.ndarray, copy: bool = True) -> np.ndarray:
+        """Positive-class probabilities for X (n_rows, n_features) in FEATURES_ORDER order."""
+        X = np.asarray(X, dtype=self.dtype)
+        if self.kind == "linear":
+            return self._sigmoid(X @ self.weights + self.bias).astype(np.float64, copy=False)
+        return self._trees((X - self.offset) / self.scale)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predicted labels with the artifact's threshold (`seuil`)."""
+        return (self.predict_proba(X) >= self.threshold).astype(int)
+
+    def scale_one(self, values) -> np.ndarray:
+        """Copy one row into this thread's buffer; returns the (1, n) buffer."""
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.empty((1, self.n_features), dtype=self.dtype)
+        buf[0] = values
+        return buf
+
+    def proba_one(self, buf: np.ndarray) -> float:
+        """Positive-class probability for a row copied by `scale_one`."""
+        if self.kind == "linear":
+            return float(self._sigmoid(np.dot(buf[0], self.weights) + self.bias))
+        return float(self._trees((buf - self.offset) / self.scale)[0])
+
+    def predict_one(self, values) -> float:
+        return self.proba_one(self.scale_one(values))
+
+
+def parity_report(flat: FlatModel, obj: dict, X: np.ndarray) -> dict:
+    """Compare the flat evaluator with the sklearn pipeline on X (raw features in FEATURES_ORDER order)."""
+    from api.inference import pandas_predict_proba
+
+    expected = pandas_predict_proba(obj["model"], obj["scaler"], flat.cols_to_scale, flat.features_order, X)
+    got = flat.predict_proba(X)
+    threshold = float(obj["seuil"])
+    return {
+        "rows": int(X.shape[0]),
+        "max_abs_diff": float(np.max(np.abs(got - expected))),
+        "label_mismatches": int(np.sum((got >= threshold) != (expected >= threshold))),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    import joblib
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Export/check flat NumPy model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="compile a joblib artifact into a flat .npz")
+    exp.add_argument("source", type=Path)
+    exp.add_argument("destination", type=Path)
+    exp.add_argument("--float32", action="store_true", help="store weights/values as float32")
+    chk = sub.add_parser("check", help="compare a flat artifact with the sklearn pipeline")
+    chk.add_argument("artifact", type=Path)
+    chk.add_argument("--source", type=Path, default=Path("model/classifier_employee.pkl"))
+    chk.add_argument("--data", type=Path, default=Path("data/dataset_clean.csv"))
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        header, arrays = compile_flat(joblib.load(args.source))
+        path = save_flat(args.destination, header, arrays, np.float32 if args.float32 else np.float64)
+        print(f"{header['kind']} ({header['estimator']}) -> {path} ({path.stat().st_size} bytes)")
+    else:
+        flat = load_flat(args.artifact)
+        obj = joblib.load(args.source)
+        X = pd.read_csv(args.data)[flat.features_order].to_numpy(dtype=float)
+        print(json.dumps(parity_report(flat, obj, X), indent=2))
+
+
+if __name__ == "__main__":
+    main()
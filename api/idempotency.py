@@ -0,0 +1,182 @@
+"""
+Idempotency keys for the single-row prediction endpoints.
+
+A client that retries with the same `Idempotency-Key` gets the original
+`request_id` and result back: the row is neither scored nor logged again.
+
+- `IdempotencyStore` is the per-worker front: a bounded LRU of recent keys
+  whose entries hold an asyncio future, so that concurrent duplicates in the
+  same worker wait for the first call instead of running in parallel.
+- The database is the source of truth across workers and restarts: the key is
+  the primary key of `idempotency_keys`, inserted in the same transaction as the
+  prediction, so two workers racing on the same key cannot both insert; the
+  loser reads the winner's row.
+- Keys expire after `ttl` seconds: expired entries are dropped from memory on
+  access and `release_expired_keys` deletes them in the database (the audit rows
+  are kept, only the key is released).
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import Select, and_, delete, select
+from sqlalchemy.engine import Engine
+
+from api.db import idempotency_keys, prediction_requests, prediction_results
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used with a different payload."""
+
+
+def validate_key(key: str) -> Optional[str]:
+    """Error message for an unusable header value, None if the key is fine."""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"
+    if not key.isprintable():
+        return "Idempotency-Key must only contain printable characters"
+    return None
+
+
+class IdempotencyStore:
+    """
+    In-process index of recent keys: key -> (payload fingerprint, expiry, future of the response).
+
+    Used from the event loop only (no lock needed).
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[bytes, float, asyncio.Future]] = OrderedDict()
+        self.hits = 0
+        self.waits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def begin(self, key: str, fingerprint: bytes) -> tuple[bool, asyncio.Future]:
+        """
+        Claim `key` for this payload.
+
+        Returns (True, future) when the caller owns the key and must `complete` or
+        `abandon` it, or (False, future) when another call owns it: await the future
+        (None means the owner failed, try again). Raises IdempotencyKeyReused if the
+        key is known with another payload.
+        """
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= now and entry[2].done():
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            if entry[0] != fingerprint:
+                raise IdempotencyKeyReused(key)
+            self._entries.move_to_end(key)
+            if entry[2].done():
+                self.hits += 1
+            else:
+                self.waits += 1
+            return False, entry[2]
+
+        fut = asyncio.get_running_loop().create_future()
+        self._entries[key] = (fingerprint, now + self.ttl, fut)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return True, fut
+
+    def complete(self, key: str, response: dict) -> None:
+        entry = self._entries.get(key)
+        if entry is not None and not entry[2].done():
+            entry[2].set_result(response)
+
+    def abandon(self, key: str) -> None:
+        """The owner failed: forget the key and wake the waiters so that one of them retries."""
+        entry = self._entries.pop(key, None)
+        if entry is not None and not entry[2].done():
+            entry[2].set_result(None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits, "waits": self.waits}
+
+
+def key_lookup_query(key: str) -> Select:
+    """
+    The logged prediction stored under `key` (at most one row, `key` is a primary key).
+
+    The request and result are matched on their partition key too (both timestamps are
+    the key's `requested_at`), so only one partition of each table is read.
+    """
+    k = idempotency_keys.c
+    return (
+        select(
+            k.request_id,
+            k.requested_at,
+            prediction_requests.c.features_hash,
+            prediction_results.c.probability,
+            prediction_results.c.prediction,
+            prediction_results.c.threshold,
+        )
+        .select_from(
+            idempotency_keys
+            .outerjoin(prediction_requests, and_(
+                prediction_requests.c.request_id == k.request_id, prediction_requests.c.requested_at == k.requested_at
+            ))
+            .outerjoin(prediction_results, and_(
+                prediction_results.c.request_id == k.request_id, prediction_results.c.predicted_at == k.requested_at
+            ))
+        )
+        .where(k.idempotency_key == key)
+    )
+
+
+def release_key_stmt(key: str):
+    return delete(idempotency_keys).where(idempotency_keys.c.idempotency_key == key)
+
+
+def release_expired_keys(engine: Engine, ttl: float) -> int:
+    """Delete the keys older than `ttl` seconds (the logged rows are kept). Returns the number released."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl)
+    with engine.begin() as conn:
+        result = conn.execute(delete(idempotency_keys).where(idempotency_keys.c.requested_at < cutoff))
+    return result.rowcount
+
+
+class KeyJanitor:
+    """Background thread calling `release_expired_keys` every `interval` seconds."""
+
+    def __init__(self, engine: Engine, ttl: float, interval: float = 600.0):
+        self.engine = engine
+        self.ttl = ttl
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="idempotency-janitor", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                n = release_expired_keys(self.engine, self.ttl)
+                if n:
+                    logger.info("Released %d expired idempotency keys", n)
+            except Exception:
+                logger.exception("Idempotency key cleanup failed")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,87 @@
+import copy
+import threading
+
+import numpy as np
+
+
+class CompiledPreprocessor:
+    """
+    Standardization step compiled once from the fitted scaler.
+
+    Holds the positions of `cols_to_scale` in FEATURES_ORDER and the scaler's
+    mean/scale vectors, and applies `(x - mean) / scale` in place on a float
+    ndarray. The operations are the ones `StandardScaler.transform` performs,
+    so results are bit-for-bit identical to the pandas path.
+    """
+
+    def __init__(self, scaler, cols_to_scale, features_order):
+        position = {f: i for i, f in enumerate(features_order)}
+        self.n_features = len(features_order)
+        self.idx = np.array([position[str(c)] for c in cols_to_scale], dtype=np.intp)
+        self.mean = np.asarray(scaler.mean_, dtype=float) if scaler.with_mean else None
+        self.scale = np.asarray(scaler.scale_, dtype=float) if scaler.with_std else None
+
+    def transform_(self, X: np.ndarray) -> np.ndarray:
+        """Standardize the scaled columns of X (n_rows, n_features) in place."""
+        sub = X[:, self.idx]
+        if self.mean is not None:
+            sub -= self.mean
+        if self.scale is not None:
+            sub /= self.scale
+        X[:, self.idx] = sub
+        return X
+
+
+class CompiledPredictor:
+    """
+    Pandas-free inference: compiled preprocessing + estimator fed with a plain ndarray.
+
+    The estimator is a shallow copy of the fitted model without `feature_names_in_`,
+    so sklearn does not look for (or warn about) column names on ndarray input.
+    Single-row calls reuse a preallocated per-thread buffer.
+    """
+
+    def __init__(self, model, scaler, cols_to_scale, features_order):
+        self.features_order = list(features_order)
+        self.preprocessor = CompiledPreprocessor(scaler, cols_to_scale, self.features_order)
+        self.estimator = copy.copy(model)
+        if hasattr(self.estimator, "feature_names_in_"):
+            del self.estimator.feature_names_in_
+        self._local = threading.local()
+
+    def _row_buffer(self) -> np.ndarray:
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.empty((1, self.preprocessor.n_features), dtype=float)
+        return buf
+
+    def predict_proba(self, X: np.ndarray, copy: bool = True) -> np.ndarray:
+        """Positive-class probabilities for X (n_rows, n_features) in FEATURES_ORDER order."""
+        # Copie en ordre colonne, comme le bloc d'un DataFrame: le produit matriciel
+        # somme dans le même ordre et les probabilités restent identiques au bit près.
+        X = np.array(X, dtype=float, order="F") if copy else X
+        self.preprocessor.transform_(X)
+        return self.estimator.predict_proba(X)[:, 1]
+
+    def scale_one(self, values) -> np.ndarray:
+        """Copy one row into this thread's buffer and standardize it; returns the (1, n) buffer."""
+        buf = self._row_buffer()
+        buf[0] = values
+        return self.preprocessor.transform_(buf)
+
+    def proba_one(self, buf: np.ndarray) -> float:
+        """Positive-class probability for a row already standardized by `scale_one`."""
+        return float(self.estimator.predict_proba(buf)[0, 1])
+
+    def predict_one(self, values) -> float:
+        """Probability for one row given as a sequence in FEATURES_ORDER order."""
+        return self.proba_one(self.scale_one(values))
+
+
+def pandas_predict_proba(model, scaler, cols_to_scale, features_order, X: np.ndarray) -> np.ndarray:
+    """Reference DataFrame-based path (historical `/predict` code), kept for parity checks and benchmarks."""
+    import pandas as pd
+
+    X_df = pd.DataFrame(X, columns=features_order)
+    X_df[cols_to_scale] = scaler.transform(X_df[cols_to_scale])
+    return model.predict_proba(X_df)[:, 1]
@@ -0,0 +1,285 @@
+"""
+Monthly partitions of the prediction log, and their archiving.
+
+`prediction_requests` and `prediction_results` are partitioned by month
+(`requested_at` / `predicted_at`, see `db/schema.sql`). This job, meant to run
+daily (cron):
+
+1. creates the partitions of the current month and of the next `--ahead`
+   months, and moves into them the rows that fell into the DEFAULT partition
+   (safety net for when the job did not run in time);
+2. exports every month older than `--retention-months` to
+   `<archive-dir>/predictions_YYYY_MM.csv.gz` (one line per prediction, one
+   column per feature, same layout as `dataset_clean.csv`) with a JSON
+   manifest (rows, feature order, sha256), then drops the two partitions of
+   the month (`DROP TABLE`: no DELETE or VACUUM of millions of rows), the
+   matching idempotency keys and the `feature_vectors` rows no longer
+   referenced.
+
+Collecting unreferenced vectors takes a SHARE ROW EXCLUSIVE lock on
+`feature_vectors`: log writes wait for the end of the transaction (a few
+seconds), so no vector still being inserted can be deleted.
+
+PostgreSQL only (COPY, declarative partitioning).
+
+Usage: python -m api.log_archive [--retention-months 12] [--archive-dir archive] [--ahead 2] [--dry-run]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+# Table partitionnée -> colonne de partition
+LOG_TABLES = {"prediction_requests": "requested_at", "prediction_results": "predicted_at"}
+DEFAULT_RETENTION_MONTHS = int(os.getenv("PREDICTION_LOG_RETENTION_MONTHS", "12"))
+DEFAULT_ARCHIVE_DIR = Path(os.getenv("PREDICTION_LOG_ARCHIVE_DIR", ROOT / "archive"))
+DEFAULT_AHEAD = 2
+# Sérialise les jobs concurrents (pg_advisory_xact_lock)
+LOCK_KEY = 0x70726564  # "pred"
+
+_PARTITION_RE = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+@dataclass
+class ArchivedMonth:
+    month: str
+    rows: int
+    path: str
+    sha256: str
+    vectors_deleted: int
+    keys_deleted: int
+
+
+def month_start(ts: datetime) -> datetime:
+    """First instant (UTC) of the month of `ts`."""
+    ts = ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    """Month of a monthly partition from its name (None for the DEFAULT partition)."""
+    match = _PARTITION_RE.search(name)
+    if match is None:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def list_partitions(conn: Connection, table: str) -> list[str]:
+    return list(conn.execute(
+        text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :table
+            ORDER BY c.relname
+        """),
+        {"table": table},
+    ).scalars())
+
+
+def _create_partition(conn: Connection, table: str, column: str, month: datetime) -> None:
+    """
+    Create the partition of `month`, moving into it the rows the DEFAULT partition holds for
+    that range (a plain CREATE ... PARTITION OF would fail on them).
+    """
+    name = partition_name(table, month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    moved = conn.execute(
+        text(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default WHERE {column} >= :start AND {column} < :end RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """),
+        bounds,
+    ).rowcount
+    # ATTACH crée les index de la table parente sur la nouvelle partition
+    conn.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    ))
+    logger.info("Created partition %s (%d row(s) moved from the default partition)", name, moved)
+
+
+def ensure_partitions(engine: Engine, now: Optional[datetime] = None, ahead: int = DEFAULT_AHEAD) -> list[str]:
+    """
+    Create the monthly partitions from the current month to `ahead` months later, plus
+    those of any month found in a DEFAULT partition. Idempotent; returns the names created.
+    """
+    current = month_start(now or datetime.now(timezone.utc))
+    created = []
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+        for table, column in LOG_TABLES.items():
+            existing = set(list_partitions(conn, table))
+            stray = conn.execute(text(
+                f"SELECT DISTINCT date_trunc('month', {column} AT TIME ZONE 'UTC') FROM {table}_default"
+            )).scalars()
+            months = {add_months(current, i) for i in range(ahead + 1)}
+            months |= {m.replace(tzinfo=timezone.utc) for m in stray}
+            for month in sorted(months):
+                if partition_name(table, month) not in existing:
+                    _create_partition(conn, table, column, month)
+                    created.append(partition_name(table, month))
+    return created
+
+
+def expired_months(engine: Engine, retention_months: int, now: Optional[datetime] = None) -> list[datetime]:
+    """Months, oldest first, whose partitions are older than the retention window."""
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retention_months)
+    with engine.connect() as conn:
+        names = list_partitions(conn, "prediction_requests")
+    return sorted(m for m in map(partition_month, names) if m is not None and m < cutoff)
+
+
+def _export_sql(month: datetime, features_order: Sequence[str], quote) -> str:
+    features = ", ".join(f"v.features[{i + 1}] AS {quote(f)}" for i, f in enumerate(features_order))
+    requests = partition_name("prediction_requests", month)
+    results = partition_name("prediction_results", month)
+    return f"""
+        COPY (
+            SELECT q.request_id, q.requested_at, r.predicted_at, r.probability, r.prediction,
+                   r.threshold, r.cached, r.model_version, encode(q.features_hash, 'hex') AS features_hash,
+                   {features}
+            FROM {requests} q
+            LEFT JOIN {results} r ON r.request_id = q.request_id
+            LEFT JOIN feature_vectors v ON v.features_hash = q.features_hash
+            ORDER BY q.requested_at, q.request_id
+        ) TO STDOUT WITH (FORMAT csv, HEADER)
+    """
+
+
+def archive_month(engine: Engine, month: datetime, archive_dir: Path, features_order: Sequence[str]) -> ArchivedMonth:
+    """Export one month of the log to a gzipped CSV plus manifest, then drop its partitions."""
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"predictions_{month:%Y_%m}"
+    path = archive_dir / f"{stem}.csv.gz"
+    tmp = path.with_name(path.name + ".part")
+
+    # 1. Export (flux COPY compressé à la volée, mémoire constante)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur, gzip.open(tmp, "wb") as out:
+            cur.copy_expert(_export_sql(month, features_order, engine.dialect.identifier_preparer.quote), out)
+            rows = cur.rowcount
+        raw.commit()
+    except BaseException:
+        raw.rollback()
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        raw.close()
+    h = hashlib.sha256()
+    with open(tmp, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    manifest = {
+        "month": f"{month:%Y-%m}",
+        "rows": rows,
+        "file": path.name,
+        "sha256": h.hexdigest(),
+        "features_order": list(features_order),
+        "archived_at": datetime.now(timezone.utc).isoformat(),
+    }
+    (archive_dir / f"{stem}.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    # 2. Suppression des partitions, des clés et des vecteurs orphelins (une transaction)
+    requests = partition_name("prediction_requests", month)
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+        conn.execute(text("LOCK TABLE feature_vectors IN SHARE ROW EXCLUSIVE MODE"))
+        conn.execute(text(
+            f"CREATE TEMP TABLE archived_hashes ON COMMIT DROP AS SELECT DISTINCT features_hash FROM {requests}"
+        ))
+        keys_deleted = conn.execute(
+            text("DELETE FROM idempotency_keys WHERE requested_at < :end"), {"end": add_months(month, 1)}
+        ).rowcount
+        conn.execute(text(f"DROP TABLE {requests}, {partition_name('prediction_results', month)}"))
+        vectors_deleted = conn.execute(text("""
+            DELETE FROM feature_vectors v
+            USING archived_hashes a
+            WHERE v.features_hash = a.features_hash
+              AND NOT EXISTS (SELECT 1 FROM prediction_requests q WHERE q.features_hash = a.features_hash)
+        """)).rowcount
+    logger.info("Archived %s: %d rows -> %s, %d vector(s) deleted", manifest["month"], rows, path, vectors_deleted)
+    return ArchivedMonth(manifest["month"], rows, str(path), manifest["sha256"], vectors_deleted, keys_deleted)
+
+
+def run_maintenance(
+    engine: Engine,
+    features_order: Sequence[str],
+    retention_months: int = DEFAULT_RETENTION_MONTHS,
+    archive_dir: Path = DEFAULT_ARCHIVE_DIR,
+    ahead: int = DEFAULT_AHEAD,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+) -> dict:
+    """Create upcoming partitions, then archive and drop the months past the retention window."""
+    if retention_months < 1:
+        raise ValueError("retention_months must be >= 1")
+    if dry_run:
+        # Partitions existantes seulement: les mois encore dans DEFAULT n'apparaissent qu'au vrai passage
+        months = expired_months(engine, retention_months, now)
+        return {"created": [], "archived": [], "would_archive": [f"{m:%Y-%m}" for m in months]}
+    created = ensure_partitions(engine, now, ahead)
+    months = expired_months(engine, retention_months, now)
+    archived = [asdict(archive_month(engine, m, archive_dir, features_order)) for m in months]
+    return {"created": created, "archived": archived}
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    from api.db import engine
+    from api.registry import load_model
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-months", type=int, default=DEFAULT_RETENTION_MONTHS,
+                        help="Months kept in the database, current month excluded.")
+    parser.add_argument("--archive-dir", type=Path, default=DEFAULT_ARCHIVE_DIR)
+    parser.add_argument("--ahead", type=int, default=DEFAULT_AHEAD, help="Future monthly partitions to create.")
+    parser.add_argument("--model-path", type=Path,
+                        default=Path(os.getenv("MODEL_PATH", ROOT / "model" / "classifier_employee.pkl")),
+                        help="Model whose features_order names the archived feature columns.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    report = run_maintenance(
+        engine,
+        load_model(args.model_path).features_order,
+        retention_months=args.retention_months,
+        archive_dir=args.archive_dir,
+        ahead=args.ahead,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,492 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+# Début de l'import du module: durée rapportée par /health/ready et benchmarks/bench_startup.py
+_IMPORT_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from pathlib import Path
-import pandas as pd
-import joblib
 import numpy as np
-from typing import Dict
-from api.db import SessionLocal
-from sqlalchemy import text
-import uuid
-from datetime import datetime, timezone
-import json
+from typing import Any, Dict, Literal, Optional
+from api.admission import STATE_VALUES, AdmissionController, AdmissionMiddleware, CircuitBreaker
+from api.artifacts import array_footprint, memory_report
+from api import audit
+from api.batcher import MicroBatcher
+from api import codecs
+from api.cache import PredictionCache, canonical_key
+from api.codecs import schema_hash
+from api.idempotency import IdempotencyKeyReused, IdempotencyStore, KeyJanitor, key_lookup_query, release_key_stmt, validate_key
+from api.explain import Explainer, ExplanationService, ExplanationUnsupported, background_mean_from_csv, explanation_payloads
+from api.drift import (
+    STALE_CHECKPOINT_INTERVALS, DriftCheckpointer, DriftMonitor, ReferenceProfile, delete_checkpoint, merged_state,
+    touch_checkpoint, write_checkpoint,
+)
+from api.db import DB_POOL_SIZE, AsyncSessionLocal, SessionLocal, async_engine, engine, idempotency_keys, prediction_requests, prediction_results, prediction_sweeps
+from api.model_sync import ModelSync, publish_activation, rollback_activation, undo_activation
+from api.metrics import METRICS_ENABLED, MetricsMiddleware, MetricsRegistry, StageTimer
+from api.prediction_log import DURABILITY_LEVELS, INSERT_VECTORS, PredictionLogWriter, features_digest, storage_rows
+from api.registry import LoadedModel, ModelRegistry
+from api.validation import FeatureValidator, feature_ranges_from_csv, summarize_errors
+from api.scoring_job import DEFAULT_CHUNK_SIZE, ScoringJobRunner
+from api.scoring_pool import ScoringPool
+from api.startup import StartupReport, preopen_async_pool, preopen_pool
+from api import sweep
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+import asyncio
+import hmac
+from itertools import chain
 import math
+import uuid
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+
+logger = logging.getLogger("uvicorn.error")
+
+# Phases de démarrage du worker (/health/ready); import_seconds est fixé à la fin du module
+startup = StartupReport()
 
 ROOT = Path(__file__).resolve().parent.parent
-MODEL_PATH = ROOT / "model" / "classifier_employee.pkl"
+MODEL_DIR = Path(os.getenv("MODEL_DIR", ROOT / "model"))
+MODEL_PATH = Path(os.getenv("MODEL_PATH", MODEL_DIR / "classifier_employee.pkl"))
+
+# Registre des versions: `registry.active` est le modèle servi (prétraitement compilé,
+# seuil, version). Chaque requête lit `registry.active` une seule fois.
+# MODEL_LAZY_LOAD=1: l'import ne lit que le schéma de l'artefact (<artefact>.schema.json),
+# le modèle est chargé et préchauffé par le lifespan avant que le worker reçoive du trafic.
+MODEL_LAZY_LOAD = os.getenv("MODEL_LAZY_LOAD", "1") == "1"
+registry = ModelRegistry(MODEL_DIR, MODEL_PATH, lazy=MODEL_LAZY_LOAD)
+
+FEATURES_ORDER = registry.features_order
+N_FEATURES = len(FEATURES_ORDER)
+# Empreinte de FEATURES_ORDER: les payloads positionnels doivent la renvoyer
+SCHEMA_HASH = schema_hash(FEATURES_ORDER)
+
+# Validation générée depuis la liste des features du modèle (flottants finis stricts,
+# clés inconnues refusées). Bornes min/max du dataset d'entraînement en option.
+VALIDATE_FEATURE_RANGES = os.getenv("VALIDATE_FEATURE_RANGES", "0") == "1"
+FEATURE_RANGES_CSV = Path(os.getenv("FEATURE_RANGES_CSV", ROOT / "data" / "dataset_clean.csv"))
+feature_validator = FeatureValidator(
+    FEATURES_ORDER,
+    feature_ranges_from_csv(FEATURE_RANGES_CSV, FEATURES_ORDER) if VALIDATE_FEATURE_RANGES else None,
+)
+FeaturesModel = feature_validator.model
+
+# Cache des probabilités par vecteur canonique (0 = désactivé)
+_cache_ttl = os.getenv("PREDICTION_CACHE_TTL")
+prediction_cache = PredictionCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "1024")),
+    ttl=float(_cache_ttl) if _cache_ttl else None,
+)
+registry.on_activate(lambda m: prediction_cache.bind_version(m.version))
+
+# Attributions par feature (/explain, explain=true): fond résumé une fois par la ligne moyenne
+# du dataset d'entraînement, explainer construit à chaque activation, lignes seules en cache
+EXPLAIN_BACKGROUND_CSV = Path(os.getenv("EXPLAIN_BACKGROUND_CSV", ROOT / "data" / "dataset_clean.csv"))
+explanations = None
+if EXPLAIN_BACKGROUND_CSV.exists():
+    explanations = ExplanationService(
+        background_mean_from_csv(EXPLAIN_BACKGROUND_CSV, FEATURES_ORDER),
+        PredictionCache(maxsize=int(os.getenv("EXPLANATION_CACHE_SIZE", "1024"))),
+    )
+    registry.on_activate(explanations.load)
+else:
+    logger.warning("Explanations disabled: background dataset %s not found", EXPLAIN_BACKGROUND_CSV)
+
+# Taille max d'un lot pour /predict/batch
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "10000"))
+MAX_SWEEP_POINTS = int(os.getenv("MAX_SWEEP_POINTS", "10000"))
+# Grilles plus grandes scorées dans le threadpool plutôt que sur la boucle d'événements
+SWEEP_INLINE_POINTS = 2048
+
+# Pool de process pour les gros lots (0 = tout est scoré dans le process de l'API).
+# Les lots de moins de SCORING_POOL_MIN_ROWS lignes restent en process.
+SCORING_POOL_WORKERS = int(os.getenv("SCORING_POOL_WORKERS", "0"))
+scoring_pool = None
+if SCORING_POOL_WORKERS > 0:
+    scoring_pool = ScoringPool(
+        SCORING_POOL_WORKERS,
+        min_rows=int(os.getenv("SCORING_POOL_MIN_ROWS", "5000")),
+        start_method=os.getenv("SCORING_POOL_START_METHOD", "spawn"),
+    )
+    # Les workers du pool préchargent le modèle servi
+    registry.on_activate(scoring_pool.bind_model)
+
+# Log des prédictions: "sync" (dans la requête), "buffered" ou "best_effort" (write-behind)
+PREDICTION_LOG_MODE = os.getenv("PREDICTION_LOG_MODE", "sync")
+if PREDICTION_LOG_MODE not in DURABILITY_LEVELS:
+    raise ValueError(f"PREDICTION_LOG_MODE must be one of {DURABILITY_LEVELS}, got {PREDICTION_LOG_MODE!r}")
+
+
+# Métriques Prometheus (par worker), désactivables avec METRICS_ENABLED=0
+metrics = MetricsRegistry(METRICS_ENABLED)
+HTTP_REQUESTS = metrics.counter(
+    "hrpredict_http_requests_total", "HTTP requests by method, route and status.", ("method", "route", "status")
+)
+HTTP_DURATION = metrics.histogram(
+    "hrpredict_http_request_duration_seconds", "End-to-end HTTP request latency.", ("method", "route")
+)
+PREDICT_STAGES = metrics.histogram(
+    "hrpredict_predict_stage_seconds",
+    "Time spent in each stage of the prediction endpoints "
+    "(parse, validate, cache_lookup, scale, predict_proba or microbatch, log, explain).",
+    ("endpoint", "stage"),
+)
+DB_WRITE_STEPS = metrics.histogram(
+    "hrpredict_db_write_seconds",
+    "Prediction log transaction steps (checkout = wait for a pooled connection).",
+    ("step",),
+)
 
-obj = joblib.load(MODEL_PATH)
-model = obj["model"]
-scaler = obj["scaler"]
-threshold = float(obj["seuil"])
-cols_to_scale = obj["cols_to_scale"]
+# Contrôle d'admission des routes de scoring (par worker): au plus ADMISSION_MAX_CONCURRENT requêtes en
+# cours, ADMISSION_MAX_QUEUE en attente pendant ADMISSION_QUEUE_TIMEOUT s; au-delà 503 + Retry-After
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "64"))
+ADMISSION_PATHS = frozenset({
+    "/predict", "/predict/vector", "/predict/batch", "/predict/vectors", "/predict/sweep", "/explain", "/explain/batch",
+})
+ADMISSION_REJECTED = metrics.counter(
+    "hrpredict_admission_rejected_total",
+    "Scoring requests answered 503 (queue_full, queue_timeout, breaker_open).",
+    ("reason",),
+)
+admission = AdmissionController(
+    ADMISSION_MAX_CONCURRENT,
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "128")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1.0")),
+    retry_after=float(os.getenv("ADMISSION_RETRY_AFTER", "1")),
+    wait_hist=metrics.histogram(
+        "hrpredict_admission_queue_seconds", "Time a scoring request waited in the admission queue."
+    ),
+)
+
+# Disjoncteur des écritures de log faites dans la requête: après LOG_BREAKER_FAILURES échecs ou
+# écritures de plus de LOG_WRITE_TIMEOUT s consécutifs, les prédictions sont servies sans être
+# journalisées (mode dégradé) pendant LOG_BREAKER_RESET s, puis une écriture test est retentée.
+# LOG_BREAKER_FAILURES=0 désactive le disjoncteur (une erreur de base fait échouer la requête).
+LOG_WRITE_TIMEOUT = float(os.getenv("LOG_WRITE_TIMEOUT", "2.0"))
+LOG_BREAKER_FAILURES = int(os.getenv("LOG_BREAKER_FAILURES", "5"))
+log_breaker = None
+if LOG_BREAKER_FAILURES > 0:
+    log_breaker = CircuitBreaker(LOG_BREAKER_FAILURES, reset_timeout=float(os.getenv("LOG_BREAKER_RESET", "30")))
+DEGRADED = metrics.counter(
+    "hrpredict_degraded_requests_total",
+    "Predictions served without their log row (breaker_open, write_failed, write_timeout).",
+    ("reason",),
+)
+
+# Micro-batching des /predict concurrents (opt-in): un seul predict_proba pour
+# les lignes arrivées en moins de MICROBATCH_MAX_WAIT_MS, au plus MICROBATCH_MAX_SIZE
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "0") == "1"
+microbatcher = None
+if MICROBATCH_ENABLED:
+    _max_batch = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+    microbatcher = MicroBatcher(
+        max_batch=_max_batch,
+        max_wait=float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2")) / 1e3,
+        size_hist=metrics.histogram(
+            "hrpredict_microbatch_size",
+            "Rows scored per micro-batch.",
+            buckets=tuple(b for b in (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024) if b <= _max_batch),
+        ),
+        wait_hist=metrics.histogram(
+            "hrpredict_microbatch_queue_seconds",
+            "Time a /predict row waited in the micro-batcher before being scored.",
+        ),
+    )
+
+
+# Moniteur de drift: statistiques glissantes des inputs (O(features) par ligne) comparées
+# à un profil de référence calculé une fois depuis le dataset d'entraînement
+DRIFT_MONITOR = os.getenv("DRIFT_MONITOR", "1") == "1"
+DRIFT_REFERENCE_CSV = Path(os.getenv("DRIFT_REFERENCE_CSV", ROOT / "data" / "dataset_clean.csv"))
+DRIFT_CHECKPOINT_INTERVAL = float(os.getenv("DRIFT_CHECKPOINT_INTERVAL", "60"))
+drift_monitor = None
+drift_checkpointer = None
+if DRIFT_MONITOR:
+    if DRIFT_REFERENCE_CSV.exists():
+        drift_monitor = DriftMonitor(ReferenceProfile.from_csv(DRIFT_REFERENCE_CSV, FEATURES_ORDER))
+        drift_checkpointer = DriftCheckpointer(
+            drift_monitor, lambda mon: write_checkpoint(engine, mon), interval=DRIFT_CHECKPOINT_INTERVAL,
+            touch=lambda mon: touch_checkpoint(engine, mon), remove=lambda mon: delete_checkpoint(engine, mon),
+        )
+    else:
+        logger.warning("Drift monitor disabled: reference dataset %s not found", DRIFT_REFERENCE_CSV)
+
+
+# Idempotency-Key: un rejeu renvoie la prédiction d'origine sans rescoring ni nouvel INSERT.
+# Index mémoire par worker devant la table idempotency_keys (sa clé primaire arbitre entre workers).
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+idempotency_store = IdempotencyStore(maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")), ttl=IDEMPOTENCY_TTL)
+key_janitor = KeyJanitor(engine, IDEMPOTENCY_TTL, interval=float(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL", "600")))
+
+# Version de modèle partagée entre workers (table model_activations), relue toutes les
+# MODEL_SYNC_INTERVAL s; 0 = un seul worker, activation et rollback locaux au process
+MODEL_SYNC_INTERVAL = float(os.getenv("MODEL_SYNC_INTERVAL", "5"))
+model_sync = ModelSync(registry, engine, MODEL_SYNC_INTERVAL) if MODEL_SYNC_INTERVAL > 0 else None
+# Jeton (Authorization: Bearer ...) des routes qui changent le modèle servi; non défini = routes désactivées
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def write_prediction_logs(request_rows: list[dict], result_rows: list[dict]) -> None:
+    """
+    Insert request and result rows in one transaction (multi-row INSERT per table).
+
+    Feature vectors not stored yet are added to `feature_vectors`; requests only keep their hash.
+    """
+    timer = StageTimer(DB_WRITE_STEPS)
+    vector_rows, stored_rows = storage_rows(request_rows)
+    db = SessionLocal()
+    try:
+        db.connection()
+        timer.mark("checkout")
+        db.execute(INSERT_VECTORS, vector_rows)
+        timer.mark("insert_vectors")
+        db.execute(insert(prediction_requests), stored_rows)
+        timer.mark("insert_requests")
+        db.execute(insert(prediction_results), result_rows)
+        timer.mark("insert_results")
+        db.commit()
+        timer.mark("commit")
+    finally:
+        db.close()
+
+
+log_writer = None
+if PREDICTION_LOG_MODE != "sync":
+    log_writer = PredictionLogWriter(
+        write_prediction_logs,
+        durability=PREDICTION_LOG_MODE,
+        max_queue=int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv("PREDICTION_LOG_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL", "0.5")),
+        enqueue_timeout=float(os.getenv("PREDICTION_LOG_ENQUEUE_TIMEOUT", "1.0")),
+    )
+
+
+async def write_prediction_logs_async(request_rows: list[dict], result_rows: list[dict]) -> None:
+    """Async counterpart of `write_prediction_logs`, on the asyncio engine."""
+    timer = StageTimer(DB_WRITE_STEPS)
+    vector_rows, stored_rows = storage_rows(request_rows)
+    async with AsyncSessionLocal() as db:
+        await db.connection()
+        timer.mark("checkout")
+        await db.execute(INSERT_VECTORS, vector_rows)
+        timer.mark("insert_vectors")
+        await db.execute(insert(prediction_requests), stored_rows)
+        timer.mark("insert_requests")
+        await db.execute(insert(prediction_results), result_rows)
+        timer.mark("insert_results")
+        await db.commit()
+        timer.mark("commit")
+
+
+def _log_degraded(reason: str) -> None:
+    log_breaker.record_failure()
+    DEGRADED.inc(reason)
+    logger.warning("Prediction log write skipped (%s), circuit breaker %s", reason, log_breaker.state, exc_info=True)
+
+
+def guarded_write(write, *args) -> bool:
+    """Run an in-request log write behind the circuit breaker. Returns False if it was skipped or failed."""
+    if log_breaker is None:
+        write(*args)
+        return True
+    if not log_breaker.allow():
+        DEGRADED.inc("breaker_open")
+        return False
+    try:
+        write(*args)
+    except Exception:
+        _log_degraded("write_failed")
+        return False
+    except BaseException:
+        log_breaker.abort_probe()
+        raise
+    log_breaker.record_success()
+    return True
+
+
+async def guarded_write_async(write, *args) -> bool:
+    """Async counterpart of `guarded_write`; a write slower than LOG_WRITE_TIMEOUT is cancelled and counts as failed."""
+    if log_breaker is None:
+        await write(*args)
+        return True
+    if not log_breaker.allow():
+        DEGRADED.inc("breaker_open")
+        return False
+    try:
+        await asyncio.wait_for(write(*args), LOG_WRITE_TIMEOUT or None)
+    except asyncio.TimeoutError:
+        _log_degraded("write_timeout")
+        return False
+    except Exception:
+        _log_degraded("write_failed")
+        return False
+    except BaseException:
+        # Requête annulée (client parti, arrêt du worker): ni succès ni échec, la sonde est libérée
+        log_breaker.abort_probe()
+        raise
+    log_breaker.record_success()
+    return True
+
+
+def log_predictions(request_rows: list[dict], result_rows: list[dict]) -> None:
+    """Log predictions synchronously or hand them to the write-behind writer (threadpool endpoints)."""
+    if log_writer is None:
+        guarded_write(write_prediction_logs, request_rows, result_rows)
+    else:
+        log_writer.submit(request_rows, result_rows)
+
+
+async def log_predictions_async(request_rows: list[dict], result_rows: list[dict]) -> None:
+    """Log predictions from an async endpoint without blocking the event loop."""
+    if log_writer is None:
+        await guarded_write_async(write_prediction_logs_async, request_rows, result_rows)
+    elif not log_writer.try_submit(request_rows, result_rows):
+        # File pleine: best_effort abandonne, buffered attend hors de la boucle d'événements
+        await run_in_threadpool(log_writer.submit, request_rows, result_rows)
+
+
+def worker_memory() -> dict:
+    """Memory report of this worker plus the bytes of the active model that are mmapped vs private."""
+    m = registry.active
+    footprint = array_footprint(m.model, m.scaler, m.predictor)
+    return {
+        **memory_report(),
+        "model_version": m.version,
+        "model_mapped_bytes": footprint["mapped_bytes"],
+        "model_private_bytes": footprint["private_bytes"],
+    }
+
+
+# Démarrage: lignes scorées par le warmup du chemin des requêtes (0 = pas de warmup), connexions ouvertes
+# d'avance dans chaque pool (sync et async), attente max de la base
+WARMUP_ROWS = int(os.getenv("WARMUP_ROWS", "64"))
+DB_POOL_PREOPEN = int(os.getenv("DB_POOL_PREOPEN", str(min(DB_POOL_SIZE, 4))))
+DB_PREOPEN_TIMEOUT = float(os.getenv("DB_PREOPEN_TIMEOUT", "5"))
+
+
+def warm_up_request_path(m: LoadedModel) -> None:
+    """
+    Run the work of a /predict and a /predict/batch request on the average row, without logging
+    it nor touching the cache or the drift statistics: Pydantic validation, single-row and matrix
+    scoring, log rows, explanation and response serialization.
+    """
+    mean = explanations.background_mean.tolist() if explanations is not None else [0.0] * N_FEATURES
+    row = dict(zip(FEATURES_ORDER, mean))
+    values = list(vars(PredictRequest.model_validate({"features": row}).features).values())
+    proba = m.predictor.proba_one(m.predictor.scale_one(values))
+    X, errors = build_batch_matrix(PredictBatchRequest(rows=[row], vectors=[values] * (WARMUP_ROWS - 1)))
+    if errors:
+        raise ValueError(f"Warmup rows rejected by the feature validator: {errors[min(errors)]}")
+    probas = m.predictor.predict_proba(X)
+    if not (0.0 <= proba <= 1.0 and np.all((probas >= 0.0) & (probas <= 1.0))):
+        raise ValueError(f"Model {m.version} produced invalid probabilities on the request path")
+    request_row, _ = _log_rows(str(uuid.uuid4()), datetime.now(timezone.utc), values, m, proba, int(proba >= m.threshold), False)
+    storage_rows([request_row])
+    explanation = None
+    if explanations is not None:
+        try:
+            explanation = _explain_rows(m, X[:1], None)[0]
+        except HTTPException:
+            pass  # modèle sans explainer: /explain répond 501
+    json_response({
+        "request_id": request_row["request_id"], "probability": proba, "prediction": int(proba >= m.threshold),
+        "threshold": m.threshold, "explanation": explanation,
+    })
+
+
+def load_and_warm_up() -> LoadedModel:
+    """Model phase of the startup: load and warm up the artifact, then the request path."""
+    with startup.phase("model_load"):
+        m = registry.start()
+    if WARMUP_ROWS > 0:
+        with startup.phase("request_warmup"):
+            warm_up_request_path(m)
+    return m
+
+
+async def preopen_database() -> None:
+    """Database phase of the startup: open DB_POOL_PREOPEN connections in each pool."""
+    if DB_POOL_PREOPEN <= 0:
+        return
+    with startup.phase("db_pool"):
+        await asyncio.wait_for(
+            asyncio.gather(
+                run_in_threadpool(preopen_pool, engine, DB_POOL_PREOPEN),
+                preopen_async_pool(async_engine, DB_POOL_PREOPEN),
+            ),
+            DB_PREOPEN_TIMEOUT,
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Modèle et pools de connexions en parallèle: le worker n'accepte du trafic qu'après
+    startup.begin()
+    model_phase, db_phase = await asyncio.gather(
+        run_in_threadpool(load_and_warm_up), preopen_database(), return_exceptions=True
+    )
+    if isinstance(model_phase, BaseException):
+        raise model_phase
+    if isinstance(db_phase, BaseException):
+        # Base injoignable: le worker démarre quand même (mode dégradé, voir log_breaker)
+        startup.errors.setdefault("db_pool", f"{type(db_phase).__name__}: {db_phase}")
+        logger.warning("Database pools not pre-opened: %s", startup.errors["db_pool"])
+
+    if model_sync is not None:
+        # Version activée par /admin/models avant le (re)démarrage de ce worker
+        try:
+            with startup.phase("model_sync"):
+                await run_in_threadpool(model_sync.sync, True)
+        except Exception:
+            logger.warning("Model version not synced at startup: %s", startup.errors["model_sync"])
+        model_sync.start()
+
+    if log_writer is not None:
+        log_writer.start()
+    if drift_checkpointer is not None:
+        drift_checkpointer.start()
+    key_janitor.start()
+    if scoring_pool is not None:
+        with startup.phase("scoring_pool"):
+            await run_in_threadpool(scoring_pool.start)
+    startup.finish()
+    logger.info(
+        "Startup in %.3f s (import %.3f s): %s", startup.total_seconds, startup.import_seconds,
+        ", ".join(f"{name} {seconds:.3f} s" for name, seconds in startup.phases.items()),
+    )
+
+    # Rapport mémoire par worker (RSS / PSS / privé)
+    mem = worker_memory()
+    logger.info(
+        "Worker %s ready: rss=%.1f MB pss=%.1f MB anon=%.1f MB, model %s mapped=%d B private=%d B",
+        mem["pid"], mem.get("rss", 0) / 2**20, mem.get("pss", 0) / 2**20, mem.get("anon", 0) / 2**20,
+        mem["model_version"], mem["model_mapped_bytes"], mem["model_private_bytes"],
+    )
+    yield
+    # Plus prêt: l'orchestrateur cesse d'envoyer du trafic pendant l'arrêt
+    startup.stopping = True
+    # Vide la file avant l'arrêt du process
+    if log_writer is not None:
+        log_writer.stop()
+    key_janitor.stop()
+    if model_sync is not None:
+        model_sync.stop()
+    if scoring_pool is not None:
+        await run_in_threadpool(scoring_pool.shutdown)
+    # Supprime la ligne de drift du worker: les autres ne fusionnent plus ses statistiques
+    if drift_checkpointer is not None:
+        await run_in_threadpool(drift_checkpointer.stop)
+    await async_engine.dispose()
 
-FEATURES_ORDER = list(model.feature_names_in_)
 
 app = FastAPI(
     title="HRPredict API",
@@ -32,9 +497,91 @@ app = FastAPI(
         "All predictions are logged in the database for traceability."
     ),
     contact={"name": "Basile GUERIN", "email": "basile.guerin1@gmail.com"},
+    lifespan=lifespan,
 )
 
 
+def _pool_gauge(attr: str):
+    def read():
+        for name, eng in (("sync", engine), ("async", async_engine)):
+            pool = eng.sync_engine.pool if hasattr(eng, "sync_engine") else eng.pool
+            fn = getattr(pool, attr, None)
+            if fn is not None:
+                yield {"engine": name}, fn()
+    return read
+
+
+def _writer_stat(key: str):
+    return lambda: log_writer.stats()[key] if log_writer is not None else None
+
+
+def _cache_stat(key: str):
+    return lambda: prediction_cache.stats()[key]
+
+
+metrics.gauge("hrpredict_db_pool_checked_out", "Connections currently checked out of the pool.", _pool_gauge("checkedout"))
+metrics.gauge("hrpredict_db_pool_size", "Configured pool size.", _pool_gauge("size"))
+metrics.gauge("hrpredict_db_pool_overflow", "Overflow connections currently open.", _pool_gauge("overflow"))
+metrics.gauge("hrpredict_prediction_cache_size", "Entries in the prediction cache.", _cache_stat("size"))
+metrics.counter_fn("hrpredict_prediction_cache_hits_total", "Prediction cache hits since start.", _cache_stat("hits"))
+metrics.counter_fn("hrpredict_prediction_cache_misses_total", "Prediction cache misses since start.", _cache_stat("misses"))
+metrics.counter_fn(
+    "hrpredict_prediction_cache_evictions_total", "Prediction cache evictions since start.", _cache_stat("evictions")
+)
+metrics.gauge(
+    "hrpredict_microbatch_pending", "Rows waiting in the micro-batcher.",
+    lambda: microbatcher.stats()["pending"] if microbatcher is not None else None,
+)
+metrics.gauge(
+    "hrpredict_scoring_pool_workers_alive", "Scoring pool processes alive.",
+    lambda: scoring_pool.alive() if scoring_pool is not None else None,
+)
+metrics.gauge(
+    "hrpredict_scoring_pool_pending_blocks", "Blocks submitted to the scoring pool and not finished yet.",
+    lambda: scoring_pool.pending if scoring_pool is not None else None,
+)
+metrics.gauge("hrpredict_log_queue_depth", "Prediction log items waiting in the write-behind queue.", _writer_stat("queue_depth"))
+metrics.counter_fn("hrpredict_log_dropped_total", "Prediction logs dropped by the write-behind writer.", _writer_stat("dropped"))
+metrics.counter_fn("hrpredict_log_failed_total", "Prediction logs whose database write failed.", _writer_stat("failed"))
+
+metrics.gauge(
+    "hrpredict_admission_in_flight", "Scoring requests running in this worker.",
+    lambda: admission.stats()["in_flight"] if admission.enabled else None,
+)
+metrics.gauge(
+    "hrpredict_admission_queue_depth", "Scoring requests waiting for an admission slot.",
+    lambda: admission.stats()["queue_depth"] if admission.enabled else None,
+)
+metrics.counter_fn(
+    "hrpredict_admission_queued_total", "Scoring requests that waited in the admission queue since start.",
+    lambda: admission.stats()["queued"] if admission.enabled else None,
+)
+metrics.gauge(
+    "hrpredict_log_breaker_state", "Prediction log circuit breaker (0 closed, 1 half-open, 2 open).",
+    lambda: STATE_VALUES[log_breaker.state] if log_breaker is not None else None,
+)
+
+# Ajouté avant MetricsMiddleware: les 503 du contrôle d'admission sont comptés et chronométrés
+if admission.enabled:
+    app.add_middleware(
+        AdmissionMiddleware, controller=admission, paths=ADMISSION_PATHS, router=app.router, rejected=ADMISSION_REJECTED
+    )
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, requests=HTTP_REQUESTS, duration=HTTP_DURATION)
+
+
+@app.exception_handler(RequestValidationError)
+async def features_validation_error(request: Request, exc: RequestValidationError):
+    """Keep the historical one-line `detail` for feature errors; the Pydantic errors go in `errors`."""
+    errors = exc.errors()
+    if errors and all(len(e["loc"]) > 2 and tuple(e["loc"][:2]) == ("body", "features") for e in errors):
+        detail = summarize_errors([{**e, "loc": e["loc"][2:]} for e in errors], FEATURES_ORDER)
+        # sans `input`: la valeur refusée peut être NaN / Inf, non sérialisable en JSON
+        structured = [{k: v for k, v in e.items() if k != "input"} for e in errors]
+        return JSONResponse(status_code=422, content={"detail": detail, "errors": jsonable_encoder(structured)})
+    return await request_validation_exception_handler(request, exc)
+
+
 class MetadataResponse(BaseModel):
     features_order: list[str] = Field(
         ..., description="Ordered list of features expected by the model."
@@ -45,12 +592,42 @@ class MetadataResponse(BaseModel):
     threshold: float = Field(
         ..., ge=0.0, le=1.0, description="Decision threshold used by the model."
     )
+    model_version: str = Field(
+        ..., description="Version (artifact hash) of the model currently served."
+    )
+    schema_hash: str = Field(
+        ..., description="Fingerprint of `features_order`, to send with positional payloads."
+    )
+    input_formats: list[str] = Field(
+        ..., description="Content types accepted by `/predict/vector` and `/predict/vectors`."
+    )
+
+
+class LivenessResponse(BaseModel):
+    status: str = Field("alive", description="Always `alive`: the process answers HTTP.")
+    pid: int = Field(..., description="Id of the answering worker process.")
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool = Field(..., description="The model is loaded and warmed up, and the worker is not shutting down.")
+    model_version: Optional[str] = Field(None, description="Version of the served model, once loaded.")
+    model_load_seconds: Optional[float] = Field(None, description="Time spent loading the model artifact.")
+    model_warmup_seconds: Optional[float] = Field(None, description="Time spent in the model warmup.")
+    import_seconds: Optional[float] = Field(None, description="Time spent importing the API module.")
+    startup_seconds: Optional[float] = Field(None, description="Duration of the startup phase (lifespan), once done.")
+    phases: Dict[str, float] = Field(default_factory=dict, description="Duration of each startup phase, in seconds.")
+    errors: Dict[str, str] = Field(default_factory=dict, description="Startup phases that failed (non-fatal ones).")
+    database: str = Field(..., description="`ready` (pools pre-opened), `unavailable` or `not_checked`.")
+    log_breaker: Optional[str] = Field(None, description="State of the prediction log circuit breaker.")
 
 
 class PredictRequest(BaseModel):
-    features: Dict[str, float] = Field(
+    features: FeaturesModel = Field(
         ...,
-        description="Mapping feature_name -> value. Must include all expected features.",
+        description=(
+            "Mapping feature_name -> value. Must include exactly the expected features, "
+            "as finite numbers."
+        ),
     )
 
     model_config = {
@@ -109,11 +686,397 @@ class PredictRequest(BaseModel):
     }
 
 
+class FeatureContribution(BaseModel):
+    feature: str
+    value: float = Field(..., description="Input value of the feature.")
+    contribution: float = Field(
+        ..., description="Effect of the feature on the log-odds, relative to the average employee."
+    )
+
+
+class Explanation(BaseModel):
+    base_value: float = Field(
+        ..., description="Log-odds of the average employee of the training dataset (the background)."
+    )
+    contributions: list[FeatureContribution] = Field(
+        ...,
+        description=(
+            "Per-feature contributions, largest magnitude first. With all features, "
+            "`base_value + sum(contribution)` is the log-odds of `probability`."
+        ),
+    )
+
+
 class PredictResponse(BaseModel):
     request_id: str = Field(..., description="Unique id of the prediction request stored in DB.")
     probability: float = Field(..., ge=0.0, le=1.0, description="Predicted probability of attrition.")
     prediction: int = Field(..., description="Binary decision using the configured threshold (0/1).")
     threshold: float = Field(..., ge=0.0, le=1.0, description="Decision threshold used for prediction.")
+    explanation: Optional[Explanation] = Field(None, description="Feature attributions (`explain=true` only).")
+
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool = Field(..., description="Whether the prediction cache is active.")
+    model_version: Optional[str] = Field(None, description="Model version the cached entries belong to.")
+    size: int = Field(..., description="Current number of cached entries.")
+    maxsize: int = Field(..., description="Maximum number of entries (LRU eviction beyond).")
+    ttl: Optional[float] = Field(None, description="Entry time-to-live in seconds (null = no expiry).")
+    hits: int = Field(..., description="Number of cache hits.")
+    misses: int = Field(..., description="Number of cache misses.")
+    hit_rate: float = Field(..., ge=0.0, le=1.0, description="hits / (hits + misses).")
+    evictions: int = Field(..., description="Entries evicted by the LRU policy.")
+    expirations: int = Field(..., description="Entries dropped because their TTL expired.")
+    invalidations: int = Field(..., description="Full invalidations caused by a model version change.")
+
+
+class ModelVersionInfo(BaseModel):
+    version: str = Field(..., description="Artifact version (first 12 hex chars of its sha256).")
+    path: str = Field(..., description="Artifact file name in the model directory.")
+    status: str = Field(..., description="available, loading, ready or failed.")
+    active: bool = Field(..., description="Whether this version currently serves predictions.")
+    error: Optional[str] = Field(None, description="Load or warmup error, if the version failed.")
+    load_seconds: Optional[float] = Field(None, description="Time spent loading the artifact.")
+    activated_at: Optional[datetime] = Field(None, description="Last activation time (UTC).")
+
+
+# Un run de scoring ne lance jamais plus de processus que la machine n'a de cœurs
+MAX_SCORING_JOB_WORKERS = os.cpu_count() or 1
+
+
+class ScoringJobRequest(BaseModel):
+    mode: Literal["full", "incremental"] = Field(
+        "full", description="full: score every employee; incremental: only rows updated since the last successful run."
+    )
+    chunk_size: int = Field(DEFAULT_CHUNK_SIZE, ge=1, description="Rows fetched from the server-side cursor per chunk.")
+    workers: int = Field(
+        1, ge=1, le=MAX_SCORING_JOB_WORKERS,
+        description="Processes used to score chunks (1 = in the API process, at most the host's CPU count).",
+    )
+
+
+class ScoringRunInfo(BaseModel):
+    run_id: str = Field(..., description="Run identifier (also the scoring_runs primary key).")
+    model_version: str = Field(..., description="Model version used to score.")
+    mode: str = Field(..., description="full or incremental.")
+    status: str = Field(..., description="running, succeeded or failed.")
+    rows_read: int = Field(..., description="Employees read so far.")
+    rows_scored: int = Field(..., description="Scores written to employee_scores so far.")
+    rows_skipped: int = Field(..., description="Employees skipped because a feature is missing or not numeric.")
+    rows_per_sec: float = Field(..., description="Scoring throughput so far.")
+    since: Optional[datetime] = Field(None, description="Incremental lower bound (watermark of the previous run).")
+    watermark: Optional[datetime] = Field(None, description="Latest updated_at read by this run.")
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class WorkerMemoryResponse(BaseModel):
+    pid: int = Field(..., description="Process id of the worker that answered.")
+    rss: Optional[int] = Field(None, description="Resident set size in bytes (shared pages counted in full; Linux only).")
+    peak_rss: Optional[int] = Field(None, description="Peak resident set size in bytes, reported instead of rss outside Linux.")
+    pss: Optional[int] = Field(None, description="Proportional set size in bytes (shared pages split between processes).")
+    private: Optional[int] = Field(None, description="Private (non-shared) resident bytes.")
+    shared: Optional[int] = Field(None, description="Shared resident bytes.")
+    anon: Optional[int] = Field(None, description="Anonymous (not file-backed) resident bytes: the real per-worker cost.")
+    model_version: str = Field(..., description="Active model version.")
+    model_mapped_bytes: int = Field(..., description="Model array bytes memory-mapped from the artifact (shared).")
+    model_private_bytes: int = Field(..., description="Model array bytes copied in this process.")
+
+
+class DriftFeatureInfo(BaseModel):
+    feature: str
+    count: int = Field(..., description="Rows observed.")
+    mean: Optional[float] = Field(None, description="Running mean of the observed values.")
+    std: Optional[float] = Field(None, description="Running standard deviation of the observed values.")
+    reference_mean: float
+    reference_std: float
+    mean_shift: Optional[float] = Field(None, description="(mean - reference_mean) / reference_std.")
+    psi: Optional[float] = Field(None, description="Population Stability Index over the reference bins.")
+    ks: Optional[float] = Field(None, description="Kolmogorov-Smirnov statistic on the binned distributions.")
+    status: str = Field(..., description="no_data, stable (PSI < 0.1), moderate (< 0.25) or significant.")
+
+
+class DriftReport(BaseModel):
+    scope: str = Field(..., description="worker (this process only) or all (merged with the other workers' checkpoints).")
+    instance_id: str = Field(..., description="Worker that answered.")
+    n_observations: int = Field(..., description="Rows observed in this scope.")
+    reference_rows: int = Field(..., description="Rows of the reference dataset.")
+    reference_fingerprint: str = Field(..., description="Fingerprint of the reference bins (checkpoints must match it).")
+    max_psi: Optional[float] = None
+    n_drifting: int = Field(..., description="Features with a significant PSI (> 0.25).")
+    features: list[DriftFeatureInfo] = Field(..., description="Per-feature statistics, highest PSI first.")
+
+
+class PredictBatchRequest(BaseModel):
+    rows: Optional[list[Dict[str, Any]]] = Field(
+        None,
+        description="List of mappings feature_name -> value (same format as `/predict`).",
+    )
+    vectors: Optional[list[list[Any]]] = Field(
+        None,
+        description="List of positional rows, values given in `features_order` order (see `/metadata`).",
+    )
+    schema_hash: Optional[str] = Field(
+        None,
+        description="`schema_hash` from `/metadata`; if given, the batch is refused (409) when it does not match.",
+    )
+
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the row in the submitted batch.")
+    request_id: Optional[str] = Field(None, description="Id of the logged prediction request (valid rows only).")
+    probability: Optional[float] = Field(None, ge=0.0, le=1.0, description="Predicted probability of attrition.")
+    prediction: Optional[int] = Field(None, description="Binary decision using the configured threshold (0/1).")
+    error: Optional[str] = Field(None, description="Validation error for this row, if any.")
+    explanation: Optional[Explanation] = Field(None, description="Feature attributions (`explain=true` only).")
+
+
+class PredictBatchResponse(BaseModel):
+    threshold: float = Field(..., ge=0.0, le=1.0, description="Decision threshold used for prediction.")
+    n_rows: int = Field(..., description="Number of rows received.")
+    n_scored: int = Field(..., description="Number of rows successfully scored and logged.")
+    n_errors: int = Field(..., description="Number of rows rejected by validation.")
+    results: list[BatchItemResult] = Field(..., description="Per-row results, in input order.")
+
+
+class ScoringPoolWorker(BaseModel):
+    blocks: int = Field(..., description="Blocks scored by this process.")
+    rows: int = Field(..., description="Rows scored by this process.")
+    busy_seconds: float = Field(..., description="Time spent scoring (attach + predict_proba).")
+    rows_per_sec: float = Field(..., description="rows / busy_seconds.")
+
+
+class ScoringPoolStats(BaseModel):
+    enabled: bool = Field(..., description="Whether large batches are scored by a process pool (SCORING_POOL_WORKERS > 0).")
+    workers: int = Field(0, description="Configured processes.")
+    alive: int = Field(0, description="Processes currently alive.")
+    healthy: bool = Field(False, description="Every configured process is alive.")
+    min_rows: Optional[int] = Field(None, description="Batches with fewer rows are scored in the API process.")
+    pending_blocks: int = Field(0, description="Blocks queued or being scored.")
+    batches: int = Field(0, description="Batches scored by the pool.")
+    blocks: int = Field(0, description="Blocks scored by the pool (one per worker and batch).")
+    rows: int = Field(0, description="Rows scored by the pool.")
+    fallbacks: int = Field(0, description="Batches scored in-process because the pool broke.")
+    restarts: int = Field(0, description="Times the pool was recreated after a worker died.")
+    per_worker: Dict[str, ScoringPoolWorker] = Field(default_factory=dict, description="Throughput by worker pid.")
+
+
+class PredictionRecord(BaseModel):
+    request_id: str = Field(..., description="Id returned by the prediction endpoint.")
+    probability: float
+    prediction: int
+    threshold: float
+    predicted_at: datetime
+    cached: bool = Field(..., description="Whether the probability came from the prediction cache.")
+    model_version: Optional[str] = None
+    requested_at: datetime
+    input_features: Optional[Dict[str, Any]] = Field(None, description="Features sent to the model.")
+
+
+class PredictionPage(BaseModel):
+    items: list[PredictionRecord] = Field(..., description="Predictions, newest first.")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to get the next page (null on the last page).")
+
+
+class SweepAxis(BaseModel):
+    feature: str = Field(..., description="Feature to vary (name from `features_order`).")
+    values: Optional[list[float]] = Field(
+        None, description=f"Explicit grid values (1 to {sweep.MAX_AXIS_POINTS})."
+    )
+    start: Optional[float] = Field(None, description="First value of an evenly spaced grid.")
+    stop: Optional[float] = Field(None, description="Last value of an evenly spaced grid.")
+    steps: Optional[int] = Field(
+        None, ge=1, le=sweep.MAX_AXIS_POINTS, description="Number of points of an evenly spaced grid."
+    )
+
+
+class PredictSweepRequest(BaseModel):
+    features: FeaturesModel = Field(..., description="Base feature set (same format as `/predict`).")
+    axes: list[SweepAxis] = Field(
+        ..., min_length=1, max_length=2, description="One axis (curve) or two axes (surface)."
+    )
+
+
+class SweepAxisResult(BaseModel):
+    feature: str
+    values: list[float]
+
+
+class PredictSweepResponse(BaseModel):
+    sweep_id: str = Field(..., description="Id of the summary row logged in `prediction_sweeps`.")
+    model_version: str
+    threshold: float = Field(..., ge=0.0, le=1.0, description="Decision threshold used by the model.")
+    base_probability: float = Field(..., ge=0.0, le=1.0, description="Probability of the unmodified base row.")
+    axes: list[SweepAxisResult] = Field(..., description="Grid of each axis, in request order.")
+    probabilities: list[float] | list[list[float]] = Field(
+        ...,
+        description=(
+            "Probability at each grid point: a list for one axis, a matrix for two axes "
+            "(`probabilities[i][j]` for `axes[0].values[i]` and `axes[1].values[j]`)."
+        ),
+    )
+
+
+class ExplainResponse(BaseModel):
+    model_version: str = Field(..., description="Version of the model explained.")
+    probability: float = Field(..., ge=0.0, le=1.0, description="Predicted probability of attrition.")
+    prediction: int = Field(..., description="Binary decision using the configured threshold (0/1).")
+    threshold: float = Field(..., ge=0.0, le=1.0, description="Decision threshold used for prediction.")
+    explanation: Explanation
+
+
+class ExplainBatchRequest(BaseModel):
+    rows: list[FeaturesModel] = Field(
+        ..., min_length=1, description="Feature mappings to explain (same format as `/predict`)."
+    )
+
+
+class ExplainBatchItem(BaseModel):
+    probability: float = Field(..., ge=0.0, le=1.0, description="Predicted probability of attrition.")
+    prediction: int = Field(..., description="Binary decision using the configured threshold (0/1).")
+    explanation: Explanation
+
+
+class ExplainBatchResponse(BaseModel):
+    model_version: str = Field(..., description="Version of the model explained.")
+    threshold: float = Field(..., ge=0.0, le=1.0, description="Decision threshold used for prediction.")
+    results: list[ExplainBatchItem] = Field(..., description="One explanation per row, in input order.")
+
+
+def score_matrix(X: np.ndarray, m: Optional[LoadedModel] = None) -> np.ndarray:
+    """Scale and score a (n_rows, n_features) matrix ordered like FEATURES_ORDER."""
+    m = m or registry.active
+    if scoring_pool is not None and scoring_pool.should_offload(X.shape[0]):
+        return scoring_pool.predict_proba(m, X)
+    return m.predictor.predict_proba(X)
+
+
+def build_batch_matrix(data: PredictBatchRequest) -> tuple[np.ndarray, dict[int, str]]:
+    """
+    Build the feature matrix of a batch and collect per-row validation errors.
+
+    Rows in error are left as NaN in the matrix and reported in the returned dict
+    (row index -> message); they must not be scored.
+    """
+    rows = data.rows or []
+    vectors = data.vectors or []
+    X = np.full((len(rows) + len(vectors), N_FEATURES), np.nan, dtype=float)
+    errors: dict[int, str] = {}
+
+    # Même validateur compilé que /predict, ligne par ligne pour garder des erreurs par ligne
+    checks = [(feature_validator.row, row) for row in rows] + [(feature_validator.vector, vec) for vec in vectors]
+    for i, (check, payload) in enumerate(checks):
+        values, err = check(payload)
+        if err:
+            errors[i] = err
+        else:
+            X[i] = values
+
+    return X, errors
+
+
+def vectors_matrix(vectors: list) -> tuple[np.ndarray, dict[int, str]]:
+    """Feature matrix of positional rows; same checks as `build_batch_matrix`, vectorized when possible."""
+    try:
+        X = np.asarray(vectors)
+    except ValueError:  # lignes de longueurs différentes
+        X = None
+    if (
+        X is None or X.ndim != 2 or X.shape[1] != N_FEATURES or X.dtype.kind not in "iuf"
+        # np.asarray convertit un booléen mêlé à des nombres en 0/1: le validateur strict le refuse
+        or not set(map(type, chain.from_iterable(vectors))) <= {int, float}
+    ):
+        # Cas irrégulier: contrôle ligne à ligne avec les messages habituels
+        return build_batch_matrix(PredictBatchRequest.model_construct(rows=None, vectors=vectors))
+    X = X.astype(float, copy=False)
+    return X, feature_validator.matrix_errors(X, {})
+
+
+def arrow_matrix(table) -> tuple[np.ndarray, dict[int, str]]:
+    """Feature matrix of an Arrow table with one numeric column per feature (extra columns ignored)."""
+    import pyarrow as pa
+
+    missing = [f for f in FEATURES_ORDER if f not in table.column_names]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing features: {missing}")
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    invalid = [f for f in FEATURES_ORDER if not any(is_t(table.schema.field(f).type) for is_t in numeric)]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Invalid values for features: {invalid}")
+
+    X = np.empty((table.num_rows, N_FEATURES), dtype=float, order="F")
+    for j, f in enumerate(FEATURES_ORDER):
+        # valeurs nulles -> NaN, signalées ligne par ligne
+        X[:, j] = table.column(f).cast(pa.float64()).to_numpy(zero_copy_only=False)
+    return X, feature_validator.matrix_errors(X, {})
+
+
+def _check_schema_hash(value: Optional[str]) -> None:
+    if value is not None and value != SCHEMA_HASH:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Schema hash mismatch: got {value}, expected {SCHEMA_HASH} (see /metadata features_order).",
+        )
+
+
+def _check_vectors_size(n_rows: int) -> None:
+    if n_rows == 0:
+        raise HTTPException(status_code=422, detail="Empty batch: provide at least one vector.")
+    if n_rows > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {n_rows} rows (max {MAX_BATCH_ROWS}).")
+
+
+async def _decode_body(request: Request):
+    try:
+        return codecs.decode(await request.body(), request.headers.get("content-type"))
+    except codecs.UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get(
+    "/health/live",
+    response_model=LivenessResponse,
+    summary="Liveness probe",
+    description="Answers 200 as soon as the process serves HTTP, without touching the model or the database.",
+)
+def health_live():
+    return {"status": "alive", "pid": os.getpid()}
+
+
+@app.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse, "description": "Model not loaded yet, or worker shutting down."}},
+    summary="Readiness probe with startup timings",
+    description=(
+        "200 once the model is loaded and warmed up, 503 before that and while the worker shuts down. "
+        "Also reports the import and startup phase durations of the answering worker and whether its "
+        "database pools could be pre-opened (an unreachable database does not make the worker unready: "
+        "predictions are then served without their log, see the log circuit breaker)."
+    ),
+)
+def health_ready(response: Response):
+    ready = registry.ready and not startup.stopping
+    m = registry.active if registry.ready else None
+    if "db_pool" in startup.errors:
+        database = "unavailable"
+    elif "db_pool" in startup.phases:
+        database = "ready"
+    else:
+        database = "not_checked"
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "model_version": m.version if m is not None else None,
+        "model_load_seconds": m.load_seconds if m is not None else None,
+        "model_warmup_seconds": registry.warmup_seconds,
+        **startup.as_dict(),
+        "database": database,
+        "log_breaker": log_breaker.state if log_breaker is not None else None,
+    }
 
 
 @app.get(
@@ -130,13 +1093,52 @@ class PredictResponse(BaseModel):
     ),
 )
 def metadata():
+    m = registry.active
     return {
         "features_order": [str(x) for x in FEATURES_ORDER],
-        "cols_to_scale": [str(x) for x in cols_to_scale],
-        "threshold": float(threshold),
+        "cols_to_scale": [str(x) for x in m.cols_to_scale],
+        "threshold": float(m.threshold),
+        "model_version": m.version,
+        "schema_hash": SCHEMA_HASH,
+        "input_formats": codecs.available_formats(),
     }
 
 
+@app.get(
+    "/cache/stats",
+    response_model=CacheStatsResponse,
+    summary="Get prediction cache statistics",
+    description=(
+        "Returns the state of the in-process prediction cache used by `/predict`.\n\n"
+        "Identical feature vectors scored by the same model version are served from the cache. "
+        "Cache hits are still logged, with `cached = true` in `prediction_results`."
+    ),
+)
+def cache_stats():
+    return prediction_cache.stats()
+
+
+IDEMPOTENCY_KEY_DOC = (
+    "Client-chosen key (e.g. a UUID) making retries safe: a request repeated with the same key and "
+    "payload returns the original `request_id` and result, with the `Idempotent-Replayed: true` header, "
+    "without being scored or logged again. Keys expire after `IDEMPOTENCY_TTL` seconds."
+)
+IDEMPOTENCY_REUSED = "Idempotency-Key already used with a different payload"
+
+
+EXPLAIN_DOC = "Also return the per-feature attributions of the probability (see `/explain`)."
+TOP_DOC = "Only return the `top` largest contributions (all features by default)."
+
+
+def json_response(content: dict, headers: Optional[dict] = None) -> Response:
+    """
+    JSON body encoded by orjson (see api/codecs.py). The scoring routes build their responses
+    themselves, so FastAPI's re-validation against the response model is skipped; the model
+    still documents the route.
+    """
+    return Response(codecs.encode(content, codecs.JSON), media_type=codecs.JSON, headers=headers)
+
+
 @app.post(
     "/predict",
     response_model=PredictResponse,
@@ -146,89 +1148,918 @@ def metadata():
         "This endpoint logs:\n"
         "- the input features to `prediction_requests`\n"
         "- the output to `prediction_results`\n"
-        "to ensure full traceability."
+        "to ensure full traceability.\n\n"
+        "With `explain=true`, the response also carries the feature attributions of `/explain`."
     ),
 )
-def predict(data: PredictRequest):
-    db = SessionLocal()
+async def predict(
+    data: PredictRequest,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, description=IDEMPOTENCY_KEY_DOC),
+    explain: bool = Query(False, description=EXPLAIN_DOC),
+    top: Optional[int] = Query(None, ge=1, description=TOP_DOC),
+):
+    # Depuis l'arrivée de la requête: lecture du corps, JSON et validation Pydantic
+    timer = StageTimer(PREDICT_STAGES, "predict", start=getattr(request.state, "started_at", None))
+    timer.mark("parse")
 
-    try:
-        # Vérification features
-        missing = [f for f in FEATURES_ORDER if f not in data.features]
-        if missing:
-            raise HTTPException(status_code=422, detail=f"Missing features: {missing}")
+    # Payload déjà validé par le modèle généré (présence, type, finitude, bornes)
+    values = list(vars(data.features).values())
+    m = registry.active
+    if explain:
+        _explainer(m)  # 501 / 503 avant tout scoring ni log
+    timer.mark("validate")
+    result, replayed = await _predict_request(m, values, timer, idempotency_key)
+    if explain:
+        result = {**result, "explanation": _explain_one(m, values, top)}
+        timer.mark("explain")
+    return json_response(result, headers={"Idempotent-Replayed": "true"} if replayed else None)
 
-        # Validation valeurs: pas de None / NaN / Inf / non-castable
-        invalid = []
-        for f in FEATURES_ORDER:
-            v = data.features.get(f)
 
-            if v is None:
-                invalid.append(f)
-                continue
+async def _predict_request(
+    m: LoadedModel, values: list, timer: StageTimer, idempotency_key: Optional[str]
+) -> tuple[dict, bool]:
+    """Score one row, or replay the response stored under `idempotency_key`. Returns (payload, replayed)."""
+    if idempotency_key is None:
+        return await _predict_values(m, values, timer), False
 
-            try:
-                fv = float(v)
-            except (TypeError, ValueError):
-                invalid.append(f)
-                continue
+    err = validate_key(idempotency_key)
+    if err:
+        raise HTTPException(status_code=400, detail=err)
+    # Empreinte du payload = adresse du vecteur dans feature_vectors
+    fingerprint = features_digest(values)
+    while True:
+        try:
+            owner, fut = idempotency_store.begin(idempotency_key, fingerprint)
+        except IdempotencyKeyReused:
+            raise HTTPException(status_code=422, detail=IDEMPOTENCY_REUSED)
+        if not owner:
+            # Doublon concurrent (ou rejeu récent) dans ce worker: on attend la première requête
+            result = await asyncio.shield(fut)
+            if result is not None:
+                timer.mark("idempotency_replay")
+                return result, True
+            continue  # la première requête a échoué: on retente
+        try:
+            result, replayed = await _predict_keyed_guarded(m, values, timer, idempotency_key, fingerprint)
+        except BaseException:
+            idempotency_store.abandon(idempotency_key)
+            raise
+        idempotency_store.complete(idempotency_key, result)
+        return result, replayed
 
-            if not math.isfinite(fv):
-                invalid.append(f)
 
-        if invalid:
-            raise HTTPException(status_code=422, detail=f"Invalid values for features: {invalid}")
+async def _predict_keyed_guarded(
+    m: LoadedModel, values: list, timer: StageTimer, key: str, fingerprint: bytes
+) -> tuple[dict, bool]:
+    """
+    `_predict_keyed` behind the log circuit breaker. A key is only honoured through the database,
+    so an unhealthy database answers 503 (safe to retry with the same key) rather than a
+    prediction that a retry could not replay.
+    """
+    if log_breaker is None:
+        return await _predict_keyed(m, values, timer, key, fingerprint)
+    if not log_breaker.allow():
+        ADMISSION_REJECTED.inc("breaker_open")
+        raise _database_unavailable()
+    try:
+        result = await asyncio.wait_for(_predict_keyed(m, values, timer, key, fingerprint), LOG_WRITE_TIMEOUT or None)
+    except HTTPException:
+        log_breaker.record_success()  # 422: la base a répondu
+        raise
+    except asyncio.TimeoutError:
+        log_breaker.record_failure()
+        raise _database_unavailable()
+    except Exception:
+        log_breaker.record_failure()
+        logger.warning("Idempotent prediction failed on the database", exc_info=True)
+        raise _database_unavailable()
+    except BaseException:
+        log_breaker.abort_probe()
+        raise
+    log_breaker.record_success()
+    return result
+
+
+def _database_unavailable() -> HTTPException:
+    retry_after = max(1, math.ceil(log_breaker.retry_after() or admission.retry_after))
+    return HTTPException(
+        status_code=503,
+        detail="Database unavailable: Idempotency-Key requests cannot be served, retry later.",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+async def _predict_keyed(
+    m: LoadedModel, values: list, timer: StageTimer, key: str, fingerprint: bytes
+) -> tuple[dict, bool]:
+    """
+    Keyed prediction against the database: replay the row stored under `key`, or score and
+    insert with the key. Written in the request path whatever PREDICTION_LOG_MODE, so that the
+    primary key of `idempotency_keys` settles races between workers (the loser reads the winner's row).
+    """
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(key_lookup_query(key))).first()
+        timer.mark("idempotency_lookup")
+        if row is not None:
+            requested_at = row.requested_at if row.requested_at.tzinfo else row.requested_at.replace(tzinfo=timezone.utc)
+            if requested_at >= datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL):
+                return _replayed_response(row, fingerprint), True
+            # Clé expirée pas encore nettoyée: libérée dans la même transaction que le nouvel INSERT
+            await db.execute(release_key_stmt(key))
 
         request_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
+        proba, cached = await _score_values(m, values, timer)
+        pred = int(proba >= m.threshold)
+        request_row, result_row = _log_rows(request_id, now, values, m, proba, pred, cached)
+        vector_rows, stored_rows = storage_rows([{**request_row, "features_hash": fingerprint}])
+        try:
+            await db.execute(insert(idempotency_keys), [{"idempotency_key": key, "request_id": request_id, "requested_at": now}])
+            await db.execute(INSERT_VECTORS, vector_rows)
+            await db.execute(insert(prediction_requests), stored_rows)
+            await db.execute(insert(prediction_results), [result_row])
+            await db.commit()
+        except IntegrityError:
+            # Même clé insérée entre-temps par un autre worker
+            await db.rollback()
+            row = (await db.execute(key_lookup_query(key))).first()
+            if row is None:
+                raise
+            return _replayed_response(row, fingerprint), True
+        timer.mark("log")
 
-        # Enregistrer input
-        features_json = json.dumps(data.features, ensure_ascii=False)
-
-        db.execute(
-            text("""
-                INSERT INTO prediction_requests (request_id, input_features, requested_at)
-                VALUES (:request_id, CAST(:features AS JSONB), :requested_at)
-            """),
-            {
-                "request_id": request_id,
-                "features": features_json,
-                "requested_at": now,
-            },
-        )
+    return {"request_id": request_id, "probability": proba, "prediction": pred, "threshold": m.threshold}, False
 
-        # Préparation données
-        X = np.array([[data.features[f] for f in FEATURES_ORDER]], dtype=float)
-        X_df = pd.DataFrame(X, columns=FEATURES_ORDER)
-        X_df[cols_to_scale] = scaler.transform(X_df[cols_to_scale])
-
-        # Prédiction
-        proba = float(model.predict_proba(X_df)[0, 1])
-        pred = int(proba >= threshold)
-
-        # Enregistrer résultat
-        db.execute(
-            text("""
-                INSERT INTO prediction_results (request_id, probability, prediction, threshold, predicted_at)
-                VALUES (:request_id, :probability, :prediction, :threshold, :predicted_at)
-            """),
-            {
-                "request_id": request_id,
-                "probability": proba,
-                "prediction": pred,
-                "threshold": threshold,
-                "predicted_at": now,
-            },
-        )
 
-        db.commit()
+def _replayed_response(row, fingerprint: bytes) -> dict:
+    if row.features_hash is None or bytes(row.features_hash) != fingerprint:
+        raise HTTPException(status_code=422, detail=IDEMPOTENCY_REUSED)
+    return {
+        "request_id": str(row.request_id),
+        "probability": row.probability,
+        "prediction": row.prediction,
+        "threshold": row.threshold,
+    }
+
 
-        return {
+async def _predict_values(m: LoadedModel, values: list, timer: StageTimer) -> dict:
+    """Score one validated row (FEATURES_ORDER order), log it and build the PredictResponse payload."""
+    request_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    proba, cached = await _score_values(m, values, timer)
+    pred = int(proba >= m.threshold)
+
+    # Enregistrer input + résultat (même transaction, I/O attendue sans bloquer la boucle)
+    request_row, result_row = _log_rows(request_id, now, values, m, proba, pred, cached)
+    await log_predictions_async([request_row], [result_row])
+    timer.mark("log")
+
+    return {
+        "request_id": request_id,
+        "probability": proba,
+        "prediction": pred,
+        "threshold": m.threshold,
+    }
+
+
+async def _score_values(m: LoadedModel, values: list, timer: StageTimer) -> tuple[float, bool]:
+    """Probability of one row: cache, micro-batcher or direct scoring. Returns (probability, cached)."""
+    if drift_monitor is not None:
+        drift_monitor.observe(values)
+
+    # Cache: même vecteur + même modèle -> même probabilité
+    cache_key = canonical_key(values, m.version) if prediction_cache.enabled else None
+    proba = prediction_cache.get(cache_key) if cache_key is not None else None
+    cached = proba is not None
+    timer.mark("cache_lookup")
+
+    if not cached and microbatcher is not None:
+        # Scoré avec les autres requêtes concurrentes (attente incluse)
+        proba = await microbatcher.submit(m, values)
+        timer.mark("microbatch")
+        if cache_key is not None:
+            prediction_cache.set(cache_key, proba)
+    elif not cached:
+        # Prédiction (buffer préalloué, pas de DataFrame)
+        buf = m.predictor.scale_one(values)
+        timer.mark("scale")
+        proba = m.predictor.proba_one(buf)
+        timer.mark("predict_proba")
+        if cache_key is not None:
+            prediction_cache.set(cache_key, proba)
+    return proba, cached
+
+
+def _explainer(m: LoadedModel) -> Explainer:
+    """Explainer of `m`, or the HTTP error telling why there is none."""
+    if explanations is None:
+        raise HTTPException(status_code=503, detail="Explanations unavailable: background dataset not found")
+    try:
+        return explanations.get(m)
+    except ExplanationUnsupported as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+
+def _explain_one(m: LoadedModel, values: list, top: Optional[int]) -> dict:
+    """Explanation payload of one row (cached per canonical input)."""
+    base_value = _explainer(m).base_value
+    phi = explanations.explain_one(m, values)
+    return explanation_payloads(phi[None, :], [values], FEATURES_ORDER, base_value, top)[0]
+
+
+def _explain_rows(m: LoadedModel, X: np.ndarray, top: Optional[int]) -> list[dict]:
+    """Explanation payloads of the rows of X, attributions computed in one vectorized pass."""
+    explainer = _explainer(m)
+    return explanation_payloads(explainer.contributions(X), X, FEATURES_ORDER, explainer.base_value, top)
+
+
+def _log_rows(
+    request_id: str, now: datetime, values: list, m: LoadedModel, proba: float, pred: int, cached: bool
+) -> tuple[dict, dict]:
+    """Request (features in FEATURES_ORDER order) and result rows of one scored row, see `storage_rows`."""
+    return (
+        {
+            "request_id": request_id,
+            "features": values,
+            "requested_at": now,
+        },
+        {
+            "request_id": request_id,
+            "probability": proba,
+            "prediction": pred,
+            "threshold": m.threshold,
+            "predicted_at": now,
+            "cached": cached,
+            "model_version": m.version,
+        },
+    )
+
+
+def _score_and_log_batch(
+    m: LoadedModel, X_valid: np.ndarray, positions: list[int], results: list[dict], timer: Optional[StageTimer] = None
+) -> int:
+    """Score valid rows in one pass, log them with multi-row inserts, fill `results` in place."""
+    if drift_monitor is not None:
+        drift_monitor.observe_many(X_valid)
+    # Prédiction en un seul passage
+    probas = score_matrix(X_valid, m)
+    preds = (probas >= m.threshold).astype(int)
+    if timer is not None:
+        timer.mark("predict_proba")
+
+    now = datetime.now(timezone.utc)
+    request_rows = []
+    result_rows = []
+    vectors = X_valid.tolist()
+    for k, i in enumerate(positions):
+        request_id = str(uuid.uuid4())
+        proba = float(probas[k])
+        pred = int(preds[k])
+        request_rows.append({
+            "request_id": request_id,
+            "features": vectors[k],
+            "requested_at": now,
+        })
+        result_rows.append({
             "request_id": request_id,
             "probability": proba,
             "prediction": pred,
-            "threshold": threshold,
+            "threshold": m.threshold,
+            "predicted_at": now,
+            "cached": False,
+            "model_version": m.version,
+        })
+        results[i].update(request_id=request_id, probability=proba, prediction=pred)
+
+    # Enregistrement: un INSERT multi-lignes par table, un seul commit
+    log_predictions(request_rows, result_rows)
+    if timer is not None:
+        timer.mark("log")
+
+    return len(result_rows)
+
+@app.post(
+    "/predict/batch",
+    response_model=PredictBatchResponse,
+    summary="Predict attrition risk for a batch of employees",
+    description=(
+        "Scores many employees in a single call.\n\n"
+        "Rows can be sent as feature maps (`rows`, same format as `/predict`) and/or as "
+        "positional vectors in `features_order` order (`vectors`). Results are returned in "
+        "input order: `rows` first, then `vectors`.\n\n"
+        "All rows are validated together, then scaled and scored in one vectorized pass. "
+        "Invalid rows are reported individually in `error` and do not fail the batch.\n\n"
+        "Valid rows are logged to `prediction_requests` and `prediction_results` with "
+        "multi-row inserts.\n\n"
+        "With `explain=true`, each scored row also carries its feature attributions (see `/explain`)."
+    ),
+)
+def predict_batch(
+    data: PredictBatchRequest,
+    request: Request,
+    explain: bool = Query(False, description=EXPLAIN_DOC),
+    top: Optional[int] = Query(None, ge=1, description=TOP_DOC),
+):
+    timer = StageTimer(PREDICT_STAGES, "predict_batch", start=getattr(request.state, "started_at", None))
+    timer.mark("parse")
+
+    n_rows = len(data.rows or []) + len(data.vectors or [])
+    if n_rows == 0:
+        raise HTTPException(status_code=422, detail="Empty batch: provide `rows` and/or `vectors`.")
+    if n_rows > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {n_rows} rows (max {MAX_BATCH_ROWS}).")
+
+    _check_schema_hash(data.schema_hash)
+
+    X, errors = build_batch_matrix(data)
+    valid_idx = np.array([i for i in range(n_rows) if i not in errors], dtype=int)
+
+    m = registry.active
+    if explain:
+        _explainer(m)
+    results = [
+        {"index": i, "request_id": None, "probability": None, "prediction": None, "error": errors.get(i), "explanation": None}
+        for i in range(n_rows)
+    ]
+    timer.mark("validate")
+    n_scored = 0
+    if valid_idx.size:
+        n_scored = _score_and_log_batch(m, X[valid_idx], valid_idx.tolist(), results, timer)
+        if explain:
+            for i, explanation in zip(valid_idx.tolist(), _explain_rows(m, X[valid_idx], top)):
+                results[i]["explanation"] = explanation
+            timer.mark("explain")
+
+    return json_response({
+        "threshold": m.threshold,
+        "n_rows": n_rows,
+        "n_scored": n_scored,
+        "n_errors": len(errors),
+        "results": results,
+    })
+
+
+COMPACT_BODY_DOC = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            codecs.JSON: {"schema": {"type": "object"}},
+            codecs.MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+
+@app.post(
+    "/predict/vector",
+    response_model=PredictResponse,
+    summary="Predict attrition risk from a positional vector",
+    description=(
+        "Compact variant of `/predict` for high-volume clients.\n\n"
+        "Body: `{\"vector\": [...], \"schema_hash\": \"...\"}` with the values in `features_order` "
+        "order and the `schema_hash` returned by `/metadata` (409 if it does not match), as JSON or "
+        "MessagePack (`Content-Type: application/msgpack`). The response has the `/predict` fields, "
+        "encoded as MessagePack when `Accept: application/msgpack`."
+    ),
+    openapi_extra=COMPACT_BODY_DOC,
+)
+async def predict_vector(
+    request: Request, idempotency_key: Optional[str] = Header(None, description=IDEMPOTENCY_KEY_DOC)
+):
+    timer = StageTimer(PREDICT_STAGES, "predict_vector", start=getattr(request.state, "started_at", None))
+    payload = await _decode_body(request)
+    timer.mark("parse")
+
+    if not isinstance(payload, dict) or not isinstance(payload.get("vector"), list):
+        raise HTTPException(status_code=422, detail="Body must be an object with a `vector` list and a `schema_hash`.")
+    if "schema_hash" not in payload:
+        raise HTTPException(status_code=422, detail="Missing `schema_hash` (see /metadata).")
+    _check_schema_hash(payload["schema_hash"])
+
+    vector = payload["vector"]
+    if len(vector) != N_FEATURES:
+        raise HTTPException(
+            status_code=422, detail=f"Expected {N_FEATURES} values in features_order order, got {len(vector)}"
+        )
+    values, err = feature_validator.vector(vector)
+    if err:
+        raise HTTPException(status_code=422, detail=err)
+    timer.mark("validate")
+
+    result, replayed = await _predict_request(registry.active, values, timer, idempotency_key)
+    mt = codecs.negotiate(request.headers.get("accept"))
+    return Response(
+        codecs.encode(result, mt), media_type=mt, headers={"Idempotent-Replayed": "true"} if replayed else None
+    )
+
+
+@app.post(
+    "/predict/vectors",
+    response_model=PredictBatchResponse,
+    summary="Predict attrition risk for a batch of positional vectors",
+    description=(
+        "Compact variant of `/predict/batch`.\n\n"
+        "- JSON or MessagePack: `{\"vectors\": [[...], ...], \"schema_hash\": \"...\"}` "
+        "(values in `features_order` order, `schema_hash` from `/metadata`).\n"
+        "- Arrow IPC stream (`Content-Type: application/vnd.apache.arrow.stream`): one numeric "
+        "column per feature, matched by name; an optional `schema_hash` schema metadata entry is checked.\n\n"
+        "Rows are validated, scored and logged like `/predict/batch`. The response is JSON, MessagePack "
+        "or an Arrow stream (columns `index`, `request_id`, `probability`, `prediction`, `error`) "
+        "depending on `Accept`."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                **COMPACT_BODY_DOC["requestBody"]["content"],
+                codecs.ARROW: {"schema": {"type": "string", "format": "binary"}},
+            },
         }
+    },
+)
+async def predict_vectors(request: Request):
+    timer = StageTimer(PREDICT_STAGES, "predict_vectors", start=getattr(request.state, "started_at", None))
+    content_type = codecs.media_type(request.headers.get("content-type"))
+
+    if content_type == codecs.ARROW:
+        try:
+            table = codecs.read_arrow(await request.body())
+        except codecs.UnsupportedMediaType as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        meta = table.schema.metadata or {}
+        if b"schema_hash" in meta:
+            _check_schema_hash(meta[b"schema_hash"].decode())
+        timer.mark("parse")
+        _check_vectors_size(table.num_rows)
+        X, errors = arrow_matrix(table)
+    else:
+        payload = await _decode_body(request)
+        timer.mark("parse")
+        if not isinstance(payload, dict) or not isinstance(payload.get("vectors"), list):
+            raise HTTPException(status_code=422, detail="Body must be an object with a `vectors` list and a `schema_hash`.")
+        if "schema_hash" not in payload:
+            raise HTTPException(status_code=422, detail="Missing `schema_hash` (see /metadata).")
+        _check_schema_hash(payload["schema_hash"])
+        _check_vectors_size(len(payload["vectors"]))
+        X, errors = vectors_matrix(payload["vectors"])
+
+    n_rows = X.shape[0]
+    m = registry.active
+    valid_idx = [i for i in range(n_rows) if i not in errors]
+    results = [
+        {"index": i, "request_id": None, "probability": None, "prediction": None, "error": errors.get(i), "explanation": None}
+        for i in range(n_rows)
+    ]
+    timer.mark("validate")
+    n_scored = 0
+    if valid_idx:
+        # Écriture en base bloquante: hors de la boucle d'événements
+        n_scored = await run_in_threadpool(_score_and_log_batch, m, X[valid_idx], valid_idx, results, timer)
+
+    mt = codecs.negotiate(request.headers.get("accept"), (codecs.JSON, codecs.MSGPACK, codecs.ARROW))
+    if mt == codecs.ARROW:
+        columns = {k: [r.get(k) for r in results] for k in ("index", "request_id", "probability", "prediction", "error")}
+        return Response(codecs.write_arrow(columns, {"threshold": str(m.threshold)}), media_type=mt)
+    body = {
+        "threshold": m.threshold,
+        "n_rows": n_rows,
+        "n_scored": n_scored,
+        "n_errors": len(errors),
+        "results": results,
+    }
+    return Response(codecs.encode(body, mt), media_type=mt)
+
+
+@app.post(
+    "/explain",
+    response_model=ExplainResponse,
+    summary="Explain an attrition prediction",
+    description=(
+        "Returns the probability of one employee and the contribution of each feature to it.\n\n"
+        "Contributions are exact Shapley values of the log-odds of the (linear) model against the "
+        "average employee of the training dataset: `base_value + sum(contribution)` is the log-odds "
+        "of `probability`. A positive contribution raises the risk.\n\n"
+        "Explanations are not logged. 501 when the served model is not linear."
+    ),
+)
+def explain(data: PredictRequest, top: Optional[int] = Query(None, ge=1, description=TOP_DOC)):
+    m = registry.active
+    values = list(vars(data.features).values())
+    explanation = _explain_one(m, values, top)
+    proba = m.predictor.predict_one(values)
+    return {
+        "model_version": m.version,
+        "probability": proba,
+        "prediction": int(proba >= m.threshold),
+        "threshold": m.threshold,
+        "explanation": explanation,
+    }
+
+
+@app.post(
+    "/explain/batch",
+    response_model=ExplainBatchResponse,
+    summary="Explain attrition predictions for a batch of employees",
+    description=(
+        "Batch variant of `/explain`: rows are scored and explained in one vectorized pass "
+        "(at most `MAX_BATCH_ROWS` rows). The whole batch is refused (422) if a row is invalid."
+    ),
+)
+def explain_batch(data: ExplainBatchRequest, top: Optional[int] = Query(None, ge=1, description=TOP_DOC)):
+    n_rows = len(data.rows)
+    if n_rows > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {n_rows} rows (max {MAX_BATCH_ROWS}).")
+    m = registry.active
+    X = np.array([list(vars(row).values()) for row in data.rows], dtype=float)
+    payloads = _explain_rows(m, X, top)
+    probas = score_matrix(X, m)
+    return {
+        "model_version": m.version,
+        "threshold": m.threshold,
+        "results": [
+            {"probability": p, "prediction": int(p >= m.threshold), "explanation": e}
+            for p, e in zip(probas.tolist(), payloads)
+        ],
+    }
 
+
+async def log_sweep_async(row: dict) -> None:
+    """Insert the summary row of one sweep."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(prediction_sweeps), [row])
+        await db.commit()
+
+
+@app.post(
+    "/predict/sweep",
+    response_model=PredictSweepResponse,
+    summary="What-if sensitivity of the attrition risk",
+    description=(
+        "Varies one or two features of a base row over value grids and returns the probability "
+        "curve (one axis) or surface (two axes), scored in a single vectorized pass.\n\n"
+        "Each axis gives either explicit `values` or `start`, `stop` and `steps` "
+        f"(at most {sweep.MAX_AXIS_POINTS} points per axis, `MAX_SWEEP_POINTS` in total).\n\n"
+        "A sweep is logged as one summary row in `prediction_sweeps` (base features, grids, "
+        "base / min / max probability), not as one prediction per grid point."
+    ),
+)
+async def predict_sweep(data: PredictSweepRequest, request: Request):
+    timer = StageTimer(PREDICT_STAGES, "predict_sweep", start=getattr(request.state, "started_at", None))
+    timer.mark("parse")
+
+    base = np.array(list(vars(data.features).values()), dtype=float)
+    try:
+        positions = sweep.feature_positions([a.feature for a in data.axes], FEATURES_ORDER)
+        grids = [sweep.axis_grid(a.values, a.start, a.stop, a.steps) for a in data.axes]
+    except sweep.SweepError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    shape = tuple(g.size for g in grids)
+    n_points = int(np.prod(shape))
+    if n_points > MAX_SWEEP_POINTS:
+        raise HTTPException(status_code=413, detail=f"Sweep too large: {n_points} points (max {MAX_SWEEP_POINTS}).")
+    # Bornes des features (VALIDATE_FEATURE_RANGES) appliquées aux grilles comme aux entrées
+    out_of_range = [
+        a.feature for a, p, g in zip(data.axes, positions, grids)
+        if g.min() < feature_validator.lo[p] or g.max() > feature_validator.hi[p]
+    ]
+    if out_of_range:
+        raise HTTPException(status_code=422, detail=f"Out of range values for features: {out_of_range}")
+    timer.mark("validate")
+
+    m = registry.active
+    X = sweep.grid_matrix(base, positions, grids)
+    if X.shape[0] <= SWEEP_INLINE_POINTS:
+        probas = m.predictor.predict_proba(X, copy=False)
+    else:
+        probas = await run_in_threadpool(score_matrix, X, m)
+    timer.mark("predict_proba")
+
+    base_proba = float(probas[-1])
+    surface = probas[:-1].reshape(shape)
+    axes = [{"feature": a.feature, "values": g.tolist()} for a, g in zip(data.axes, grids)]
+    sweep_id = str(uuid.uuid4())
+    await guarded_write_async(log_sweep_async, sweep.summary_row(
+        sweep_id, datetime.now(timezone.utc), dict(zip(FEATURES_ORDER, base.tolist())), axes,
+        surface, base_proba, m.threshold, m.version,
+    ))
+    timer.mark("log")
+
+    return {
+        "sweep_id": sweep_id,
+        "model_version": m.version,
+        "threshold": m.threshold,
+        "base_probability": base_proba,
+        "axes": axes,
+        "probabilities": surface.tolist(),
+    }
+
+
+NDJSON = "application/x-ndjson"
+
+
+@app.get(
+    "/predictions/{request_id}",
+    response_model=PredictionRecord,
+    summary="Get a logged prediction",
+    description=(
+        "Returns the input features and the result logged for a `request_id`.\n\n"
+        "The log is partitioned by month: without `since`/`until` the lookup probes every monthly "
+        "partition, and gets slower as partitions accumulate. Pass a range around the prediction time "
+        "(`since` inclusive, `until` exclusive) to read only the months it covers."
+    ),
+)
+def get_prediction(request_id: uuid.UUID, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    db = SessionLocal()
+    try:
+        row = db.execute(audit.prediction_query(str(request_id), since, until)).first()
+    finally:
+        db.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Unknown prediction: {request_id}")
+    return audit.row_to_item(row, FEATURES_ORDER)
+
+
+@app.get(
+    "/predictions",
+    response_model=PredictionPage,
+    summary="List logged predictions",
+    description=(
+        "Lists logged predictions, newest first, filtered by `predicted_at` range (`since` inclusive, "
+        "`until` exclusive), decision, probability band and model version.\n\n"
+        "Pagination is keyset-based: pass the `next_cursor` of a page as `cursor` to get the next one. "
+        "Every page costs the same whatever its depth.\n\n"
+        f"With `Accept: {NDJSON}` all matching rows (up to `limit` if given) are streamed, one JSON "
+        "object per line, from a server-side cursor."
+    ),
+    responses={200: {"content": {NDJSON: {}}}},
+)
+def list_predictions(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    prediction: Optional[int] = Query(None, ge=0, le=1),
+    min_probability: Optional[float] = Query(None, ge=0.0, le=1.0),
+    max_probability: Optional[float] = Query(None, ge=0.0, le=1.0),
+    model_version: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, description=f"Page size (default 100, max {audit.MAX_PAGE_SIZE}; no default when streaming)."),
+    include_features: bool = True,
+):
+    stream = NDJSON in request.headers.get("accept", "")
+    if not stream:
+        limit = min(limit or 100, audit.MAX_PAGE_SIZE)
+    filters = dict(
+        since=since, until=until, prediction=prediction, min_probability=min_probability,
+        max_probability=max_probability, model_version=model_version, cursor=cursor,
+        include_features=include_features,
+    )
+    try:
+        # Page: une ligne de plus que demandé pour savoir s'il en reste
+        stmt = audit.list_query(**filters, limit=limit if stream else limit + 1)
+    except audit.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        return StreamingResponse(_stream_predictions(stmt), media_type=NDJSON)
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(stmt).all()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = audit.encode_cursor(rows[-1].predicted_at, rows[-1].request_id)
+    return {"items": [audit.row_to_item(r, FEATURES_ORDER) for r in rows], "next_cursor": next_cursor}
+
+
+def _stream_predictions(stmt):
+    """NDJSON lines of a listing, fetched by blocks from a server-side cursor."""
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt, execution_options={"stream_results": True, "yield_per": audit.STREAM_FETCH_SIZE})
+        for rows in result.partitions():
+            yield b"".join(codecs.encode(audit.row_to_item(r, FEATURES_ORDER), codecs.JSON) + b"\n" for r in rows)
+    finally:
+        db.close()
+
+
+@app.get(
+    "/admin/models",
+    response_model=list[ModelVersionInfo],
+    summary="List model versions",
+    description=(
+        "Lists the model artifacts known to the registry (the model directory is rescanned), "
+        "with their load status and which one is active."
+    ),
+)
+def list_models():
+    registry.scan()
+    return registry.list()
+
+
+ADMIN_TOKEN_DOC = "`Bearer <ADMIN_TOKEN>`: required by the admin routes (served model, batch scoring)."
+
+
+def require_admin(authorization: Optional[str] = Header(None, description=ADMIN_TOKEN_DOC)) -> None:
+    """Guard of the admin routes: served model and batch scoring (disabled while ADMIN_TOKEN is not set)."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Administration is disabled: set ADMIN_TOKEN to enable it.")
+    expected = f"Bearer {ADMIN_TOKEN}".encode()
+    if authorization is None or not hmac.compare_digest(authorization.encode(), expected):
+        raise HTTPException(
+            status_code=401, detail="Invalid or missing admin token.", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+def _shared_state_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Database unavailable: the model version cannot be shared with the other workers, retry later.",
+    )
+
+
+@app.post(
+    "/admin/models/{version}/activate",
+    response_model=ModelVersionInfo,
+    dependencies=[Depends(require_admin)],
+    summary="Activate a model version",
+    description=(
+        "Loads the artifact in the background, warms it up on synthetic rows, then swaps it in "
+        "atomically. In-flight requests finish on the model they started with.\n\n"
+        "The version is recorded in `model_activations`: every worker of the deployment picks it "
+        "up within `MODEL_SYNC_INTERVAL` seconds (also after a restart).\n\n"
+        "Returns `202` while loading (poll `/admin/models`), or `200` once active. "
+        "With `wait=true` the call blocks until the version is active or has failed. "
+        "Requires `Authorization: Bearer <ADMIN_TOKEN>`."
+    ),
+)
+def activate_model(version: str, response: Response, wait: bool = False):
+    if registry.get(version) is None:
+        registry.scan()
+    if registry.get(version) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+
+    if model_sync is not None:
+        try:
+            publish_activation(engine, version, current=registry.active.version)
+        except Exception:
+            logger.warning("Model activation not published", exc_info=True)
+            raise _shared_state_unavailable()
+        model_sync.last_target = version
+    status = registry.activate(version, background=not wait)
+
+    info = registry.get(version)
+    if status == "failed":
+        if model_sync is not None:
+            undo_activation(engine, version)
+        raise HTTPException(status_code=409, detail=f"Model {version} failed to load: {info['error']}")
+    if status == "loading":
+        response.status_code = 202
+    return info
+
+
+@app.post(
+    "/admin/models/rollback",
+    response_model=ModelVersionInfo,
+    dependencies=[Depends(require_admin)],
+    summary="Roll back to the previous model version",
+    description=(
+        "Re-activates the version that was active before the current one, in every worker "
+        "(instant swap where it is still loaded). Requires `Authorization: Bearer <ADMIN_TOKEN>`."
+    ),
+)
+def rollback_model():
+    if model_sync is None:
+        try:
+            previous = registry.rollback()
+        except LookupError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return registry.get(previous.version)
+
+    try:
+        version = rollback_activation(engine)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception:
+        logger.warning("Model rollback not published", exc_info=True)
+        raise _shared_state_unavailable()
+    model_sync.last_target = version
+    if registry.get(version) is None:
+        registry.scan()
+    if registry.get(version) is None or registry.activate(version, background=False) == "failed":
+        raise HTTPException(status_code=409, detail=f"Model {version} cannot be loaded in this worker")
+    return registry.get(version)
+
+
+@app.get(
+    "/admin/memory",
+    response_model=WorkerMemoryResponse,
+    summary="Memory report of the answering worker",
+    description=(
+        "Returns RSS / PSS / private memory of the worker process that handled the call, and "
+        "how many bytes of the active model are memory-mapped (shared through the page cache) "
+        "versus copied in the process. Set `MODEL_MMAP=0` to disable memory-mapping."
+    ),
+)
+def admin_memory():
+    return worker_memory()
+
+
+@app.get(
+    "/monitoring/drift",
+    response_model=DriftReport,
+    summary="Input drift against the training data",
+    description=(
+        "Compares the distribution of the features received by the prediction endpoints with the "
+        "reference profile computed from the training dataset: PSI, binned KS statistic and mean shift "
+        "per feature.\n\n"
+        "Statistics are maintained incrementally at prediction time, so the answer does not depend on the "
+        "size of the prediction log. `scope=worker` reads the answering process only; `scope=all` merges "
+        "the checkpoints written by the other workers (every `DRIFT_CHECKPOINT_INTERVAL` seconds). "
+        "A worker removes its checkpoint when it stops; checkpoints not refreshed for "
+        f"{STALE_CHECKPOINT_INTERVALS} intervals (crashed workers) are left out."
+    ),
+)
+def drift_report(scope: Literal["worker", "all"] = "worker"):
+    if drift_monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitor disabled (DRIFT_MONITOR=0 or no reference dataset).")
+    max_age = STALE_CHECKPOINT_INTERVALS * DRIFT_CHECKPOINT_INTERVAL
+    state = merged_state(engine, drift_monitor, max_age) if scope == "all" else None
+    return {"scope": scope, "instance_id": drift_monitor.instance_id, **drift_monitor.report(state)}
+
+
+@app.get(
+    "/admin/scoring-pool",
+    response_model=ScoringPoolStats,
+    summary="State of the batch scoring process pool",
+    description=(
+        "Health, queue depth and per-process throughput of the pool scoring large batches "
+        "(`SCORING_POOL_WORKERS`, `SCORING_POOL_MIN_ROWS`)."
+    ),
+)
+def scoring_pool_stats():
+    if scoring_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **scoring_pool.stats()}
+
+
+scoring_jobs = ScoringJobRunner(engine)
+
+
+@app.post(
+    "/jobs/score-employees",
+    response_model=ScoringRunInfo,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+    summary="Score the employees table in the background",
+    description=(
+        "Starts a batch scoring run over `employees` with the active model: rows are streamed with a "
+        "server-side cursor, scored chunk by chunk and upserted into `employee_scores`. "
+        "Only one run at a time (409 otherwise). Poll `GET /jobs/score-employees/{run_id}` for progress.\n\n"
+        "Requires `Authorization: Bearer <ADMIN_TOKEN>` (403 while ADMIN_TOKEN is not set). "
+        "`workers` is capped at the host's CPU count."
+    ),
+)
+def start_scoring_job(payload: ScoringJobRequest):
+    try:
+        run = scoring_jobs.start(registry.active, payload.mode, payload.chunk_size, payload.workers)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return scoring_jobs.get(run.run_id)
+
+
+@app.get(
+    "/jobs/score-employees/{run_id}",
+    response_model=ScoringRunInfo,
+    summary="Progress of a batch scoring run",
+)
+def scoring_job_status(run_id: str):
+    info = scoring_jobs.get(run_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scoring run: {run_id}")
+    return info
+
+
+if METRICS_ENABLED:
+    @app.get(
+        "/metrics",
+        response_class=PlainTextResponse,
+        summary="Prometheus metrics of the answering worker",
+        description=(
+            "Request counts and latencies, per-stage timings of the prediction endpoints, "
+            "prediction log transaction steps (including pool checkout wait), connection pool, "
+            "cache and log queue gauges, in the Prometheus text exposition format. "
+            "Values are per worker process. Disabled with `METRICS_ENABLED=0`."
+        ),
+    )
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Fin de l'import du module (chargement du modèle exclu avec MODEL_LAZY_LOAD=1)
+startup.import_seconds = time.perf_counter() - _IMPORT_STARTED
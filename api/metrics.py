@@ -0,0 +1,222 @@
+"""
+In-process metrics exposed in the Prometheus text format (`GET /metrics`).
+
+Counters, histograms and callback gauges are kept per worker process in plain
+Python structures: an observation is a bisect plus two increments under an
+uncontended lock, cheap enough to stay on in production. `METRICS_ENABLED=0`
+turns everything off: observations return immediately, the HTTP middleware
+is not installed and `/metrics` is not served.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional, Union
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "False", "")
+
+# Secondes: de 50 µs (étapes CPU) à 2,5 s (requêtes lentes / base saturée)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+GaugeValue = Union[float, Iterable[tuple[dict, float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), enabled: bool = True):
+        self.name, self.help, self.labelnames, self.enabled = name, help, tuple(labelnames), enabled
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS,
+                 enabled: bool = True):
+        self.name, self.help, self.labelnames, self.enabled = name, help, tuple(labelnames), enabled
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [counts par bucket (+Inf en dernier), somme, nombre]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        if not self.enabled:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def count(self, *labels) -> int:
+        s = self._series.get(labels)
+        return s[2] if s is not None else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le_label = 'le="' + _number(le) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class CallbackGauge:
+    """Gauge read at scrape time: `fn` returns a number or an iterable of (labels, value)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], GaugeValue]):
+        self.name, self.help, self.fn = name, help, fn
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        if value is None:
+            return lines
+        if isinstance(value, (int, float)):
+            value = [({}, value)]
+        for labels, v in value:
+            if v is None:
+                continue
+            lines.append(f"{self.name}{_labels(tuple(labels), tuple(labels.values()))} {_number(v)}")
+        return lines
+
+
+class CallbackCounter(CallbackGauge):
+    """Monotonic count kept by another component (cache, writer...), read at scrape time."""
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics: dict[str, object] = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames, enabled=self.enabled))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets, enabled=self.enabled))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], GaugeValue]) -> CallbackGauge:
+        return self._add(CallbackGauge(name, help, fn))
+
+    def counter_fn(self, name: str, help: str, fn: Callable[[], GaugeValue]) -> CallbackCounter:
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter {name} must end with _total")
+        return self._add(CallbackCounter(name, help, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines += metric.render()
+            except Exception:  # une jauge en erreur ne doit pas casser le scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Observes the time spent between successive `mark(stage)` calls into a histogram."""
+
+    __slots__ = ("hist", "labels", "last")
+
+    def __init__(self, hist: Histogram, *labels, start: Optional[float] = None):
+        self.hist = hist
+        self.labels = labels
+        self.last = start if start is not None else time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        if not self.hist.enabled:
+            return
+        now = time.perf_counter()
+        self.hist.observe(now - self.last, *self.labels, stage)
+        self.last = now
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests by route template and status, and timing them.
+
+    Stores the request start time in `scope["state"]["started_at"]` so handlers can
+    measure the time spent before they run (body read, JSON and Pydantic parsing).
+    """
+
+    def __init__(self, app, requests: Counter, duration: Histogram):
+        self.app = app
+        self.requests = requests
+        self.duration = duration
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope.setdefault("state", {})["started_at"] = start
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.requests.inc(scope["method"], path, str(status))
+            self.duration.observe(time.perf_counter() - start, scope["method"], path)
@@ -0,0 +1,122 @@
+"""
+Active model version shared by every worker of the API.
+
+`/admin/models/{version}/activate` and `/admin/models/rollback` only reach the
+worker that answers the call. With `uvicorn --workers N` the target version is
+therefore stored in the `model_activations` table (one row per activation, the
+latest one wins) and `ModelSync` polls it from each worker: a worker serving
+another version loads and swaps in the target, so all of them converge within
+`interval` seconds and log the same `model_version`. A rollback deletes the
+latest row, which makes the previous activation the target again.
+"""
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Engine
+
+from api.db import model_activations
+from api.registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def publish_activation(engine: Engine, version: str, current: Optional[str] = None) -> None:
+    """
+    Make `version` the target of every worker. `current` (the version served so far) is
+    recorded first when nothing was published yet, so that a rollback can return to it.
+    """
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        rows = [{"version": version, "activated_at": now}]
+        if current is not None and conn.execute(select(model_activations.c.activation_id).limit(1)).first() is None:
+            rows.insert(0, {"version": current, "activated_at": now})
+        # Une ligne par INSERT: activation_id suit l'ordre des activations
+        for row in rows:
+            conn.execute(insert(model_activations), [row])
+
+
+def undo_activation(engine: Engine, version: str) -> None:
+    """Remove the latest activation if it is still `version` (its load failed)."""
+    with engine.begin() as conn:
+        latest = conn.execute(
+            select(model_activations.c.activation_id, model_activations.c.version)
+            .order_by(model_activations.c.activation_id.desc())
+            .limit(1)
+            .with_for_update()
+        ).first()
+        if latest is not None and latest.version == version:
+            conn.execute(delete(model_activations).where(model_activations.c.activation_id == latest.activation_id))
+
+
+def rollback_activation(engine: Engine) -> str:
+    """Drop the latest activation and return the version that becomes the target again."""
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(model_activations.c.activation_id, model_activations.c.version)
+            .order_by(model_activations.c.activation_id.desc())
+            .limit(2)
+            .with_for_update()
+        ).all()
+        if len(rows) < 2:
+            raise LookupError("No previous model version to roll back to")
+        conn.execute(delete(model_activations).where(model_activations.c.activation_id == rows[0].activation_id))
+    return rows[1].version
+
+
+def target_version(engine: Engine) -> Optional[str]:
+    """Version of the latest activation, or None if none was published."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(model_activations.c.version).order_by(model_activations.c.activation_id.desc()).limit(1)
+        ).scalar()
+
+
+class ModelSync:
+    """Background thread aligning a worker's registry on the published target version."""
+
+    def __init__(self, registry: ModelRegistry, engine: Engine, interval: float = 5.0):
+        self.registry = registry
+        self.engine = engine
+        self.interval = interval
+        self.last_target: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sync(self, wait: bool = False) -> Optional[str]:
+        """Activate the target version if this worker serves another one; returns the target."""
+        target = target_version(self.engine)
+        if target is None or target == self.registry.active.version:
+            self.last_target = target
+            return target
+        if self.registry.get(target) is None:
+            self.registry.scan()  # artefact déposé après le démarrage de ce worker
+        if self.registry.get(target) is None:
+            if target != self.last_target:
+                logger.error("Target model %s not found in %s", target, self.registry.model_dir)
+        elif target != self.last_target or self.registry.get(target)["status"] == "ready":
+            # Un échec de chargement n'est pas retenté en boucle: seulement quand la cible change
+            self.registry.activate(target, background=not wait)
+        self.last_target = target
+        return target
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-sync", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Model version sync failed")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
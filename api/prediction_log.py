@@ -0,0 +1,206 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Sequence
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from api.cache import canonical_key
+from api.db import feature_vectors
+
+logger = logging.getLogger(__name__)
+
+# Niveaux de durabilité du log des prédictions:
+# - sync:        écriture en base dans la requête HTTP (comportement historique)
+# - buffered:    file en mémoire, la requête attend si la file est pleine (pas de perte sauf timeout)
+# - best_effort: file en mémoire, les enregistrements sont abandonnés si la file est pleine
+DURABILITY_LEVELS = ("sync", "buffered", "best_effort")
+
+_STOP = object()
+
+# INSERT ... ON CONFLICT DO NOTHING: même syntaxe sous PostgreSQL et SQLite
+INSERT_VECTORS = pg_insert(feature_vectors).on_conflict_do_nothing(index_elements=["features_hash"])
+
+WriteBatch = Callable[[list[dict], list[dict]], None]
+
+
+def features_digest(values: Sequence[float]) -> bytes:
+    """Content address of a feature vector in FEATURES_ORDER order (canonicalized like the prediction cache)."""
+    return canonical_key(values, "")
+
+
+def storage_rows(request_rows: list[dict]) -> tuple[list[dict], list[dict]]:
+    """
+    Split logged requests (`request_id`, `features`, `requested_at`) into `feature_vectors`
+    rows, one per distinct vector, and `prediction_requests` rows referencing them by hash.
+
+    Vectors are sorted by hash: concurrent transactions inserting the same vectors take
+    their index locks in the same order.
+    """
+    vectors: dict[bytes, list] = {}
+    stored = []
+    for r in request_rows:
+        h = r.get("features_hash") or features_digest(r["features"])
+        vectors.setdefault(h, r["features"])
+        stored.append({"request_id": r["request_id"], "features_hash": h, "requested_at": r["requested_at"]})
+    return [{"features_hash": h, "features": vectors[h]} for h in sorted(vectors)], stored
+
+
+class PredictionLogWriter:
+    """
+    Write-behind logger for `prediction_requests` / `prediction_results`.
+
+    Records are queued in a bounded in-process queue and flushed by a background
+    thread once `batch_size` records are pending or `flush_interval` seconds have
+    passed. Each flush writes both tables in a single transaction, so a result is
+    never committed without its request.
+    """
+
+    def __init__(
+        self,
+        write_batch: WriteBatch,
+        durability: str = "buffered",
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        enqueue_timeout: float = 1.0,
+    ):
+        if durability not in ("buffered", "best_effort"):
+            raise ValueError(f"Unsupported durability for write-behind logging: {durability!r}")
+
+        self._write_batch = write_batch
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None or self._closed:
+                return
+            self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, request_rows: list[dict], result_rows: list[dict]) -> bool:
+        """Queue records for writing; return False if they were dropped."""
+        n = len(request_rows)
+        if self._closed:
+            # Après l'arrêt: plus de thread, on écrit directement
+            with self._lock:
+                self.enqueued += n
+            self._flush(list(request_rows), list(result_rows))
+            return True
+
+        self.start()
+        try:
+            if self.durability == "best_effort":
+                self._queue.put_nowait((request_rows, result_rows))
+            else:
+                self._queue.put((request_rows, result_rows), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += n
+            logger.warning("Prediction log queue full: %d record(s) dropped", n)
+            return False
+
+        with self._lock:
+            self.enqueued += n
+        return True
+
+    def try_submit(self, request_rows: list[dict], result_rows: list[dict]) -> bool:
+        """Non-blocking enqueue; return False without counting a drop if the queue is full."""
+        if self._closed:
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait((request_rows, result_rows))
+        except queue.Full:
+            return False
+        with self._lock:
+            self.enqueued += len(request_rows)
+        return True
+
+    def flush(self) -> None:
+        """Block until every queued record has been written (or has failed)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Flush pending records and stop the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "durability": self.durability,
+                "queue_depth": self.enqueued - self.written - self.failed,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            request_rows, result_rows = list(item[0]), list(item[1])
+            n_items = 1
+            deadline = time.monotonic() + self.flush_interval
+
+            # Regroupe jusqu'à batch_size enregistrements ou flush_interval secondes
+            while len(request_rows) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                n_items += 1
+                if item is _STOP:
+                    stop = True
+                    break
+                request_rows.extend(item[0])
+                result_rows.extend(item[1])
+
+            self._flush(request_rows, result_rows)
+            for _ in range(n_items):
+                self._queue.task_done()
+
+    def _flush(self, request_rows: list[dict], result_rows: list[dict]) -> None:
+        n = len(request_rows)
+        try:
+            self._write_batch(request_rows, result_rows)
+        except Exception:
+            with self._lock:
+                self.failed += n
+            logger.exception("Failed to write %d prediction log record(s)", n)
+            return
+        with self._lock:
+            self.written += n
+            self.batches += 1
@@ -0,0 +1,331 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from api.artifacts import load_artifact
+from api.flat_model import FLAT_SUFFIX, FlatModel, load_flat
+from api.inference import CompiledPredictor
+
+logger = logging.getLogger(__name__)
+
+# sklearn: estimateur d'origine; flat: évaluateur NumPy compilé au chargement (voir api/flat_model.py)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "sklearn")
+MODEL_FLAT_DTYPE = os.getenv("MODEL_FLAT_DTYPE", "float64")
+# Fichier compagnon `<artefact>.schema.json`: ordre des features sans dépickler le modèle
+SCHEMA_SUFFIX = ".schema.json"
+
+
+def artifact_version(path: Path) -> str:
+    """Version id of an artifact: first 12 hex chars of the file's sha256."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def schema_path(path: Path) -> Path:
+    return Path(path).with_name(Path(path).name + SCHEMA_SUFFIX)
+
+
+def read_schema(path: Path) -> Optional[list[str]]:
+    """
+    Feature layout of an artifact without importing its model classes, or None if unknown.
+
+    Flat artifacts carry it in their header. A joblib artifact needs its schema file,
+    which only counts if it was written for this exact artifact (same version).
+    """
+    if Path(path).suffix == FLAT_SUFFIX:
+        return load_flat(path).features_order
+    try:
+        schema = json.loads(schema_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if schema.get("version") != artifact_version(path):
+        return None
+    return [str(f) for f in schema["features_order"]]
+
+
+def write_schema(path: Path) -> Optional[Path]:
+    """
+    Write the schema file of a joblib artifact next to it and return its path (None for a
+    flat artifact, whose header already holds the layout). Run by the export step or the
+    image build (`python -m api.artifacts schema`): the API never writes into MODEL_DIR.
+    """
+    path = Path(path)
+    if path.suffix == FLAT_SUFFIX:
+        return None
+    features_order = [str(f) for f in load_artifact(path)["model"].feature_names_in_]
+    out = schema_path(path)
+    out.write_text(json.dumps({"version": artifact_version(path), "features_order": features_order}), encoding="utf-8")
+    return out
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """Everything needed to score with one artifact; never mutated once built."""
+
+    version: str
+    path: Path
+    model: Any  # None pour un artefact plat (.npz)
+    scaler: Any
+    threshold: float
+    cols_to_scale: list[str]
+    features_order: list[str]
+    predictor: CompiledPredictor | FlatModel
+    loaded_at: datetime
+    load_seconds: float
+
+
+def load_model(path: Path, version: Optional[str] = None, backend: str = MODEL_BACKEND) -> LoadedModel:
+    """
+    Load an artifact and compile its predictor.
+
+    A joblib artifact (`model`, `scaler`, `seuil`, `cols_to_scale`) is served by
+    `CompiledPredictor`, or by an in-memory `FlatModel` when backend="flat".
+    A flat `.npz` artifact is always served by `FlatModel` (no sklearn object).
+    """
+    t0 = time.perf_counter()
+    if Path(path).suffix == FLAT_SUFFIX:
+        flat = load_flat(path)
+        return LoadedModel(
+            version=version or artifact_version(path),
+            path=Path(path),
+            model=None,
+            scaler=None,
+            threshold=flat.threshold,
+            cols_to_scale=flat.cols_to_scale,
+            features_order=flat.features_order,
+            predictor=flat,
+            loaded_at=datetime.now(timezone.utc),
+            load_seconds=time.perf_counter() - t0,
+        )
+
+    # Tableaux projetés en lecture seule (partagés entre workers) si MODEL_MMAP=1
+    obj = load_artifact(path)
+    model = obj["model"]
+    features_order = [str(f) for f in model.feature_names_in_]
+    cols_to_scale = [str(c) for c in obj["cols_to_scale"]]
+    if backend == "flat":
+        predictor = FlatModel.from_artifact(obj, dtype=MODEL_FLAT_DTYPE)
+    else:
+        predictor = CompiledPredictor(model, obj["scaler"], cols_to_scale, features_order)
+    return LoadedModel(
+        version=version or artifact_version(path),
+        path=Path(path),
+        model=model,
+        scaler=obj["scaler"],
+        threshold=float(obj["seuil"]),
+        cols_to_scale=cols_to_scale,
+        features_order=features_order,
+        predictor=predictor,
+        loaded_at=datetime.now(timezone.utc),
+        load_seconds=time.perf_counter() - t0,
+    )
+
+
+def warmup(loaded: LoadedModel, n_rows: int = 8) -> None:
+    """Score a few synthetic rows through the full path; raise if the outputs are not valid probabilities."""
+    n = len(loaded.features_order)
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n_rows, n))
+    X[0] = 0.0
+    if isinstance(loaded.predictor, FlatModel):
+        X[1] = loaded.predictor.offset
+    else:
+        X[1, loaded.predictor.preprocessor.idx] = loaded.scaler.mean_
+    probas = loaded.predictor.predict_proba(X)
+    single = loaded.predictor.predict_one(X[0])
+    if not (np.all((probas >= 0.0) & (probas <= 1.0)) and 0.0 <= single <= 1.0):
+        raise ValueError(f"Model {loaded.version} produced invalid probabilities during warmup")
+
+
+@dataclass
+class _Entry:
+    version: str
+    path: Path
+    status: str = "available"  # available | loading | ready | failed
+    loaded: Optional[LoadedModel] = None
+    error: Optional[str] = None
+    activated_at: Optional[datetime] = field(default=None)
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts with background loading and atomic activation.
+
+    Requests read `registry.active` once and keep that reference until they finish,
+    so swapping the active model never affects in-flight predictions. New versions
+    must keep the feature layout of the initial model (the API input contract).
+    """
+
+    def __init__(self, model_dir: Path, default_path: Path, lazy: bool = False):
+        self.model_dir = Path(model_dir)
+        self.default_path = Path(default_path)
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._history: list[str] = []
+        self._listeners: list[Callable[[LoadedModel], None]] = []
+        # Empreintes déjà calculées, par fichier: (mtime_ns, taille, version)
+        self._hashes: dict[Path, tuple[int, int, str]] = {}
+        self._active: Optional[LoadedModel] = None
+        self.warmup_seconds: Optional[float] = None
+
+        # lazy: l'artefact est chargé par start() (lifespan) ou au premier accès à `active`,
+        # sauf si son schéma est inconnu: il faut alors le charger pour connaître les features
+        self.features_order = read_schema(self.default_path) if lazy else None
+        if self.features_order is None:
+            if lazy:
+                logger.info(
+                    "No schema file for %s: model loaded at import (generate it with `python -m api.artifacts schema`)",
+                    self.default_path,
+                )
+            self.start()
+
+    @property
+    def active(self) -> LoadedModel:
+        """The served model (loaded on first access if start() has not run yet)."""
+        m = self._active
+        return m if m is not None else self.start()
+
+    @property
+    def ready(self) -> bool:
+        return self._active is not None
+
+    def start(self) -> LoadedModel:
+        """Load, warm up and activate the default artifact, then scan the directory; idempotent."""
+        with self._start_lock:
+            if self._active is not None:
+                return self._active
+            initial = load_model(self.default_path)
+            t0 = time.perf_counter()
+            warmup(initial)
+            self.warmup_seconds = time.perf_counter() - t0
+            if self.features_order is not None and initial.features_order != self.features_order:
+                raise ValueError(f"Feature layout of {initial.path.name} differs from its schema file")
+            self.features_order = initial.features_order
+            with self._lock:
+                self._entries[initial.version] = _Entry(initial.version, initial.path, "ready", initial)
+                self._active = initial
+                self._mark_active(initial)
+            for callback in self._listeners:
+                callback(initial)
+        self.scan()
+        return initial
+
+    def on_activate(self, callback: Callable[[LoadedModel], None]) -> None:
+        """Call `callback` with every model activated from now on, and with the current one if already loaded."""
+        with self._start_lock:
+            self._listeners.append(callback)
+            current = self._active
+        if current is not None:
+            callback(current)
+
+    def scan(self) -> None:
+        """Register every `*.pkl` (joblib) and `*.npz` (flat) artifact found in the model directory."""
+        for path in sorted([*self.model_dir.glob("*.pkl"), *self.model_dir.glob(f"*{FLAT_SUFFIX}")]):
+            self.register(path)
+
+    def register(self, path: Path) -> str:
+        path = Path(path)
+        st = path.stat()
+        cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            version = cached[2]
+        else:
+            # sha256 du fichier complet: recalculé seulement si le fichier a changé
+            version = artifact_version(path)
+            self._hashes[path] = (st.st_mtime_ns, st.st_size, version)
+        with self._lock:
+            self._entries.setdefault(version, _Entry(version, Path(path)))
+        return version
+
+    def list(self) -> list[dict]:
+        active_version = self._active.version if self._active is not None else None
+        with self._lock:
+            return [
+                {
+                    "version": e.version,
+                    "path": e.path.name,
+                    "status": e.status,
+                    "active": e.version == active_version,
+                    "error": e.error,
+                    "load_seconds": e.loaded.load_seconds if e.loaded else None,
+                    "activated_at": e.activated_at,
+                }
+                for e in self._entries.values()
+            ]
+
+    def get(self, version: str) -> Optional[dict]:
+        return next((e for e in self.list() if e["version"] == version), None)
+
+    def activate(self, version: str, background: bool = True) -> str:
+        """Load (if needed), warm up and swap in `version`; return the entry status."""
+        with self._lock:
+            entry = self._entries.get(version)
+            if entry is None:
+                raise KeyError(version)
+            if entry.status == "loading":
+                return entry.status
+            if entry.status == "ready":
+                loaded = entry.loaded
+            else:
+                entry.status, entry.error, loaded = "loading", None, None
+
+        if loaded is not None:
+            self._swap(loaded)
+            return "ready"
+        if background:
+            threading.Thread(target=self._load_and_swap, args=(entry,), name=f"model-load-{version}", daemon=True).start()
+            return "loading"
+        self._load_and_swap(entry)
+        return entry.status
+
+    def rollback(self) -> LoadedModel:
+        """Re-activate the version that was active before the current one."""
+        with self._lock:
+            if len(self._history) < 2:
+                raise LookupError("No previous model version to roll back to")
+            self._history.pop()
+            previous = self._entries[self._history[-1]].loaded
+        self._swap(previous, record=False)
+        return previous
+
+    def _load_and_swap(self, entry: _Entry) -> None:
+        try:
+            loaded = load_model(entry.path, entry.version)
+            if loaded.features_order != self.features_order:
+                raise ValueError("Feature layout differs from the served model")
+            warmup(loaded)
+        except Exception as e:
+            logger.exception("Failed to load model %s", entry.version)
+            with self._lock:
+                entry.status, entry.error = "failed", str(e)
+            return
+        with self._lock:
+            entry.status, entry.loaded = "ready", loaded
+        self._swap(loaded)
+
+    def _swap(self, loaded: LoadedModel, record: bool = True) -> None:
+        with self._lock:
+            # Affectation atomique: les requêtes en cours gardent leur référence
+            self._active = loaded
+            self._mark_active(loaded, record)
+        for callback in self._listeners:
+            callback(loaded)
+        logger.info("Model %s activated", loaded.version)
+
+    def _mark_active(self, loaded: LoadedModel, record: bool = True) -> None:
+        self._entries[loaded.version].activated_at = datetime.now(timezone.utc)
+        if record and (not self._history or self._history[-1] != loaded.version):
+            self._history.append(loaded.version)
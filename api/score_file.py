@@ -0,0 +1,260 @@
+"""
+Offline scoring of CSV/Parquet files.
+
+Reads a file laid out like `dataset_clean.csv` in fixed-size chunks, scores
+each chunk in one vectorized pass (same loading and preprocessing as the API,
+through `load_model`) and writes it to the output file as it goes, with
+`probability` and `prediction` columns added. Memory depends on the chunk size
+(and the number of workers), not on the size of the file.
+
+Rows with a missing or non-finite feature are kept, with empty
+`probability`/`prediction`. Output goes to `<output>.part` and is renamed
+when complete: an output file that exists is always whole.
+
+Parquet (input or output) requires `pyarrow`.
+
+Usage: python -m api.score_file <input.csv|.parquet> <output.csv|.parquet> [--chunk-size 50000] [--workers 1]
+"""
+import argparse
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from api.registry import LoadedModel, load_model
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    pa = pa_csv = pq = None
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CHUNK_SIZE = 50_000
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+@dataclass
+class FileScoringSummary:
+    model_version: str
+    rows: int = 0
+    rows_scored: int = 0
+    rows_skipped: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    rows_per_sec: float = 0.0
+    max_rss_bytes: int = 0
+
+
+def is_parquet(path: Path) -> bool:
+    return Path(path).suffix.lower() in PARQUET_SUFFIXES
+
+
+def _require_pyarrow(path: Path) -> None:
+    if pq is None:
+        raise RuntimeError(f"{path}: Parquet support requires the `pyarrow` package")
+
+
+def iter_chunks(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Read a CSV (possibly compressed) or Parquet file as DataFrames of at most `chunk_size` rows."""
+    if is_parquet(path):
+        _require_pyarrow(path)
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, chunksize=chunk_size) as reader:
+            yield from reader
+
+
+def feature_matrix(df: pd.DataFrame, features_order: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """(X in column-major order, mask of the scorable rows); raises if a feature column is missing."""
+    missing = [f for f in features_order if f not in df.columns]
+    if missing:
+        raise ValueError(f"Input is missing {len(missing)} feature column(s): {', '.join(missing[:5])}")
+    sub = df[features_order]
+    # Colonnes non numériques (valeurs vides ou texte parasite): converties, NaN si invalide
+    text_cols = [c for c, dtype in sub.dtypes.items() if not (pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype))]
+    if text_cols:
+        sub = sub.assign(**{c: pd.to_numeric(sub[c], errors="coerce") for c in text_cols})
+    # Copie modifiable en ordre colonne: le prédicteur standardise sur place
+    X = np.require(sub.to_numpy(dtype=float), requirements=["F", "W"])
+    return X, np.isfinite(X).all(axis=1)
+
+
+def _conform(table: "pa.Table", schema: "pa.Schema") -> "pa.Table":
+    """Cast a chunk to the schema of the first one (pandas infers types chunk by chunk)."""
+    columns = []
+    for field in schema:
+        col = table.column(field.name)
+        if pa.types.is_integer(field.type) and pa.types.is_floating(col.type):
+            # Entier devenu float à cause de valeurs manquantes: NaN -> null
+            values = col.to_numpy()
+            missing = np.isnan(values)
+            if not np.array_equal(values[~missing], np.round(values[~missing])):
+                raise ValueError(f"Column {field.name!r} changed from integer to float between chunks")
+            col = pa.array(np.where(missing, 0, values).astype(np.int64), mask=missing).cast(field.type)
+        try:
+            columns.append(col.cast(field.type))
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"Column {field.name!r} no longer matches its first-chunk type {field.type}: {e}") from e
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+class _Writer:
+    """Incremental CSV or Parquet writer; the output appears under its final name on `close()`."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + ".part")
+        self.parquet = is_parquet(path)
+        if self.parquet:
+            _require_pyarrow(path)
+        self._pq_writer = None
+        self._schema = None
+        self._csv = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.parquet:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._pq_writer is None:
+                self._schema = table.schema.remove_metadata()
+                self._pq_writer = pq.ParquetWriter(self.tmp, self._schema)
+            self._pq_writer.write_table(_conform(table, self._schema))
+            return
+
+        first = self._csv is None
+        if first:
+            self._csv = open(self.tmp, "wb")
+        if pa is not None:
+            # Écriture CSV d'Arrow: ~5x plus rapide que DataFrame.to_csv
+            pa_csv.write_csv(
+                pa.Table.from_pandas(df, preserve_index=False), self._csv, pa_csv.WriteOptions(include_header=first)
+            )
+        else:  # pragma: no cover - sans pyarrow
+            df.to_csv(self._csv, header=first, index=False)
+
+    def close(self, ok: bool) -> None:
+        if self._pq_writer is not None:
+            self._pq_writer.close()
+        if self._csv is not None:
+            self._csv.close()
+        if ok:
+            if not self.tmp.exists():  # entrée vide: aucun bloc lu, sortie vide
+                self.tmp.touch()
+            os.replace(self.tmp, self.path)
+        else:
+            self.tmp.unlink(missing_ok=True)
+
+
+# --- Workers (multi-process) ---------------------------------------------------------------
+
+_worker_model: Optional[LoadedModel] = None
+
+
+def _init_worker(model_path: str, version: str) -> None:
+    global _worker_model
+    _worker_model = load_model(Path(model_path), version)
+
+
+def _score_in_worker(X: np.ndarray) -> np.ndarray:
+    return _worker_model.predictor.predict_proba(X, copy=False)
+
+
+# --- Job -----------------------------------------------------------------------------------
+
+def score_file(
+    m: LoadedModel,
+    source: Path,
+    destination: Path,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    progress: Optional[Callable[[FileScoringSummary], None]] = None,
+) -> FileScoringSummary:
+    """Score every row of `source` with model `m` and write them, with the two score columns, to `destination`."""
+    if chunk_size < 1 or workers < 1:
+        raise ValueError("chunk_size and workers must be >= 1")
+    summary = FileScoringSummary(model_version=m.version)
+    writer = _Writer(destination)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            workers, mp_context=get_context("spawn"), initializer=_init_worker, initargs=(str(m.path), m.version)
+        )
+    t0 = time.perf_counter()
+    pending = []  # (bloc, masque, future) en vol: au plus `workers` blocs
+
+    def flush(df: pd.DataFrame, ok: np.ndarray, scored) -> None:
+        probas = scored.result() if pool is not None else scored
+        proba_col = np.full(len(df), np.nan)
+        proba_col[ok] = probas
+        pred_col = pd.array((proba_col >= m.threshold).astype("int8"), dtype="Int8")
+        pred_col[~ok] = pd.NA
+        writer.write(df.assign(probability=proba_col, prediction=pred_col))
+        summary.rows += len(df)
+        summary.rows_scored += int(ok.sum())
+        summary.rows_skipped += int((~ok).sum())
+        summary.chunks += 1
+        summary.seconds = time.perf_counter() - t0
+        summary.rows_per_sec = summary.rows / summary.seconds if summary.seconds else 0.0
+        if progress is not None:
+            progress(summary)
+
+    done = False
+    try:
+        for df in iter_chunks(source, chunk_size):
+            X, ok = feature_matrix(df, m.features_order)
+            X = X if ok.all() else np.asfortranarray(X[ok])
+            if pool is None:
+                flush(df, ok, m.predictor.predict_proba(X, copy=False))
+                continue
+            pending.append((df, ok, pool.submit(_score_in_worker, X)))
+            if len(pending) >= workers:
+                flush(*pending.pop(0))
+        while pending:
+            flush(*pending.pop(0))
+        done = True
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        writer.close(ok=done)
+    summary.seconds = time.perf_counter() - t0
+    summary.rows_per_sec = summary.rows / summary.seconds if summary.seconds else 0.0
+    summary.max_rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return summary
+
+
+def main(argv: Optional[list[str]] = None) -> FileScoringSummary:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to score chunks.")
+    parser.add_argument("--model-path", type=Path,
+                        default=Path(os.getenv("MODEL_PATH", ROOT / "model" / "classifier_employee.pkl")))
+    parser.add_argument("--quiet", action="store_true", help="Only print the final summary.")
+    args = parser.parse_args(argv)
+
+    m = load_model(args.model_path)
+    print(f"Scoring {args.input} with model {m.version} (chunks of {args.chunk_size}, {args.workers} worker(s))")
+
+    def progress(s: FileScoringSummary) -> None:
+        print(f"  {s.rows} rows ({s.rows_per_sec:,.0f} rows/s)", flush=True)
+
+    summary = score_file(m, args.input, args.output, args.chunk_size, args.workers, None if args.quiet else progress)
+    print(
+        f"{args.output}: {summary.rows} rows in {summary.seconds:.1f}s ({summary.rows_per_sec:,.0f} rows/s), "
+        f"{summary.rows_skipped} without score, max RSS {summary.max_rss_bytes / 2**20:.0f} MiB."
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    main()
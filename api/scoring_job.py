@@ -0,0 +1,301 @@
+"""
+Batch scoring of the `employees` table.
+
+Reads `employees` through a server-side cursor in fixed-size chunks, scores
+each chunk in one vectorized pass and writes the results to `employee_scores`
+(COPY into a temporary table, then upsert), keyed by `employee_id` and model
+version. The incremental mode only scores the rows created or updated since the
+watermark of the last successful run for that version.
+
+Usage: python -m api.scoring_job [--mode full|incremental] [--chunk-size 10000] [--workers 1]
+"""
+import argparse
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+from api.registry import LoadedModel, load_model
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CHUNK_SIZE = 10_000
+MODES = ("full", "incremental")
+# Filigrane = instant du début du run moins cette marge: une transaction ouverte avant le run
+# (updated_at = son NOW()) mais validée après la lecture sera relue par le run suivant
+WATERMARK_MARGIN = timedelta(seconds=float(os.getenv("SCORING_WATERMARK_MARGIN", "300")))
+
+
+@dataclass
+class ScoringRun:
+    run_id: str
+    model_version: str
+    mode: str
+    status: str = "running"  # running | succeeded | failed
+    rows_read: int = 0
+    rows_scored: int = 0
+    rows_skipped: int = 0
+    rows_per_sec: float = 0.0
+    since: Optional[datetime] = None
+    watermark: Optional[datetime] = None
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+def select_features_sql(features_order: list[str], incremental: bool) -> tuple[str, dict]:
+    """SELECT returning each employee's features as a float8[] in FEATURES_ORDER order (NULL if missing)."""
+    cols = ", ".join(f"(features->>:f{i})::float8" for i in range(len(features_order)))
+    where = "WHERE updated_at >= :since" if incremental else ""
+    sql = f"SELECT employee_id, ARRAY[{cols}] AS x FROM employees {where}"
+    return sql, {f"f{i}": f for i, f in enumerate(features_order)}
+
+
+def scores_copy_buffer(employee_ids, probas, preds, model_version: str, threshold: float, run_id: str) -> io.StringIO:
+    """Tab-separated rows for COPY into the staging table (floats written with repr: no precision loss)."""
+    lines = [
+        f"{eid}\t{model_version}\t{float(p)!r}\t{int(y)}\t{threshold!r}\t{run_id}\n"
+        for eid, p, y in zip(employee_ids, probas, preds)
+    ]
+    return io.StringIO("".join(lines))
+
+
+# --- Workers (multi-process) ---------------------------------------------------------------
+
+_worker_model: Optional[LoadedModel] = None
+
+
+def _init_worker(model_path: str, version: str) -> None:
+    global _worker_model
+    _worker_model = load_model(Path(model_path), version)
+
+
+def _score_in_worker(X: np.ndarray) -> np.ndarray:
+    return _worker_model.predictor.predict_proba(X, copy=False)
+
+
+# --- Job -----------------------------------------------------------------------------------
+
+def _last_watermark(conn, model_version: str) -> Optional[datetime]:
+    return conn.execute(
+        text("""
+            SELECT max(watermark) FROM scoring_runs
+            WHERE model_version = :v AND status = 'succeeded'
+        """),
+        {"v": model_version},
+    ).scalar()
+
+
+def _write_scores(engine, buf: io.StringIO) -> None:
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS employee_scores_staging
+                (LIKE employee_scores INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+            """)
+            cur.copy_expert(
+                "COPY employee_scores_staging (employee_id, model_version, probability, prediction, threshold, run_id) "
+                "FROM STDIN",
+                buf,
+            )
+            cur.execute("""
+                INSERT INTO employee_scores (employee_id, model_version, probability, prediction, threshold, run_id, scored_at)
+                SELECT employee_id, model_version, probability, prediction, threshold, run_id, NOW()
+                FROM employee_scores_staging
+                ON CONFLICT (employee_id, model_version) DO UPDATE SET
+                    probability = EXCLUDED.probability,
+                    prediction = EXCLUDED.prediction,
+                    threshold = EXCLUDED.threshold,
+                    run_id = EXCLUDED.run_id,
+                    scored_at = EXCLUDED.scored_at
+            """)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def run_scoring_job(
+    engine,
+    m: LoadedModel,
+    mode: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    run: Optional[ScoringRun] = None,
+    progress: Optional[Callable[[ScoringRun], None]] = None,
+    watermark_margin: timedelta = WATERMARK_MARGIN,
+) -> ScoringRun:
+    """
+    Score `employees` with model `m` and upsert the results into `employee_scores`.
+
+    The watermark recorded for the next incremental run is the database time at the
+    start of this run minus `watermark_margin`, not the latest `updated_at` read: rows
+    of transactions still open during the scan are scored again rather than skipped.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    run = run or ScoringRun(run_id=str(uuid.uuid4()), model_version=m.version, mode=mode)
+
+    with engine.begin() as conn:
+        run.since = _last_watermark(conn, m.version) if mode == "incremental" else None
+        run.watermark = conn.execute(text("SELECT now()")).scalar() - watermark_margin
+        conn.execute(
+            text("""
+                INSERT INTO scoring_runs (run_id, model_version, mode, status, started_at)
+                VALUES (:run_id, :v, :mode, 'running', :started_at)
+            """),
+            {"run_id": run.run_id, "v": m.version, "mode": mode, "started_at": run.started_at},
+        )
+
+    incremental = run.since is not None
+    sql, params = select_features_sql(m.features_order, incremental)
+    if incremental:
+        params["since"] = run.since
+
+    pool = None
+    if workers > 1:
+        # spawn: le job tourne dans un thread de l'API, fork y copierait des verrous tenus
+        pool = ProcessPoolExecutor(
+            workers, mp_context=get_context("spawn"), initializer=_init_worker, initargs=(str(m.path), m.version)
+        )
+
+    t0 = time.perf_counter()
+    pending = []  # (future, ids) en vol: au plus `workers` lots
+
+    def flush(fut, ids):
+        probas = fut.result() if pool is not None else fut
+        preds = (probas >= m.threshold).astype(int)
+        _write_scores(engine, scores_copy_buffer(ids, probas, preds, m.version, m.threshold, run.run_id))
+        run.rows_scored += len(ids)
+        run.rows_per_sec = run.rows_scored / (time.perf_counter() - t0)
+        if progress is not None:
+            progress(run)
+
+    try:
+        # Curseur côté serveur: PostgreSQL n'envoie que `chunk_size` lignes à la fois
+        with engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size) as conn:
+            result = conn.execute(text(sql), params)
+            for rows in result.partitions(chunk_size):
+                run.rows_read += len(rows)
+                X = np.array([r.x for r in rows], dtype=float)
+                ok = np.isfinite(X).all(axis=1)
+                run.rows_skipped += int((~ok).sum())
+                ids = [str(r.employee_id) for r, keep in zip(rows, ok) if keep]
+                if not ids:
+                    continue
+
+                X = np.asfortranarray(X[ok])
+                if pool is None:
+                    flush(m.predictor.predict_proba(X, copy=False), ids)
+                    continue
+                pending.append((pool.submit(_score_in_worker, X), ids))
+                if len(pending) >= workers:
+                    flush(*pending.pop(0))
+        while pending:
+            flush(*pending.pop(0))
+        run.status = "succeeded"
+    except Exception as e:
+        run.status, run.error = "failed", str(e)
+        logger.exception("Scoring run %s failed", run.run_id)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        run.finished_at = datetime.now(timezone.utc)
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                    UPDATE scoring_runs
+                    SET status = :status, watermark = :watermark, rows_scored = :rows_scored,
+                        rows_skipped = :rows_skipped, finished_at = :finished_at, error = :error
+                    WHERE run_id = :run_id
+                """),
+                {
+                    "status": run.status,
+                    "watermark": run.watermark,
+                    "rows_scored": run.rows_scored,
+                    "rows_skipped": run.rows_skipped,
+                    "finished_at": run.finished_at,
+                    "error": run.error,
+                    "run_id": run.run_id,
+                },
+            )
+    return run
+
+
+class ScoringJobRunner:
+    """Runs at most one scoring job at a time in a background thread and keeps recent runs in memory."""
+
+    def __init__(self, engine, max_history: int = 20):
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._runs: dict[str, ScoringRun] = {}
+        self._max_history = max_history
+        self._current: Optional[ScoringRun] = None
+
+    def start(self, m: LoadedModel, mode: str, chunk_size: int, workers: int) -> ScoringRun:
+        with self._lock:
+            if self._current is not None and self._current.status == "running":
+                raise RuntimeError(f"Scoring run {self._current.run_id} is already running")
+            run = ScoringRun(run_id=str(uuid.uuid4()), model_version=m.version, mode=mode)
+            self._current = run
+            self._runs[run.run_id] = run
+            while len(self._runs) > self._max_history:
+                self._runs.pop(next(iter(self._runs)))
+
+        def target():
+            try:
+                run_scoring_job(self._engine, m, mode, chunk_size, workers, run=run)
+            except Exception:
+                pass  # statut et erreur déjà portés par `run`
+
+        threading.Thread(target=target, name=f"scoring-run-{run.run_id}", daemon=True).start()
+        return run
+
+    def get(self, run_id: str) -> Optional[dict]:
+        run = self._runs.get(run_id)
+        return asdict(run) if run is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=MODES, default="full")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to score chunks.")
+    parser.add_argument("--model-path", type=Path,
+                        default=Path(os.getenv("MODEL_PATH", ROOT / "model" / "classifier_employee.pkl")))
+    args = parser.parse_args()
+
+    from api.db import engine
+
+    m = load_model(args.model_path)
+    print(f"Scoring employees with model {m.version} ({args.mode}, chunks of {args.chunk_size}, {args.workers} worker(s))")
+
+    def progress(run: ScoringRun) -> None:
+        print(f"  {run.rows_scored} rows scored ({run.rows_per_sec:,.0f} rows/s)", flush=True)
+
+    run = run_scoring_job(engine, m, args.mode, args.chunk_size, args.workers, progress=progress)
+    since = f" since {run.since.isoformat()}" if run.since else ""
+    print(
+        f"Run {run.run_id} {run.status}: {run.rows_scored} rows scored, {run.rows_skipped} skipped{since} "
+        f"({run.rows_per_sec:,.0f} rows/s)."
+    )
+
+
+if __name__ == "__main__":
+    main()
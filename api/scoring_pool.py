@@ -0,0 +1,232 @@
+"""
+Process pool for large scoring batches.
+
+Batches above `min_rows` are split into one block per worker and scored in
+separate processes, so that a big `/predict/batch` or `/predict/vectors` call
+neither holds the GIL nor competes with request handling in the API process.
+
+Each block travels through `multiprocessing.shared_memory`: the parent copies
+the rows into a shared buffer laid out like `CompiledPredictor` expects
+(float64, column-major) with room for the output, the worker scores in place
+and writes the probabilities back. Only the block name and shape are pickled.
+Workers load an artifact once per model version and keep it; smaller batches
+stay in-process, where the IPC round trip would cost more than the scoring.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from api.registry import LoadedModel, load_model
+
+logger = logging.getLogger(__name__)
+
+# --- Côté worker ---------------------------------------------------------------------------
+
+_worker_models: dict[str, LoadedModel] = {}
+MAX_WORKER_MODELS = 2
+
+
+def _worker_model(path: str, version: str) -> LoadedModel:
+    m = _worker_models.get(version)
+    if m is None:
+        m = load_model(Path(path), version)
+        # Version courante + précédente (rollback) au plus
+        while len(_worker_models) >= MAX_WORKER_MODELS:
+            _worker_models.pop(next(iter(_worker_models)))
+        _worker_models[version] = m
+    return m
+
+
+def _init_worker(path: Optional[str], version: Optional[str]) -> None:
+    # Un thread BLAS par worker: le parallélisme vient des process
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:  # pragma: no cover - dépendance de scikit-learn
+        pass
+    else:
+        threadpool_limits(1)
+    if path is not None:
+        _worker_model(path, version)
+
+
+def _attach(name: str) -> SharedMemory:
+    """Attach to a block created (and unlinked) by the parent."""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: le resource tracker est celui du parent, l'enregistrement est idempotent
+        return SharedMemory(name=name)
+
+
+def _score_block(name: str, n_rows: int, n_features: int, path: str, version: str) -> tuple[int, float]:
+    """Score the rows of a shared block in place; returns (pid, seconds spent)."""
+    t0 = time.perf_counter()
+    predictor = _worker_model(path, version).predictor
+    shm = _attach(name)
+    try:
+        buf = np.ndarray((n_rows * (n_features + 1),), dtype=np.float64, buffer=shm.buf)
+        X = buf[: n_rows * n_features].reshape((n_rows, n_features), order="F")
+        buf[n_rows * n_features:] = predictor.predict_proba(X, copy=False)
+        del X, buf  # les vues doivent être libérées avant close()
+    finally:
+        shm.close()
+    return os.getpid(), time.perf_counter() - t0
+
+
+# --- Côté API ------------------------------------------------------------------------------
+
+class ScoringPool:
+    """
+    Process pool scoring (n_rows, n_features) matrices for `LoadedModel`s.
+
+    Thread-safe: `predict_proba` is called from the threadpool of the sync endpoints.
+    """
+
+    def __init__(self, workers: int, model: Optional[LoadedModel] = None, min_rows: int = 5000, start_method: str = "spawn"):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.workers = workers
+        self.min_rows = min_rows
+        self.start_method = start_method
+        self._model = model
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.batches = 0
+        self.blocks = 0
+        self.rows = 0
+        self.fallbacks = 0
+        self.restarts = 0
+        self._per_worker: dict[int, dict] = {}
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.workers,
+            mp_context=get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(str(self._model.path), self._model.version) if self._model is not None else (None, None),
+        )
+
+    def bind_model(self, model: LoadedModel) -> None:
+        """Model preloaded by the workers started from now on (the served one: see `registry.on_activate`)."""
+        self._model = model
+
+    def start(self) -> None:
+        """Spawn every worker and load the model now rather than on the first big batch."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            executor = self._executor
+        # Tâches lentes pour forcer la création de tous les process
+        for fut in [executor.submit(time.sleep, 0.05) for _ in range(self.workers)]:
+            fut.result()
+
+    def should_offload(self, n_rows: int) -> bool:
+        return n_rows >= self.min_rows
+
+    def predict_proba(self, m: LoadedModel, X: np.ndarray) -> np.ndarray:
+        """Same result as `m.predictor.predict_proba(X)`, computed by the pool."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            executor = self._executor
+
+        n_rows, n_features = X.shape
+        block_rows = max(math.ceil(n_rows / self.workers), 1)
+        blocks: list[tuple[SharedMemory, int]] = []
+        try:
+            for start in range(0, n_rows, block_rows):
+                rows = X[start:start + block_rows]
+                k = rows.shape[0]
+                shm = SharedMemory(create=True, size=k * (n_features + 1) * 8)
+                blocks.append((shm, k))
+                view = np.ndarray((k, n_features), dtype=np.float64, buffer=shm.buf, order="F")
+                view[:] = rows
+                del view
+            with self._lock:
+                self.pending += len(blocks)
+            futures = [
+                executor.submit(_score_block, shm.name, k, n_features, str(m.path), m.version) for shm, k in blocks
+            ]
+            try:
+                done = [f.result() for f in futures]
+            finally:
+                with self._lock:
+                    self.pending -= len(blocks)
+
+            probas = np.empty(n_rows, dtype=np.float64)
+            start = 0
+            for shm, k in blocks:
+                out = np.ndarray((k,), dtype=np.float64, buffer=shm.buf, offset=k * n_features * 8)
+                probas[start:start + k] = out
+                del out
+                start += k
+        except BrokenProcessPool:
+            logger.exception("Scoring pool broken, restarting it and scoring in-process")
+            self._restart(executor)
+            with self._lock:
+                self.fallbacks += 1
+            return m.predictor.predict_proba(X)
+        finally:
+            for shm, _ in blocks:
+                shm.close()
+                shm.unlink()
+
+        with self._lock:
+            self.batches += 1
+            self.blocks += len(blocks)
+            self.rows += n_rows
+            for (_, k), (pid, seconds) in zip(blocks, done):
+                w = self._per_worker.setdefault(pid, {"blocks": 0, "rows": 0, "busy_seconds": 0.0})
+                w["blocks"] += 1
+                w["rows"] += k
+                w["busy_seconds"] += seconds
+        return probas
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = self._new_executor()
+                self.restarts += 1
+                self._per_worker.clear()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def alive(self) -> int:
+        executor = self._executor
+        procs = getattr(executor, "_processes", None) or {}
+        return sum(p.is_alive() for p in list(procs.values()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_worker = {
+                str(pid): {**w, "rows_per_sec": w["rows"] / w["busy_seconds"] if w["busy_seconds"] else 0.0}
+                for pid, w in self._per_worker.items()
+            }
+            return {
+                "workers": self.workers,
+                "alive": self.alive(),
+                "healthy": self._executor is not None and self.alive() == self.workers,
+                "min_rows": self.min_rows,
+                "pending_blocks": self.pending,
+                "batches": self.batches,
+                "blocks": self.blocks,
+                "rows": self.rows,
+                "fallbacks": self.fallbacks,
+                "restarts": self.restarts,
+                "per_worker": per_worker,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,82 @@
+"""
+Startup phases of an API worker and the readiness they imply.
+
+Importing `api.main` only builds the app: the model artifact is loaded and warmed
+up and the database pools are opened in the lifespan, before the worker accepts
+traffic. `StartupReport` times each phase for the logs and `/health/ready`; the
+worker is ready once the model phase has succeeded. A database that cannot be
+reached does not block readiness (predictions are then served in degraded mode,
+see api/admission.py), it is only reported.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class StartupReport:
+    """Durations and errors of the startup phases of one worker."""
+
+    def __init__(self, import_seconds: Optional[float] = None):
+        self.import_seconds = import_seconds
+        self.phases: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.started: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+        self.stopping = False
+
+    def begin(self) -> None:
+        self.started, self.total_seconds, self.stopping = time.perf_counter(), None, False
+        self.phases.clear()
+        self.errors.clear()
+
+    def finish(self) -> None:
+        self.total_seconds = time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a phase; an exception is recorded under its name and re-raised."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.phases[name] = time.perf_counter() - t0
+
+    def as_dict(self) -> dict:
+        return {
+            "import_seconds": self.import_seconds,
+            "startup_seconds": self.total_seconds,
+            "phases": dict(self.phases),
+            "errors": dict(self.errors),
+        }
+
+
+def preopen_pool(engine: Engine, n: int) -> int:
+    """Open `n` connections of a sync engine at once and give them back to its pool; returns `n`."""
+    conns = []
+    try:
+        for _ in range(n):
+            conns.append(engine.connect())
+    finally:
+        for conn in conns:
+            conn.close()
+    return n
+
+
+async def preopen_async_pool(engine: AsyncEngine, n: int) -> int:
+    """Open `n` connections of an async engine concurrently and give them back to its pool; returns `n`."""
+    conns = [engine.connect() for _ in range(n)]
+    results = await asyncio.gather(*(conn.start() for conn in conns), return_exceptions=True)
+    for conn, result in zip(conns, results):
+        if not isinstance(result, BaseException):
+            await conn.close()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return n
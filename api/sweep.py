@@ -0,0 +1,93 @@
+"""
+What-if sensitivity sweeps.
+
+A sweep varies one or two features of a base row over value grids. The grid
+is materialized as one (n_points, n_features) matrix, scored in a single
+vectorized call, and returned as a curve (one axis) or a surface (two axes,
+first axis along the rows).
+
+Sweeps are logged as one summary row in `prediction_sweeps` (base features,
+grids, base / min / max probability) rather than one audit row per point:
+grid points are synthetic inputs, not employees. For the same reason they do
+not feed the prediction cache nor the drift monitor.
+"""
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+
+MAX_AXIS_POINTS = 500
+
+
+class SweepError(ValueError):
+    """Invalid sweep definition (unknown or repeated feature, bad grid)."""
+
+
+def axis_grid(
+    values: Optional[Sequence[float]] = None,
+    start: Optional[float] = None,
+    stop: Optional[float] = None,
+    steps: Optional[int] = None,
+) -> np.ndarray:
+    """Values of one axis: explicit `values`, or `steps` evenly spaced points from `start` to `stop`."""
+    if values is not None:
+        grid = np.asarray(values, dtype=float)
+    elif start is not None and stop is not None and steps is not None:
+        grid = np.linspace(start, stop, steps)
+    else:
+        raise SweepError("Each axis needs either `values` or `start`, `stop` and `steps`")
+    if grid.ndim != 1 or not 1 <= grid.size <= MAX_AXIS_POINTS:
+        raise SweepError(f"Each axis must have 1 to {MAX_AXIS_POINTS} values")
+    if not np.isfinite(grid).all():
+        raise SweepError("Axis values must be finite numbers")
+    return grid
+
+
+def feature_positions(features: Sequence[str], features_order: Sequence[str]) -> list[int]:
+    position = {f: i for i, f in enumerate(features_order)}
+    unknown = [f for f in features if f not in position]
+    if unknown:
+        raise SweepError(f"Unknown features: {unknown}")
+    if len(set(features)) != len(features):
+        raise SweepError("A feature can only be swept once")
+    return [position[f] for f in features]
+
+
+def grid_matrix(base: np.ndarray, positions: Sequence[int], grids: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Rows of the full grid (first axis varying slowest), followed by the base row itself.
+
+    Column-major, the layout the predictors score without copying.
+    """
+    mesh = np.meshgrid(*grids, indexing="ij")
+    n_points = mesh[0].size
+    X = np.empty((n_points + 1, base.size), dtype=float, order="F")
+    X[:] = base
+    for p, values in zip(positions, mesh):
+        X[:n_points, p] = values.ravel()
+    return X
+
+
+def summary_row(
+    sweep_id: str,
+    now: datetime,
+    base_features: dict,
+    axes: list[dict],
+    probas: np.ndarray,
+    base_proba: float,
+    threshold: float,
+    model_version: str,
+) -> dict:
+    """`prediction_sweeps` row of one sweep."""
+    return {
+        "sweep_id": sweep_id,
+        "requested_at": now,
+        "base_features": base_features,
+        "axes": axes,
+        "n_points": int(probas.size),
+        "base_probability": base_proba,
+        "min_probability": float(probas.min()),
+        "max_probability": float(probas.max()),
+        "threshold": threshold,
+        "model_version": model_version,
+    }
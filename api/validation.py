@@ -0,0 +1,147 @@
+"""
+Request validation generated from the model's feature list.
+
+`build_features_model` creates, at model load, a Pydantic model with one
+strict finite float field per feature (aliased to the feature name) and extra
+keys forbidden, so that a `/predict` payload is fully checked by the compiled
+pydantic-core validator. Optional per-feature ranges can be read from the
+training CSV. `summarize_errors` turns validation errors back into the
+messages the API has always returned ("Missing features: [...]", ...).
+"""
+import csv
+from pathlib import Path
+from typing import Annotated, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, create_model
+
+Ranges = dict[str, tuple[float, float]]
+
+RANGE_ERRORS = ("greater_than_equal", "less_than_equal")
+
+
+def feature_ranges_from_csv(path: Path, features_order: Sequence[str]) -> Ranges:
+    """Min / max of each feature column of the training CSV (columns absent from the file are skipped)."""
+    lo: dict[str, float] = {}
+    hi: dict[str, float] = {}
+    with open(path, newline="", encoding="utf-8") as fh:
+        reader = csv.DictReader(fh)
+        present = [f for f in features_order if f in (reader.fieldnames or [])]
+        for row in reader:
+            for f in present:
+                v = float(row[f])
+                if f not in lo or v < lo[f]:
+                    lo[f] = v
+                if f not in hi or v > hi[f]:
+                    hi[f] = v
+    return {f: (lo[f], hi[f]) for f in lo}
+
+
+def _feature_type(name: str, ranges: Optional[Ranges]):
+    bounds = (ranges or {}).get(name)
+    if bounds is None:
+        return Annotated[float, Field(strict=True, allow_inf_nan=False)]
+    return Annotated[float, Field(strict=True, allow_inf_nan=False, ge=bounds[0], le=bounds[1])]
+
+
+def build_features_model(features_order: Sequence[str], ranges: Optional[Ranges] = None) -> type[BaseModel]:
+    """
+    Model of a features mapping: every feature required, strict finite float, no extra key.
+
+    Fields are named `f0..fN` (feature names are not identifiers) and aliased to the
+    feature names; they are declared in `features_order` order, so `vars(obj).values()`
+    is the model input vector.
+    """
+    fields = {
+        f"f{i}": (_feature_type(name, ranges), Field(..., alias=name))
+        for i, name in enumerate(features_order)
+    }
+    return create_model("Features", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+def build_vector_adapter(features_order: Sequence[str], ranges: Optional[Ranges] = None) -> TypeAdapter:
+    """Validator of a positional row: a fixed-length tuple typed like `build_features_model`."""
+    types = tuple(_feature_type(name, ranges) for name in features_order)
+    return TypeAdapter(tuple[types])
+
+
+def summarize_errors(errors: list[dict], features_order: Sequence[str]) -> str:
+    """
+    One-line message for feature validation errors (locations relative to the features object).
+
+    Integer locations (positional rows) are mapped to feature names.
+    """
+    missing, invalid, out_of_range, unexpected = [], [], [], []
+    for e in errors:
+        key = e["loc"][0] if e["loc"] else None
+        if isinstance(key, int) and 0 <= key < len(features_order):
+            key = features_order[key]
+        if e["type"] == "missing":
+            missing.append(key)
+        elif e["type"] == "extra_forbidden":
+            unexpected.append(key)
+        elif e["type"] in RANGE_ERRORS:
+            ctx = e.get("ctx", {})
+            out_of_range.append(f"{key} (>= {ctx['ge']})" if "ge" in ctx else f"{key} (<= {ctx['le']})")
+        else:
+            invalid.append(key)
+
+    parts = []
+    if missing:
+        parts.append(f"Missing features: {missing}")
+    if invalid:
+        parts.append(f"Invalid values for features: {invalid}")
+    if out_of_range:
+        parts.append(f"Out of range values for features: {out_of_range}")
+    if unexpected:
+        parts.append(f"Unexpected features: {unexpected}")
+    return "; ".join(parts)
+
+
+class FeatureValidator:
+    """Compiled validators for one feature layout, for named and positional rows."""
+
+    def __init__(self, features_order: Sequence[str], ranges: Optional[Ranges] = None):
+        self.features_order = list(features_order)
+        self.ranges = ranges
+        self.model = build_features_model(self.features_order, ranges)
+        self.vector_adapter = build_vector_adapter(self.features_order, ranges)
+        bounds = [(ranges or {}).get(f, (-np.inf, np.inf)) for f in self.features_order]
+        self.lo = np.array([b[0] for b in bounds], dtype=float)
+        self.hi = np.array([b[1] for b in bounds], dtype=float)
+
+    def row(self, row: dict) -> tuple[Optional[list], Optional[str]]:
+        """Validate a mapping; returns (values in features_order order, None) or (None, error message)."""
+        try:
+            return list(vars(self.model.model_validate(row)).values()), None
+        except ValidationError as e:
+            return None, summarize_errors(e.errors(), self.features_order)
+
+    def vector(self, vec) -> tuple[Optional[list], Optional[str]]:
+        """Validate a positional row; same contract as `row`."""
+        if not isinstance(vec, (list, tuple)) or len(vec) != len(self.features_order):
+            n = len(vec) if isinstance(vec, (list, tuple)) else type(vec).__name__
+            return None, f"Expected {len(self.features_order)} values in features_order order, got {n}"
+        try:
+            return list(self.vector_adapter.validate_python(vec)), None
+        except ValidationError as e:
+            return None, summarize_errors(e.errors(), self.features_order)
+
+    def matrix_errors(self, X: np.ndarray, errors: dict[int, str]) -> dict[int, str]:
+        """Same checks as the validators on an already numeric matrix (NaN / Inf, ranges), vectorized."""
+        non_finite = ~np.isfinite(X)
+        with np.errstate(invalid="ignore"):
+            below, above = X < self.lo, X > self.hi
+        bad = non_finite | below | above
+        for i in np.flatnonzero(bad.any(axis=1)).tolist():
+            if i in errors:
+                continue
+            parts = []
+            if non_finite[i].any():
+                parts.append(f"Invalid values for features: {[self.features_order[j] for j in np.flatnonzero(non_finite[i])]}")
+            out = [f"{self.features_order[j]} (>= {self.lo[j]})" for j in np.flatnonzero(below[i])]
+            out += [f"{self.features_order[j]} (<= {self.hi[j]})" for j in np.flatnonzero(above[i])]
+            if out:
+                parts.append(f"Out of range values for features: {out}")
+            errors[i] = "; ".join(parts)
+        return errors
@@ -1,6 +1,10 @@
 import streamlit as st
 import requests
 import os
+import uuid
+
+import altair as alt
+import pandas as pd
 
 # Config
 st.set_page_config(page_title="HRPredict", layout="wide")
@@ -9,8 +13,15 @@ st.caption("Enter employee information to predict resignation risk.")
 
 API_BASE = os.getenv("API_URL", "http://127.0.0.1:8000")
 PREDICT_URL = f"{API_BASE}/predict"
+SWEEP_URL = f"{API_BASE}/predict/sweep"
 
 # Helpers
+@st.cache_data(ttl=300)
+def fetch_metadata() -> dict:
+    """/metadata only changes with the active model: no need to fetch it on every submission."""
+    return requests.get(f"{API_BASE}/metadata", timeout=10).json()
+
+
 def one_hot(selected: str, options: list[str], prefix: str) -> dict:
     """Return one-hot dict for features like prefix_value."""
     d = {f"{prefix}{opt}": 0.0 for opt in options}
@@ -51,6 +62,28 @@ STATUTS = [
     "Marié(e)",
 ]
 
+# Caractéristiques proposées pour l'analyse de sensibilité: libellé, bornes des sliders
+SWEEP_FEATURES = {
+    "revenu_mensuel": ("Revenu mensuel (€)", 1000, 30000),
+    "annees_depuis_la_derniere_promotion": ("Années depuis la dernière promotion", 0, 20),
+    "age": ("Âge", 18, 80),
+    "annees_dans_l_entreprise": ("Ancienneté dans l'entreprise", 0, 50),
+    "annee_experience_totale": ("Années d'expérience totale", 0, 50),
+    "distance_domicile_travail": ("Distance domicile-travail (km)", 0, 50),
+    "annes_sous_responsable_actuel": ("Années avec le manager actuel", 0, 20),
+    "nb_formations_suivies": ("Formations suivies", 0, 10),
+    "satisfaction_employee_environnement": ("Satisfaction environnement", 1, 4),
+    "satisfaction_employee_equilibre_pro_perso": ("Équilibre vie pro/perso", 1, 4),
+    "heure_supplementaires": ("Heures supplémentaires", 0, 1),
+}
+MAX_SWEEP_STEPS = 50
+
+
+def sweep_axis(feature: str) -> dict:
+    """Grid of one axis: integer values if the range is short, MAX_SWEEP_STEPS points otherwise."""
+    _, lo, hi = SWEEP_FEATURES[feature]
+    return {"feature": feature, "start": lo, "stop": hi, "steps": min(hi - lo + 1, MAX_SWEEP_STEPS)}
+
 # UI
 with st.form("formulaire_prediction"):
     col1, col2, col3 = st.columns(3)
@@ -129,42 +162,43 @@ with st.form("formulaire_prediction"):
 
     submitted = st.form_submit_button("Predict")
 
-# Build payload + call API
+# Build payload (profil saisi, utilisé par la prédiction et l'analyse de sensibilité)
+# Base numeric/binary features
+features = {
+    "age": float(age),
+    "genre": float(genre),
+    "revenu_mensuel": float(revenu_mensuel),
+    "nombre_experiences_precedentes": float(nombre_experiences_precedentes),
+    "annee_experience_totale": float(annee_experience_totale),
+    "annees_dans_l_entreprise": float(annees_dans_l_entreprise),
+    "annees_dans_le_poste_actuel": float(annees_dans_le_poste_actuel),
+    "satisfaction_employee_environnement": float(satisfaction_employee_environnement),
+    "note_evaluation_precedente": float(note_evaluation_precedente),
+    "niveau_hierarchique_poste": float(niveau_hierarchique_poste),
+    "satisfaction_employee_nature_travail": float(satisfaction_employee_nature_travail),
+    "satisfaction_employee_equipe": float(satisfaction_employee_equipe),
+    "satisfaction_employee_equilibre_pro_perso": float(satisfaction_employee_equilibre_pro_perso),
+    "note_evaluation_actuelle": float(note_evaluation_actuelle),
+    "heure_supplementaires": float(heure_supplementaires),
+    "nombre_participation_pee": float(nombre_participation_pee),
+    "nb_formations_suivies": float(nb_formations_suivies),
+    "distance_domicile_travail": float(distance_domicile_travail),
+    "niveau_education": float(niveau_education),
+    "frequence_deplacement": float(frequence_deplacement),
+    "annees_depuis_la_derniere_promotion": float(annees_depuis_la_derniere_promotion),
+    "annes_sous_responsable_actuel": float(annes_sous_responsable_actuel),
+    "augmentation_salaire_precedente_bin": float(augmentation_salaire_precedente_bin),
+}
+
+# One-hot groups
+features.update(one_hot(poste, POSTES, "poste_"))
+features.update(one_hot(departement, DEPARTEMENTS, "departement_"))
+features.update(one_hot(domaine, DOMAINES, "domaine_etude_"))
+features.update(one_hot(statut, STATUTS, "statut_marital_"))
+
+# Call API
 if submitted:
-    # Base numeric/binary features
-    features = {
-        "age": float(age),
-        "genre": float(genre),
-        "revenu_mensuel": float(revenu_mensuel),
-        "nombre_experiences_precedentes": float(nombre_experiences_precedentes),
-        "annee_experience_totale": float(annee_experience_totale),
-        "annees_dans_l_entreprise": float(annees_dans_l_entreprise),
-        "annees_dans_le_poste_actuel": float(annees_dans_le_poste_actuel),
-        "satisfaction_employee_environnement": float(satisfaction_employee_environnement),
-        "note_evaluation_precedente": float(note_evaluation_precedente),
-        "niveau_hierarchique_poste": float(niveau_hierarchique_poste),
-        "satisfaction_employee_nature_travail": float(satisfaction_employee_nature_travail),
-        "satisfaction_employee_equipe": float(satisfaction_employee_equipe),
-        "satisfaction_employee_equilibre_pro_perso": float(satisfaction_employee_equilibre_pro_perso),
-        "note_evaluation_actuelle": float(note_evaluation_actuelle),
-        "heure_supplementaires": float(heure_supplementaires),
-        "nombre_participation_pee": float(nombre_participation_pee),
-        "nb_formations_suivies": float(nb_formations_suivies),
-        "distance_domicile_travail": float(distance_domicile_travail),
-        "niveau_education": float(niveau_education),
-        "frequence_deplacement": float(frequence_deplacement),
-        "annees_depuis_la_derniere_promotion": float(annees_depuis_la_derniere_promotion),
-        "annes_sous_responsable_actuel": float(annes_sous_responsable_actuel),
-        "augmentation_salaire_precedente_bin": float(augmentation_salaire_precedente_bin),
-    }
-
-    # One-hot groups
-    features.update(one_hot(poste, POSTES, "poste_"))
-    features.update(one_hot(departement, DEPARTEMENTS, "departement_"))
-    features.update(one_hot(domaine, DOMAINES, "domaine_etude_"))
-    features.update(one_hot(statut, STATUTS, "statut_marital_"))
-    
-    meta = requests.get(f"{API_BASE}/metadata").json()
+    meta = fetch_metadata()
     expected = set(meta["features_order"])
     sent = set(features.keys())
 
@@ -177,14 +211,22 @@ if submitted:
         st.write("Extra:", list(extra)[:10])
         st.stop()
 
-    # Call API
+    # Call API (une clé par soumission: le nouvel essai après un timeout ne crée pas de doublon)
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
     try:
-        r = requests.post(PREDICT_URL, json={"features": features}, timeout=20)
+        try:
+            r = requests.post(PREDICT_URL, json={"features": features}, headers=headers, timeout=20)
+        except (requests.Timeout, requests.ConnectionError):
+            r = requests.post(PREDICT_URL, json={"features": features}, headers=headers, timeout=20)
     except requests.RequestException as e:
         st.error("API unreachable.")
         st.code(str(e))
         st.stop()
 
+    if r.status_code == 503:
+        # API saturée (contrôle d'admission) ou base indisponible: réessayer plus tard
+        st.warning(f"API surchargée, réessayez dans {r.headers.get('Retry-After', '1')} s.")
+        st.stop()
     if r.status_code != 200:
         st.error(f"Prediction failed ({r.status_code})")
         st.code(r.text)
@@ -205,4 +247,58 @@ if submitted:
 
     if "request_id" in res:
         st.write("ID de la requête (enregistré en base) :")
-        st.code(res["request_id"])
\ No newline at end of file
+        st.code(res["request_id"])
+
+# Analyse de sensibilité: une courbe (ou une surface) en un seul appel à /predict/sweep
+st.divider()
+st.subheader("Analyse de sensibilité")
+st.caption("Fait varier une ou deux caractéristiques du profil saisi, les autres restant fixes.")
+
+sweep_col1, sweep_col2 = st.columns(2)
+with sweep_col1:
+    axis1 = st.selectbox("Caractéristique à faire varier", list(SWEEP_FEATURES), format_func=lambda f: SWEEP_FEATURES[f][0])
+with sweep_col2:
+    axis2 = st.selectbox(
+        "Seconde caractéristique (optionnel)",
+        [None] + [f for f in SWEEP_FEATURES if f != axis1],
+        format_func=lambda f: "—" if f is None else SWEEP_FEATURES[f][0],
+    )
+
+if st.button("Tracer"):
+    axes = [sweep_axis(axis1)] + ([sweep_axis(axis2)] if axis2 else [])
+    try:
+        r = requests.post(SWEEP_URL, json={"features": features, "axes": axes}, timeout=20)
+    except requests.RequestException as e:
+        st.error("API unreachable.")
+        st.code(str(e))
+        st.stop()
+    if r.status_code != 200:
+        st.error(f"Sweep failed ({r.status_code})")
+        st.code(r.text)
+        st.stop()
+
+    res = r.json()
+    threshold = alt.Chart(pd.DataFrame({"seuil": [res["threshold"]]})).mark_rule(strokeDash=[4, 4], color="red").encode(y="seuil:Q")
+    x_values = res["axes"][0]["values"]
+    x_title = SWEEP_FEATURES[axis1][0]
+    if axis2 is None:
+        curve = pd.DataFrame({"x": x_values, "probabilité": res["probabilities"]})
+        chart = alt.Chart(curve).mark_line(point=True).encode(
+            x=alt.X("x:Q", title=x_title),
+            y=alt.Y("probabilité:Q", title="Probabilité de démission", scale=alt.Scale(domain=[0, 1])),
+        )
+        st.altair_chart(chart + threshold, width="stretch")
+    else:
+        y_values = res["axes"][1]["values"]
+        surface = pd.DataFrame(
+            [(x, y, p) for x, row in zip(x_values, res["probabilities"]) for y, p in zip(y_values, row)],
+            columns=["x", "y", "probabilité"],
+        )
+        chart = alt.Chart(surface).mark_rect().encode(
+            x=alt.X("x:O", title=x_title, axis=alt.Axis(labelOverlap=True, format=".0f")),
+            y=alt.Y("y:O", title=SWEEP_FEATURES[axis2][0], sort="descending", axis=alt.Axis(labelOverlap=True, format=".0f")),
+            color=alt.Color("probabilité:Q", scale=alt.Scale(domain=[0, 1], scheme="redyellowgreen", reverse=True)),
+            tooltip=["x", "y", alt.Tooltip("probabilité:Q", format=".1%")],
+        )
+        st.altair_chart(chart, width="stretch")
+    st.caption(f"Profil saisi : {res['base_probability']:.1%} — seuil de décision : {res['threshold']:.0%}")
@@ -0,0 +1,129 @@
+"""
+Concurrency benchmark: async /predict (AsyncSession) vs the former sync path (threadpool).
+
+The database is simulated by sessions that wait `--db-latency-ms` on commit
+(time.sleep on the sync side, asyncio.sleep on the async side), to isolate the
+cost of waiting for I/O on the FastAPI threadpool.
+
+Usage: python -m benchmarks.bench_concurrency [--requests 1000] [--concurrency 400] [--db-latency-ms 100]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import warnings
+
+import httpx
+from fastapi import FastAPI
+
+import api.main as main
+
+
+class SleepySession:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def connection(self):
+        return None
+
+    def execute(self, *args, **kwargs):
+        return None
+
+    def commit(self):
+        time.sleep(self.latency)
+
+    def close(self):
+        return None
+
+
+class SleepyAsyncSession:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def connection(self):
+        return None
+
+    async def execute(self, *args, **kwargs):
+        return None
+
+    async def commit(self):
+        await asyncio.sleep(self.latency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+def build_sync_app() -> FastAPI:
+    """The former /predict: a `def` run in the threadpool, with blocking DB I/O."""
+    app = FastAPI()
+
+    @app.post("/predict")
+    def predict(data: main.PredictRequest):
+        values = [data.features[f] for f in main.FEATURES_ORDER]
+        proba = main.registry.active.predictor.predict_one(values)
+        main.write_prediction_logs(
+            [{"request_id": "x", "features": values, "requested_at": None}],
+            [{"request_id": "x", "probability": proba}],
+        )
+        return {"probability": proba}
+
+    return app
+
+
+async def _load(app, n_requests: int, concurrency: int) -> dict:
+    payload = {"features": {f: 1.0 for f in main.FEATURES_ORDER}}
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/predict", json=payload)
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200, r.text
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n_requests)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "rps": n_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1e3,
+    }
+
+
+def run(n_requests: int = 1000, concurrency: int = 400, db_latency_ms: float = 100.0) -> dict:
+    latency = db_latency_ms / 1e3
+    main.SessionLocal = lambda: SleepySession(latency)
+    main.AsyncSessionLocal = lambda: SleepyAsyncSession(latency)
+    main.prediction_cache.maxsize = 0  # mesure du chemin complet
+
+    return {
+        "sync": asyncio.run(_load(build_sync_app(), n_requests, concurrency)),
+        "async": asyncio.run(_load(main.app, n_requests, concurrency)),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=400)
+    parser.add_argument("--db-latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    res = run(args.requests, args.concurrency, args.db_latency_ms)
+    print(f"{'path':>6} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name, r in res.items():
+        print(f"{name:>6} {r['rps']:>8.0f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,82 @@
+"""
+Compares the historical pandas path (DataFrame + scaler.transform) with the compiled
+path (indices + precomputed mean/scale vectors, plain ndarray) and with the NumPy
+evaluator of the flat artifact (standardization folded into the coefficients).
+
+Usage: python -m benchmarks.bench_inference [--repeat 2000]
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from api.flat_model import FlatModel
+from api.inference import pandas_predict_proba
+import api.main as main
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    fn()  # warmup
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def run(repeat: int = 2000, batch_sizes=(1, 100, 1000)) -> list[dict]:
+    rng = np.random.default_rng(42)
+    m = main.registry.active
+    flat = FlatModel.from_artifact(
+        {"model": m.model, "scaler": m.scaler, "seuil": m.threshold, "cols_to_scale": m.cols_to_scale}
+    )
+    rows = []
+    for n in batch_sizes:
+        X = rng.normal(size=(n, main.N_FEATURES))
+        n_repeat = max(10, repeat // n)
+
+        def pandas_path():
+            return pandas_predict_proba(m.model, m.scaler, m.cols_to_scale, m.features_order, X)
+
+        def compiled_path():
+            if n == 1:
+                return m.predictor.predict_one(X[0])
+            return m.predictor.predict_proba(X)
+
+        def flat_path():
+            if n == 1:
+                return flat.predict_one(X[0])
+            return flat.predict_proba(X)
+
+        assert np.array_equal(np.atleast_1d(compiled_path()), pandas_path())
+        np.testing.assert_allclose(np.atleast_1d(flat_path()), pandas_path(), rtol=0, atol=1e-12)
+        t_pandas = _time_per_call(pandas_path, n_repeat)
+        t_compiled = _time_per_call(compiled_path, n_repeat)
+        t_flat = _time_per_call(flat_path, n_repeat)
+        rows.append({
+            "batch_size": n,
+            "pandas_us": t_pandas * 1e6,
+            "compiled_us": t_compiled * 1e6,
+            "flat_us": t_flat * 1e6,
+            "speedup": t_pandas / t_compiled,
+            "flat_speedup": t_pandas / t_flat,
+        })
+    return rows
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    print(f"{'batch':>6} {'pandas (us)':>12} {'compiled (us)':>14} {'speedup':>8} {'flat (us)':>10} {'speedup':>8}")
+    for r in run(args.repeat):
+        print(
+            f"{r['batch_size']:>6} {r['pandas_us']:>12.1f} {r['compiled_us']:>14.1f} {r['speedup']:>7.1f}x"
+            f" {r['flat_us']:>10.1f} {r['flat_speedup']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
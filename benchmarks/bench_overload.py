@@ -0,0 +1,175 @@
+"""
+Load test of /predict with a slow database: tail latency with and without protections.
+
+The database is simulated by a pool of `--pool-size` connections, each log
+transaction holding one for `--db-latency-ms`: beyond pool_size / latency
+writes/s, requests pile up in front of the pool, as with a saturated
+PostgreSQL. Three configurations are compared:
+
+- `unprotected`: neither admission control nor circuit breaker (original behaviour);
+- `admission`: admission control only (503 + Retry-After past the queue);
+- `admission+breaker`: plus the log circuit breaker (degraded mode: scoring without logging).
+
+The load is open-loop (`--rate` requests/s whatever the responses): past
+capacity, a client that does not honour Retry-After does not slow down.
+
+Usage: python -m benchmarks.bench_overload [--rate 300] [--duration 5] [--db-latency-ms 100] [--pool-size 10]
+"""
+import argparse
+import asyncio
+import time
+import warnings
+
+import httpx
+
+import api.main as main
+from api.admission import CircuitBreaker
+
+
+class SlowPool:
+    """Fake async sessions sharing `size` connections, each transaction holding one for `latency` seconds."""
+
+    def __init__(self, size: int, latency: float):
+        self.size = size
+        self.latency = latency
+        self._slots = None
+        self.commits = 0
+
+    def __call__(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)  # créé dans la boucle du test
+        return SlowSession(self)
+
+
+class SlowSession:
+    def __init__(self, pool: SlowPool):
+        self.pool = pool
+        self.held = False
+
+    async def connection(self):
+        await self.pool._slots.acquire()
+        self.held = True
+
+    async def execute(self, *args, **kwargs):
+        if not self.held:
+            await self.connection()
+
+    async def commit(self):
+        await asyncio.sleep(self.pool.latency)
+        self.pool.commits += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.held:
+            self.pool._slots.release()
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] * 1e3
+
+
+async def _load(rate: float, duration: float) -> dict:
+    """Open-loop load: `rate` requests/s for `duration` s, whatever the responses (clients do not back off)."""
+    payload = {"features": {f: 1.0 for f in main.FEATURES_ORDER}}
+    ok, shed, other = [], [], 0
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one():
+            nonlocal other
+            t0 = time.perf_counter()
+            r = await client.post("/predict", json=payload)
+            elapsed = time.perf_counter() - t0
+            if r.status_code == 200:
+                ok.append(elapsed)
+            elif r.status_code == 503 and "Retry-After" in r.headers:
+                shed.append(elapsed)
+            else:
+                other += 1
+
+        tasks = []
+        start = time.perf_counter()
+        for i in range(int(rate * duration)):
+            await asyncio.sleep(max(0.0, start + i / rate - time.perf_counter()))
+            tasks.append(asyncio.create_task(one()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "ok": len(ok),
+        "shed": len(shed),
+        "errors": other,
+        "ok_rps": len(ok) / elapsed,
+        "ok_p50_ms": _percentile(ok, 0.5),
+        "ok_p99_ms": _percentile(ok, 0.99),
+        "shed_p99_ms": _percentile(shed, 0.99),
+    }
+
+
+def run(
+    rate: float = 300.0,
+    duration: float = 5.0,
+    db_latency_ms: float = 100.0,
+    pool_size: int = 10,
+    max_concurrent: int = 32,
+    max_queue: int = 64,
+    queue_timeout: float = 0.25,
+    write_timeout: float = 0.25,
+) -> dict:
+    admission = main.admission
+    saved = (admission.max_concurrent, admission.max_queue, admission.queue_timeout, main.prediction_cache.maxsize,
+             main.log_writer, main.log_breaker, main.LOG_WRITE_TIMEOUT, main.AsyncSessionLocal)
+    main.prediction_cache.maxsize = 0  # mesure du chemin complet
+    main.log_writer = None  # log écrit dans la requête (PREDICTION_LOG_MODE=sync)
+    configs = {
+        "unprotected": (0, None),
+        "admission": (max_concurrent, None),
+        "admission+breaker": (max_concurrent, CircuitBreaker(5, reset_timeout=1.0)),
+    }
+    results = {}
+    try:
+        # Le middleware d'admission est en place dès que le process l'a activé: on ne fait que régler le contrôleur
+        if not admission.enabled and max_concurrent:
+            raise RuntimeError("Start with ADMISSION_MAX_CONCURRENT > 0 to compare the protected configurations")
+        admission.max_queue, admission.queue_timeout = max_queue, queue_timeout
+        main.LOG_WRITE_TIMEOUT = write_timeout
+        for name, (limit, breaker) in configs.items():
+            admission.max_concurrent = limit
+            main.log_breaker = breaker
+            pool = SlowPool(pool_size, db_latency_ms / 1e3)
+            main.AsyncSessionLocal = pool
+            results[name] = {**asyncio.run(_load(rate, duration)), "logged": pool.commits}
+    finally:
+        (admission.max_concurrent, admission.max_queue, admission.queue_timeout, main.prediction_cache.maxsize,
+         main.log_writer, main.log_breaker, main.LOG_WRITE_TIMEOUT, main.AsyncSessionLocal) = saved
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=300.0, help="Requests per second sent to /predict.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load per configuration.")
+    parser.add_argument("--db-latency-ms", type=float, default=100.0)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--max-concurrent", type=int, default=32)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--queue-timeout", type=float, default=0.25)
+    parser.add_argument("--write-timeout", type=float, default=0.25)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    res = run(args.rate, args.duration, args.db_latency_ms, args.pool_size,
+              args.max_concurrent, args.max_queue, args.queue_timeout, args.write_timeout)
+    print(f"{'config':>18} {'200':>6} {'503':>6} {'logged':>7} {'req/s':>7} {'p50 (ms)':>9} {'p99 (ms)':>9} {'503 p99':>8}")
+    for name, r in res.items():
+        print(f"{name:>18} {r['ok']:>6} {r['shed']:>6} {r['logged']:>7} {r['ok_rps']:>7.0f} "
+              f"{r['ok_p50_ms']:>9.1f} {r['ok_p99_ms']:>9.1f} {r['shed_p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
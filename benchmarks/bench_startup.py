@@ -0,0 +1,152 @@
+"""
+Cold start of the API: module import, time to /health/ready and first request.
+
+- import: `import api.main` in a fresh interpreter (`--repeat` times), with the model loaded by
+  the lifespan (MODEL_LAZY_LOAD=1, default) or at import time (MODEL_LAZY_LOAD=0, original behaviour);
+- ready: uvicorn started as a subprocess, time from launch to the first 200 of /health/ready,
+  with the startup phases reported by the worker;
+- first_predict: latency of the first /predict once ready, with and without the request-path
+  warmup (WARMUP_ROWS=0), compared with the median latency of the following requests.
+
+Without `model/<artifact>.schema.json` (`python -m api.artifacts schema model/*.pkl`) the model is
+loaded at import time: generate the schema before measuring.
+
+Prediction logs are written behind (PREDICTION_LOG_MODE=best_effort): no database is needed,
+an unreachable one is only reported by /health/ready.
+
+Usage: python -m benchmarks.bench_startup [--repeat 5] [--requests 50] [--no-server]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from api.registry import load_model, read_schema
+
+ROOT = Path(__file__).resolve().parent.parent
+MODEL_PATH = Path(os.getenv("MODEL_PATH", ROOT / "model" / "classifier_employee.pkl"))
+
+IMPORT_SNIPPET = (
+    "import sys, time; t = time.perf_counter(); import api.main; "
+    "print(time.perf_counter() - t, 'sklearn' in sys.modules)"
+)
+
+
+def _env(**overrides) -> dict:
+    return {
+        **os.environ,
+        "PYTHONWARNINGS": "ignore",
+        "PREDICTION_LOG_MODE": os.getenv("PREDICTION_LOG_MODE", "best_effort"),
+        **overrides,
+    }
+
+
+def import_times(repeat: int = 5, lazy: bool = True, **env) -> dict:
+    """Seconds to import api.main in `repeat` fresh interpreters, and whether sklearn got imported."""
+    seconds, sklearn = [], False
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=_env(MODEL_LAZY_LOAD="1" if lazy else "0", **env),
+            capture_output=True, text=True, check=True,
+        )
+        elapsed, imported = out.stdout.split()[-2:]
+        seconds.append(float(elapsed))
+        sklearn = sklearn or imported == "True"
+    return {"median_s": statistics.median(seconds), "max_s": max(seconds), "sklearn_imported": sklearn}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(n_requests: int = 50, timeout: float = 60.0, **env) -> dict:
+    """Start uvicorn, wait for /health/ready, then time the first and the following /predict calls."""
+    port = _free_port()
+    features_order = read_schema(MODEL_PATH) or load_model(MODEL_PATH).features_order
+    payload = {"features": {f: 1.0 for f in features_order}}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=_env(**env), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10.0) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+                if time.perf_counter() - t0 > timeout:
+                    raise TimeoutError(f"API not ready after {timeout} s")
+                try:
+                    r = client.get("/health/ready")
+                    if r.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass  # socket pas encore ouvert: lifespan en cours
+                time.sleep(0.01)
+            ready_s = time.perf_counter() - t0
+            report = r.json()
+
+            latencies = []
+            for i in range(n_requests + 1):
+                # Vecteurs distincts: pas de réponse servie par le cache
+                body = {"features": {**payload["features"], "age": 30.0 + i}}
+                t = time.perf_counter()
+                client.post("/predict", json=body).raise_for_status()
+                latencies.append(time.perf_counter() - t)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {
+        "ready_s": ready_s,
+        "import_s": report["import_seconds"],
+        "phases": report["phases"],
+        "database": report["database"],
+        "first_predict_ms": latencies[0] * 1e3,
+        "next_predict_p50_ms": statistics.median(latencies[1:]) * 1e3,
+    }
+
+
+def run(repeat: int = 5, n_requests: int = 50, server: bool = True) -> dict:
+    results = {
+        "import/lazy": import_times(repeat, lazy=True),
+        "import/eager": import_times(repeat, lazy=False),
+    }
+    if server:
+        results["serve/warmup"] = serve(n_requests)
+        results["serve/no_request_warmup"] = serve(n_requests, WARMUP_ROWS="0")
+        results["serve/eager_import"] = serve(n_requests, MODEL_LAZY_LOAD="0")
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per import measurement.")
+    parser.add_argument("--requests", type=int, default=50, help="/predict calls after the first one.")
+    parser.add_argument("--no-server", action="store_true", help="Only measure the module import.")
+    args = parser.parse_args()
+
+    res = run(args.repeat, args.requests, server=not args.no_server)
+    print(f"{'import':>22} {'median (s)':>11} {'max (s)':>8} {'sklearn':>8}")
+    for name in ("import/lazy", "import/eager"):
+        r = res[name]
+        print(f"{name:>22} {r['median_s']:>11.3f} {r['max_s']:>8.3f} {str(r['sklearn_imported']):>8}")
+    serves = [name for name in res if name.startswith("serve/")]
+    if serves:
+        print(f"\n{'server':>22} {'ready (s)':>10} {'import (s)':>11} {'1st /predict (ms)':>18} {'next p50 (ms)':>14}  phases")
+        for name in serves:
+            r = res[name]
+            phases = ", ".join(f"{k} {v:.3f}" for k, v in r["phases"].items())
+            print(f"{name:>22} {r['ready_s']:>10.3f} {r['import_s']:>11.3f} {r['first_predict_ms']:>18.2f} "
+                  f"{r['next_predict_p50_ms']:>14.2f}  {phases} (db: {r['database']})")
+
+
+if __name__ == "__main__":
+    main_cli()
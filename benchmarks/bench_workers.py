@@ -0,0 +1,83 @@
+"""
+Model memory by number of workers, with and without memory-mapping.
+
+Each worker (separate process) loads the artifact like the API, then touches
+all its arrays. The anonymous memory added by the load is measured: with
+`mmap_mode="r"` the model pages stay shared (page cache) and the cost of each
+extra worker tends to zero.
+
+The shipped artifact is small (logistic regression); `--pad-mb` adds a dummy
+array to a copy of the artifact to simulate a large model.
+
+Usage: python -m benchmarks.bench_workers [--workers 1 8] [--pad-mb 200]
+"""
+import argparse
+import multiprocessing as mp
+import tempfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from api.artifacts import load_artifact, memory_report
+
+ROOT = Path(__file__).resolve().parent.parent
+MODEL_PATH = ROOT / "model" / "classifier_employee.pkl"
+
+
+def _worker(path: str, mmap: bool, ready, release) -> None:
+    # sklearn est importé pendant le unpickling: on l'importe avant la mesure de référence
+    joblib.load(MODEL_PATH)
+    before = memory_report()
+    obj = load_artifact(Path(path), mmap=mmap)
+    # parcourt toutes les pages des tableaux (comme une inférence sur un gros modèle)
+    total = float(np.sum(obj["padding"])) if "padding" in obj else 0.0
+    after = memory_report()
+    ready.put({
+        "anon_delta": after.get("anon", after.get("peak_rss", 0)) - before.get("anon", before.get("peak_rss", 0)),
+        "pss": after.get("pss", after.get("peak_rss", 0)),
+        "checksum": total,
+    })
+    release.wait()
+
+
+def measure(path: Path, n_workers: int, mmap: bool) -> dict:
+    ctx = mp.get_context("spawn")
+    ready, release = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(str(path), mmap, ready, release)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    # tous les workers restent vivants pendant la mesure pour partager les pages
+    reports = [ready.get() for _ in procs]
+    release.set()
+    for p in procs:
+        p.join()
+    return {
+        "workers": n_workers,
+        "mmap": mmap,
+        "model_anon_mb_total": sum(r["anon_delta"] for r in reports) / 2**20,
+        "pss_mb_total": sum(r["pss"] for r in reports) / 2**20,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--pad-mb", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "padded.pkl"
+        obj = joblib.load(MODEL_PATH)
+        obj["padding"] = np.ones(args.pad_mb * 2**20 // 8)
+        joblib.dump(obj, path, compress=0)
+
+        print(f"{'workers':>8} {'mmap':>5} {'model anon (MB)':>16} {'total PSS (MB)':>15}")
+        for n in args.workers:
+            for mmap in (False, True):
+                r = measure(path, n, mmap)
+                print(f"{r['workers']:>8} {str(r['mmap']):>5} {r['model_anon_mb_total']:>16.1f} {r['pss_mb_total']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
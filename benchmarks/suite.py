@@ -0,0 +1,364 @@
+"""
+API benchmark suite, without network, compared against a stored baseline.
+
+- micro: preprocessing, `predict_proba`, attributions (`/explain`) and `predict_one` at several batch sizes;
+- load: `/predict` and `/metadata` served in-process (ASGI) at several concurrency levels;
+- log: writing a prediction log (sync and async) to a fake session, SQLite
+  (temporary file) or a database given by `--db-url`.
+
+Each measure reports throughput, p50/p95/p99 latencies and the memory (RSS) of the process.
+Results are written as JSON and compared with `benchmarks/baseline.json`: throughput down or
+p95 up by more than `--threshold` is a regression (exit code 1).
+
+Usage:
+    python -m benchmarks.suite [--quick] [--db fake|sqlite] [--db-url URL] [--output results.json]
+    python -m benchmarks.suite --save-baseline      # replaces the stored baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+import numpy as np
+
+import api.main as main
+from api.artifacts import memory_report
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.25
+
+
+class NullSession:
+    """Session that accepts every call and does nothing (same role as FakeSession in the tests)."""
+
+    def connection(self):
+        return None
+
+    def execute(self, *args, **kwargs):
+        return None
+
+    def commit(self):
+        return None
+
+    def close(self):
+        return None
+
+
+class NullAsyncSession:
+    async def connection(self):
+        return None
+
+    async def execute(self, *args, **kwargs):
+        return None
+
+    async def commit(self):
+        return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+# --- Mesure ---------------------------------------------------------------------------------
+
+def _memory() -> dict:
+    rep = memory_report()
+    # ru_maxrss: kilo-octets sous Linux
+    return {
+        "rss_mb": rep.get("rss", 0) / 2**20,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _summary(latencies: list[float], ops: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3
+
+    return {
+        "throughput": ops / elapsed,
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "samples": len(latencies),
+        **_memory(),
+    }
+
+
+def time_calls(fn: Callable[[], object], repeat: int, rows_per_call: int = 1) -> dict:
+    """Time `repeat` sequential calls; throughput is in rows/s, from the median call (robust to outliers)."""
+    fn()  # warmup
+    latencies = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    return _summary(latencies, rows_per_call, statistics.median(latencies))
+
+
+async def _time_calls_async(fn, repeat: int) -> dict:
+    await fn()
+    latencies = []
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        await fn()
+        latencies.append(time.perf_counter() - t)
+    return _summary(latencies, repeat, time.perf_counter() - t0)
+
+
+async def load_test(app, method: str, path: str, payload: Optional[dict], n_requests: int, concurrency: int) -> dict:
+    """Send `n_requests` to the ASGI app with at most `concurrency` in flight; throughput is in req/s."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                t = time.perf_counter()
+                r = await client.request(method, path, json=payload)
+                latencies.append(time.perf_counter() - t)
+                if r.status_code != 200:
+                    raise RuntimeError(f"{method} {path} -> {r.status_code}: {r.text[:200]}")
+
+        await one()  # warmup
+        latencies.clear()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n_requests)))
+        elapsed = time.perf_counter() - t0
+    return _summary(latencies, n_requests, elapsed)
+
+
+# --- Backends de log --------------------------------------------------------------------------
+
+def use_backend(db: str, db_url: Optional[str] = None) -> str:
+    """Point main.SessionLocal / main.AsyncSessionLocal at the requested backend; returns its label."""
+    if db_url:
+        from sqlalchemy import create_engine
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.orm import sessionmaker
+
+        from api.db import engine_options, metadata, to_async_url
+
+        sync_engine = create_engine(db_url, **engine_options(db_url))
+        metadata.create_all(sync_engine)
+        main.SessionLocal = sessionmaker(bind=sync_engine, autoflush=False)
+        async_url = to_async_url(db_url)
+        main.AsyncSessionLocal = async_sessionmaker(
+            create_async_engine(async_url, **engine_options(async_url)), expire_on_commit=False
+        )
+        return sync_engine.dialect.name
+
+    if db == "sqlite":
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.orm import sessionmaker
+
+        from api.db import metadata
+
+        path = Path(tempfile.mkdtemp(prefix="hrpredict-bench-")) / "bench.db"
+        sync_engine = create_engine(f"sqlite:///{path}")
+        metadata.create_all(sync_engine)
+        with sync_engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 30})
+
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def _pragmas(dbapi_conn, _):
+            dbapi_conn.execute("PRAGMA synchronous=NORMAL")
+
+        main.SessionLocal = sessionmaker(bind=sync_engine, autoflush=False)
+        main.AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+        return "sqlite"
+
+    main.SessionLocal = NullSession
+    main.AsyncSessionLocal = NullAsyncSession
+    return "fake"
+
+
+def _log_rows(features: dict) -> tuple[list[dict], list[dict]]:
+    request_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    return (
+        [{"request_id": request_id, "features": [features[f] for f in main.FEATURES_ORDER], "requested_at": now}],
+        [{
+            "request_id": request_id, "probability": 0.5, "prediction": 0, "threshold": 0.76,
+            "predicted_at": now, "cached": False, "model_version": "bench",
+        }],
+    )
+
+
+# --- Suite ----------------------------------------------------------------------------------
+
+def run_suite(
+    quick: bool = False,
+    db: str = "fake",
+    db_url: Optional[str] = None,
+    concurrency: tuple = (1, 16, 64),
+    batch_sizes: tuple = (1, 100, 1000, 10000),
+) -> dict:
+    warnings.filterwarnings("ignore")
+    scale = 0.2 if quick else 1.0
+    rng = np.random.default_rng(42)
+    m = main.registry.active
+    results = {}
+
+    # Micro-benchmarks (rows/s)
+    for n in batch_sizes:
+        X = np.asfortranarray(rng.normal(size=(n, main.N_FEATURES)))
+        repeat = max(200, int(scale * 20000 / n))
+        work = np.empty_like(X)
+
+        def preprocess():
+            np.copyto(work, X)
+            m.predictor.preprocessor.transform_(work)
+
+        X_scaled = m.predictor.preprocessor.transform_(X.copy(order="F"))
+        results[f"micro/preprocess/n={n}"] = time_calls(preprocess, repeat, n)
+        results[f"micro/predict_proba/n={n}"] = time_calls(lambda: m.predictor.estimator.predict_proba(X_scaled), repeat, n)
+        if main.explanations is not None:
+            explainer = main.explanations.get(m)
+            results[f"micro/explain/n={n}"] = time_calls(lambda: explainer.contributions(X), repeat, n)
+    row = rng.normal(size=main.N_FEATURES).tolist()
+    results["micro/predict_one"] = time_calls(lambda: m.predictor.predict_one(row), int(scale * 20000))
+
+    # Log d'une prédiction (une transaction, deux INSERT)
+    backend = use_backend(db, db_url)
+    features = {f: float(v) for f, v in zip(main.FEATURES_ORDER, row)}
+    log_repeat = int(scale * (5000 if backend == "fake" else 500))
+    results[f"log/{backend}/sync"] = time_calls(lambda: main.write_prediction_logs(*_log_rows(features)), log_repeat)
+    # Log async et charge ASGI dans une seule boucle d'événements (pools asyncio liés à la boucle)
+    n_requests = int(scale * (2000 if backend == "fake" else 500))
+    payload = {"features": features}
+
+    async def async_benchmarks():
+        results[f"log/{backend}/async"] = await _time_calls_async(
+            lambda: main.write_prediction_logs_async(*_log_rows(features)), log_repeat
+        )
+        for c in concurrency:
+            results[f"load/{backend}/predict/c={c}"] = await load_test(
+                main.app, "POST", "/predict", payload, n_requests, c
+            )
+            results[f"load/metadata/c={c}"] = await load_test(main.app, "GET", "/metadata", None, n_requests, c)
+
+    # Cache désactivé pour mesurer le chemin complet de /predict
+    cache_maxsize = main.prediction_cache.maxsize
+    main.prediction_cache.maxsize = 0
+    try:
+        asyncio.run(async_benchmarks())
+    finally:
+        main.prediction_cache.maxsize = cache_maxsize
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": quick,
+            "db": backend,
+            "model_version": m.version,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    """
+    Compare two suite outputs benchmark by benchmark.
+
+    A benchmark regresses when its throughput drops, or its p95 latency grows, by more
+    than `threshold` (relative). Benchmarks missing from either side are ignored.
+    """
+    rows = []
+    for name, base in baseline.get("results", {}).items():
+        cur = current.get("results", {}).get(name)
+        if cur is None:
+            continue
+        tp = cur["throughput"] / base["throughput"] - 1
+        p95 = cur["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] > 0 else 0.0
+        rows.append({
+            "name": name,
+            "throughput": cur["throughput"],
+            "throughput_change": tp,
+            "p95_ms": cur["p95_ms"],
+            "p95_change": p95,
+            "regression": tp < -threshold or p95 > threshold,
+        })
+    return rows
+
+
+def _print_results(results: dict) -> None:
+    print(f"{'benchmark':<36} {'throughput/s':>13} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rss MB':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:<36} {r['throughput']:>13,.0f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+            f"{r['p99_ms']:>8.3f} {r['rss_mb']:>7.1f}"
+        )
+
+
+def _print_comparison(rows: list[dict], threshold: float) -> None:
+    print(f"\nvs baseline (threshold {threshold:.0%}):")
+    print(f"{'benchmark':<36} {'throughput':>11} {'p95':>8}")
+    for r in rows:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['name']:<36} {r['throughput_change']:>+10.1%} {r['p95_change']:>+8.1%}{flag}")
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations (smoke run, noisier numbers).")
+    parser.add_argument("--db", choices=("fake", "sqlite"), default="fake", help="Backend used for logging.")
+    parser.add_argument("--db-url", help="SQLAlchemy URL of a local database to log into (overrides --db).")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change counted as a regression (default 0.25).")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    args = parser.parse_args(argv)
+
+    out = run_suite(args.quick, args.db, args.db_url, tuple(args.concurrency))
+    _print_results(out["results"])
+
+    if args.output:
+        args.output.write_text(json.dumps(out, indent=2))
+        print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(out, indent=2) + "\n")
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}: run with --save-baseline to create one.")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["meta"].get("quick") != args.quick:
+        print("\nNote: baseline and current run use different --quick settings, expect noise.")
+    rows = compare(out, baseline, args.threshold)
+    _print_comparison(rows, args.threshold)
+    regressions = [r["name"] for r in rows if r["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,9 +1,17 @@
 -- Extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+DROP TABLE IF EXISTS model_activations CASCADE;
+DROP TABLE IF EXISTS drift_checkpoints CASCADE;
+DROP TABLE IF EXISTS prediction_sweeps CASCADE;
+DROP TABLE IF EXISTS employee_scores CASCADE;
+DROP TABLE IF EXISTS scoring_runs CASCADE;
+DROP TABLE IF EXISTS idempotency_keys CASCADE;
 DROP TABLE IF EXISTS prediction_results CASCADE;
 DROP TABLE IF EXISTS prediction_requests CASCADE;
+DROP TABLE IF EXISTS feature_vectors CASCADE;
 DROP TABLE IF EXISTS employees CASCADE;
+DROP TABLE IF EXISTS load_checkpoints CASCADE;
 
 -- CREATE
 
@@ -11,26 +19,149 @@ DROP TABLE IF EXISTS employees CASCADE;
 CREATE TABLE employees (
   employee_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
   features JSONB NOT NULL,
-  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  -- Mis à jour par trigger: sert de filigrane au scoring incrémental
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_employees_updated_at
+  BEFORE UPDATE ON employees
+  FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Lots déjà chargés par db/create_db.py (reprise d'un chargement interrompu)
+CREATE TABLE load_checkpoints (
+  source TEXT NOT NULL,
+  -- sha256 du fichier chargé: la reprise refuse un fichier modifié
+  fingerprint TEXT NOT NULL,
+  chunk_size INTEGER NOT NULL,
+  chunk_index INTEGER NOT NULL,
+  rows INTEGER NOT NULL,
+  loaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (source, chunk_size, chunk_index)
+);
+
+-- Vecteurs de features dédupliqués (adressés par contenu): un profil soumis N fois
+-- est stocké une fois. features_hash = blake2b-128 du vecteur float64 canonique
+CREATE TABLE feature_vectors (
+  features_hash BYTEA PRIMARY KEY,
+  features FLOAT8[] NOT NULL       -- valeurs dans l'ordre FEATURES_ORDER (/metadata)
+);
+
+-- Log des prédictions, partitionné par mois (api/log_archive.py crée les partitions à
+-- venir, archive puis supprime les anciennes). La clé de partition fait partie des
+-- clés primaires; pas de clé étrangère: une partition se supprime sans cascade.
+
 -- Inputs envoyés au modèle
 CREATE TABLE prediction_requests (
-  request_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-  input_features JSONB NOT NULL,
-  requested_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
+  request_id UUID NOT NULL DEFAULT uuid_generate_v4(),
+  features_hash BYTEA NOT NULL,    -- -> feature_vectors
+  requested_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (request_id, requested_at)
+) PARTITION BY RANGE (requested_at);
 
--- Outputs du modèle
+-- Outputs du modèle (predicted_at = requested_at de la requête: mêmes partitions)
 CREATE TABLE prediction_results (
-  result_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-  request_id UUID NOT NULL UNIQUE REFERENCES prediction_requests(request_id) ON DELETE CASCADE,
+  request_id UUID NOT NULL,
+  probability DOUBLE PRECISION NOT NULL,
+  prediction INTEGER NOT NULL,
+  threshold DOUBLE PRECISION NOT NULL,
+  predicted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  -- TRUE si la probabilité vient du cache de l'API (pas de recalcul)
+  cached BOOLEAN NOT NULL DEFAULT FALSE,
+  -- Version (empreinte de l'artefact) du modèle ayant produit le score
+  model_version TEXT,
+  PRIMARY KEY (request_id, predicted_at)
+) PARTITION BY RANGE (predicted_at);
+
+-- Filet de sécurité: lignes hors des partitions mensuelles (déplacées à leur création)
+CREATE TABLE prediction_requests_default PARTITION OF prediction_requests DEFAULT;
+CREATE TABLE prediction_results_default PARTITION OF prediction_results DEFAULT;
+
+-- En-têtes Idempotency-Key des clients, supprimés après IDEMPOTENCY_TTL
+CREATE TABLE idempotency_keys (
+  idempotency_key TEXT PRIMARY KEY,
+  request_id UUID NOT NULL,
+  requested_at TIMESTAMPTZ NOT NULL
+);
+
+-- Analyses de sensibilité (/predict/sweep): une ligne résumé par appel.
+-- base_features + axes (grilles complètes) + model_version suffisent à recalculer la courbe
+CREATE TABLE prediction_sweeps (
+  sweep_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  requested_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  base_features JSONB NOT NULL,
+  axes JSONB NOT NULL,           -- [{"feature": ..., "values": [...]}]
+  n_points INTEGER NOT NULL,
+  base_probability DOUBLE PRECISION NOT NULL,
+  min_probability DOUBLE PRECISION NOT NULL,
+  max_probability DOUBLE PRECISION NOT NULL,
+  threshold DOUBLE PRECISION NOT NULL,
+  model_version TEXT
+);
+
+-- Runs de scoring par lots (api/scoring_job.py)
+CREATE TABLE scoring_runs (
+  run_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  model_version TEXT NOT NULL,
+  mode TEXT NOT NULL,            -- full | incremental
+  status TEXT NOT NULL,          -- running | succeeded | failed
+  -- Début du run moins une marge: le prochain run incrémental relit updated_at >= watermark
+  watermark TIMESTAMPTZ,
+  rows_scored INTEGER NOT NULL DEFAULT 0,
+  rows_skipped INTEGER NOT NULL DEFAULT 0,
+  started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMPTZ,
+  error TEXT
+);
+
+-- Dernier score de chaque employé, par version du modèle
+CREATE TABLE employee_scores (
+  employee_id UUID NOT NULL REFERENCES employees(employee_id) ON DELETE CASCADE,
+  model_version TEXT NOT NULL,
   probability DOUBLE PRECISION NOT NULL,
   prediction INTEGER NOT NULL,
   threshold DOUBLE PRECISION NOT NULL,
-  predicted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+  run_id UUID NOT NULL REFERENCES scoring_runs(run_id),
+  scored_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (employee_id, model_version)
+);
+
+-- Statistiques glissantes des inputs (api/drift.py), une ligne par worker:
+-- compteurs, moyenne / M2 (Welford) et histogrammes à bins fixes, ~quelques Ko
+CREATE TABLE drift_checkpoints (
+  instance_id TEXT PRIMARY KEY,
+  reference_fingerprint TEXT NOT NULL,
+  n_observations INTEGER NOT NULL,
+  state JSONB NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Version de modèle servie par tous les workers (POST /admin/models/{version}/activate):
+-- la dernière ligne est la cible, un rollback supprime la dernière ligne
+CREATE TABLE model_activations (
+  activation_id BIGSERIAL PRIMARY KEY,
+  version TEXT NOT NULL,
+  activated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 -- Index
 CREATE INDEX idx_employees_features_gin ON employees USING GIN (features);
-CREATE INDEX idx_predres_predicted_at ON prediction_results(predicted_at);
+-- Nettoyage des clés expirées (la clé primaire arbitre les rejeux, même entre workers)
+CREATE INDEX idx_idempotency_keys_requested_at ON idempotency_keys(requested_at);
+-- Index des tables partitionnées: créés sur chaque partition, y compris les futures.
+-- Vecteurs encore référencés (ramasse-miettes de feature_vectors après archivage)
+CREATE INDEX idx_predreq_features_hash ON prediction_requests(features_hash);
+-- Pagination keyset de GET /predictions: (predicted_at, request_id) DESC, avec ou sans
+-- filtre sur la décision; la probabilité est incluse pour filtrer sans lire la table
+CREATE INDEX idx_predres_keyset ON prediction_results(predicted_at, request_id) INCLUDE (probability);
+CREATE INDEX idx_predres_prediction_keyset ON prediction_results(prediction, predicted_at, request_id) INCLUDE (probability);
+CREATE INDEX idx_employees_updated_at ON employees(updated_at);
+CREATE INDEX idx_scoring_runs_version ON scoring_runs(model_version, status);
+CREATE INDEX idx_prediction_sweeps_requested_at ON prediction_sweeps(requested_at);
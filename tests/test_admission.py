@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.admission import CLOSED, HALF_OPEN, OPEN, AdmissionController, CircuitBreaker, Overloaded
+from benchmarks.bench_overload import run as overload_run
+
+
+class FailingAsyncSession:
+    """Async session whose database is down (or hangs for `delay` seconds)."""
+
+    opened = 0
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        FailingAsyncSession.opened += 1
+
+    async def connection(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        raise ConnectionError("database unreachable")
+
+    async def execute(self, *args, **kwargs):
+        await self.connection()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+def test_controller_limit_queue_and_timeout():
+    async def scenario():
+        c = AdmissionController(1, max_queue=1, queue_timeout=0.05)
+        await c.acquire()
+        waiter = asyncio.create_task(c.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as e:
+            await c.acquire()
+        assert e.value.reason == "queue_full"
+
+        c.release()  # créneau transmis au premier en attente
+        await waiter
+        assert c.stats()["in_flight"] == 1
+
+        with pytest.raises(Overloaded) as e:
+            await c.acquire()
+        assert e.value.reason == "queue_timeout"
+        c.release()
+        stats = c.stats()
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+        assert stats["admitted"] == 2 and stats["queued"] == 2
+        assert stats["rejected"] == {"queue_full": 1, "queue_timeout": 1}
+
+    asyncio.run(scenario())
+
+
+def test_breaker_opens_then_probes():
+    clock = [0.0]
+    b = CircuitBreaker(2, reset_timeout=10, clock=lambda: clock[0])
+    b.record_failure()
+    assert b.allow() and b.state == CLOSED
+    b.record_failure()
+    assert b.state == OPEN and not b.allow()
+    assert b.retry_after() == 10
+
+    clock[0] = 10
+    assert b.state == HALF_OPEN
+    assert b.allow() and not b.allow()  # une seule écriture test
+    b.record_failure()
+    assert b.state == OPEN and b.opened == 2
+
+    clock[0] = 20
+    assert b.allow()
+    b.record_success()
+    assert b.state == CLOSED and b.allow()
+
+
+def test_cancelled_probe_releases_the_half_open_breaker(monkeypatch):
+    clock = [0.0]
+    breaker = CircuitBreaker(1, reset_timeout=10, clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] = 10
+    monkeypatch.setattr(main, "log_breaker", breaker)
+    monkeypatch.setattr(main, "LOG_WRITE_TIMEOUT", 5.0)
+    started = asyncio.Event()
+
+    async def hanging_write():
+        started.set()
+        await asyncio.sleep(60)
+
+    async def scenario():
+        probe = asyncio.create_task(main.guarded_write_async(hanging_write))
+        await started.wait()
+        assert not breaker.allow()  # sonde en cours
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(scenario())
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()  # une nouvelle sonde peut partir
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_overloaded_requests_get_503_with_retry_after(monkeypatch, make_valid_features):
+    client = TestClient(main.app)
+    monkeypatch.setattr(main.admission, "max_concurrent", 1)
+    monkeypatch.setattr(main.admission, "max_queue", 0)
+    monkeypatch.setattr(main.admission, "in_flight", 1)  # un créneau déjà occupé
+    rejected = main.ADMISSION_REJECTED.value("queue_full")
+
+    r = client.post("/predict", json={"features": make_valid_features(0.5)})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+    assert r.json()["reason"] == "queue_full"
+    assert main.ADMISSION_REJECTED.value("queue_full") == rejected + 1
+    assert main.HTTP_REQUESTS.value("POST", "/predict", "503") >= 1
+    # Hors des routes de scoring: pas de contrôle
+    assert client.get("/metadata").status_code == 200
+
+
+def test_degraded_mode_keeps_scoring_when_the_database_fails(monkeypatch, make_valid_features):
+    monkeypatch.setattr(main, "log_writer", None)
+    monkeypatch.setattr(main, "log_breaker", CircuitBreaker(2, reset_timeout=60))
+    monkeypatch.setattr(main, "LOG_WRITE_TIMEOUT", 0.05)
+    FailingAsyncSession.opened = 0
+    monkeypatch.setattr(main, "AsyncSessionLocal", lambda: FailingAsyncSession(delay=1.0))
+    degraded = {r: main.DEGRADED.value(r) for r in ("write_timeout", "breaker_open")}
+
+    client = TestClient(main.app)
+    for i in range(4):
+        r = client.post("/predict", json={"features": make_valid_features(0.1 * i)})
+        assert r.status_code == 200
+    # 2 écritures trop lentes ouvrent le disjoncteur, les suivantes ne touchent plus la base
+    assert FailingAsyncSession.opened == 2
+    assert main.DEGRADED.value("write_timeout") == degraded["write_timeout"] + 2
+    assert main.DEGRADED.value("breaker_open") == degraded["breaker_open"] + 2
+    assert main.log_breaker.state == OPEN
+    assert "hrpredict_log_breaker_state 2" in client.get("/metrics").text
+
+    # Idempotency-Key: impossible à honorer sans la base
+    r = client.post("/predict", json={"features": make_valid_features(0.5)}, headers={"Idempotency-Key": "k-1"})
+    assert r.status_code == 503
+    assert 55 <= int(r.headers["Retry-After"]) <= 60
+
+
+@pytest.mark.perf
+def test_tail_latency_stays_bounded_with_a_slow_database():
+    # Base à 40 écritures/s, 200 requêtes/s pendant 0,5 s
+    res = overload_run(
+        rate=200, duration=0.5, db_latency_ms=50, pool_size=2,
+        max_concurrent=4, max_queue=4, queue_timeout=0.1, write_timeout=0.05,
+    )
+    unprotected, admission, degraded = res["unprotected"], res["admission"], res["admission+breaker"]
+    assert unprotected["shed"] == 0 and unprotected["ok_p99_ms"] > 1000  # la file d'attente grandit
+
+    # Admission: latence des requêtes servies bornée par la file, rejets rapides
+    assert admission["ok_p99_ms"] < unprotected["ok_p99_ms"] / 3
+    assert admission["shed"] > 0 and admission["shed_p99_ms"] < 500
+    assert admission["ok"] + admission["shed"] == 100 and admission["errors"] == 0
+
+    # Disjoncteur: le scoring continue sans attendre la base
+    assert degraded["ok"] > admission["ok"]
+    assert degraded["ok_p99_ms"] < admission["ok_p99_ms"]
@@ -0,0 +1,128 @@
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import api.main as main
+from api.audit import decode_cursor, encode_cursor, prediction_query
+from api.db import feature_vectors, metadata, prediction_requests, prediction_results
+from api.prediction_log import storage_rows
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# Base PostgreSQL jetable (le schéma y est supprimé puis recréé)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    metadata.create_all(engine, tables=[feature_vectors, prediction_requests, prediction_results])
+    # 50 prédictions, deux par seconde (égalités de predicted_at départagées par request_id)
+    reqs, results = [], []
+    for i in range(50):
+        rid = str(uuid.UUID(int=i + 1))
+        ts = T0 + timedelta(seconds=i // 2)
+        reqs.append({"request_id": rid, "features": [float(i)] * main.N_FEATURES, "requested_at": ts})
+        results.append({
+            "request_id": rid, "probability": i / 50, "prediction": int(i / 50 >= 0.5), "threshold": 0.5,
+            "predicted_at": ts, "cached": False, "model_version": "v1" if i < 40 else "v2",
+        })
+    vectors, reqs = storage_rows(reqs)
+    with engine.begin() as conn:
+        conn.execute(insert(feature_vectors), vectors)
+        conn.execute(insert(prediction_requests), reqs)
+        conn.execute(insert(prediction_results), results)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=engine))
+    return TestClient(main.app)
+
+
+def test_cursor_roundtrip():
+    ts, rid = decode_cursor(encode_cursor(T0, "abc"))
+    assert ts == T0 and rid == "abc"
+
+
+def test_get_prediction(client):
+    r = client.get(f"/predictions/{uuid.UUID(int=3)}")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["probability"] == pytest.approx(2 / 50)
+    assert body["input_features"] == {f: 2.0 for f in main.FEATURES_ORDER}
+
+    assert client.get(f"/predictions/{uuid.UUID(int=999)}").status_code == 404
+    assert client.get("/predictions/not-a-uuid").status_code == 422
+
+
+def test_get_prediction_within_bounds(client):
+    # request 3: predicted_at = T0 + 1 s
+    url = f"/predictions/{uuid.UUID(int=3)}"
+    inside = {"since": T0.isoformat(), "until": (T0 + timedelta(seconds=2)).isoformat()}
+    assert client.get(url, params=inside).json()["probability"] == pytest.approx(2 / 50)
+    assert client.get(url, params={"since": (T0 + timedelta(seconds=2)).isoformat()}).status_code == 404
+    assert client.get(url, params={"until": (T0 + timedelta(seconds=1)).isoformat()}).status_code == 404
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (disposable PostgreSQL database)")
+def test_bounded_lookup_reads_one_partition():
+    from db.create_db import SCHEMA_PATH
+    from api.log_archive import ensure_partitions
+
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA_PATH.read_text(encoding="utf-8")))
+    ensure_partitions(engine, now=datetime(2026, 8, 1, tzinfo=timezone.utc), ahead=2)
+
+    def plan(stmt):
+        compiled = stmt.compile(engine)
+        with engine.connect() as conn:
+            return "\n".join(conn.exec_driver_sql("EXPLAIN " + str(compiled), compiled.params).scalars())
+
+    rid = str(uuid.uuid4())
+    unbounded = plan(prediction_query(rid))
+    assert "prediction_results_p202608" in unbounded and "prediction_results_p202610" in unbounded
+    month = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    bounded = plan(prediction_query(rid, since=month, until=datetime(2026, 11, 1, tzinfo=timezone.utc)))
+    assert "p202610" in bounded
+    assert "p202608" not in bounded and "p202609" not in bounded
+
+
+def test_keyset_pages_cover_every_row_once(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 7, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/predictions", params=params).json()
+        seen += [item["request_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 50 and len(set(seen)) == 50
+    assert seen[0] == str(uuid.UUID(int=50))  # plus récent d'abord
+    assert seen[-1] == str(uuid.UUID(int=1))
+
+
+def test_filters(client):
+    items = client.get("/predictions", params={"prediction": 1, "min_probability": 0.6, "max_probability": 0.7}).json()["items"]
+    assert sorted(round(x["probability"], 2) for x in items) == [0.6, 0.62, 0.64, 0.66, 0.68, 0.7]
+
+    items = client.get("/predictions", params={"model_version": "v2", "include_features": False}).json()["items"]
+    assert len(items) == 10 and all(x["input_features"] is None for x in items)
+
+    since, until = (T0 + timedelta(seconds=5)).isoformat(), (T0 + timedelta(seconds=7)).isoformat()
+    items = client.get("/predictions", params={"since": since, "until": until}).json()["items"]
+    assert len(items) == 4
+
+    assert client.get("/predictions", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_ndjson_stream(client):
+    r = client.get("/predictions", params={"prediction": 0}, headers={"Accept": "application/x-ndjson"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == 25
+    assert all(x["prediction"] == 0 for x in lines)
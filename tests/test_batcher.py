@@ -0,0 +1,119 @@
+import asyncio
+import dataclasses
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+import api.main as main
+from api.batcher import MicroBatcher
+
+
+pytestmark = pytest.mark.usefixtures("mock_db")
+
+
+def _rows(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, main.N_FEATURES)).tolist()
+
+
+def test_concurrent_rows_are_scored_in_one_call():
+    m = main.registry.active
+    batcher = MicroBatcher(max_batch=64, max_wait=0.05)
+    rows = _rows(10)
+
+    async def go():
+        return await asyncio.gather(*(batcher.submit(m, r) for r in rows))
+
+    probas = asyncio.run(go())
+    assert batcher.batches == 1 and batcher.rows == 10
+    # chaque appelant reçoit sa propre probabilité (au dernier bit près du chemin une ligne)
+    np.testing.assert_allclose(probas, [m.predictor.predict_one(r) for r in rows], rtol=0, atol=1e-12)
+
+
+def test_batch_is_flushed_when_full_and_split_by_model_version():
+    m = main.registry.active
+    other = dataclasses.replace(m, version="other")
+    batcher = MicroBatcher(max_batch=4, max_wait=10.0)  # seul le remplissage déclenche le scoring
+
+    async def go():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(m if i % 2 else other, r) for i, r in enumerate(_rows(4)))),
+            timeout=1.0,
+        )
+
+    assert len(asyncio.run(go())) == 4
+    assert batcher.batches == 2 and batcher.rows == 4
+
+
+def test_scoring_does_not_block_the_event_loop():
+    m = main.registry.active
+
+    class SlowPredictor:
+        def predict_proba(self, X, copy=True):
+            time.sleep(0.2)
+            return m.predictor.predict_proba(X, copy=copy)
+
+    slow = dataclasses.replace(m, predictor=SlowPredictor())
+    batcher = MicroBatcher(max_batch=2, max_wait=10.0)
+
+    async def go():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        probas = await asyncio.gather(*(batcher.submit(slow, r) for r in _rows(2)))
+        task.cancel()
+        return probas, ticks
+
+    probas, ticks = asyncio.run(go())
+    assert len(probas) == 2
+    assert ticks >= 5  # la boucle a continué de tourner pendant les 200 ms de scoring
+
+
+def test_pending_rows_are_kept_per_event_loop():
+    m = main.registry.active
+    batcher = MicroBatcher(max_batch=64, max_wait=5.0)
+
+    async def abandoned():
+        # Boucle fermée avant l'échéance du timer: ligne et timer restent attachés à elle
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(batcher.submit(m, _rows(1)[0]), timeout=0.01)
+
+    asyncio.run(abandoned())
+    batcher.max_wait = 0.01
+
+    async def go():
+        return await asyncio.wait_for(batcher.submit(m, _rows(1)[0]), timeout=1.0)
+
+    assert 0.0 <= asyncio.run(go()) <= 1.0
+    assert batcher.batches == 1
+
+
+def test_predict_contract_unchanged_with_microbatching(monkeypatch):
+    batcher = MicroBatcher(max_batch=32, max_wait=0.02)
+    monkeypatch.setattr(main, "microbatcher", batcher)
+    monkeypatch.setattr(main.prediction_cache, "maxsize", 0)
+
+    rows = [dict(zip(main.FEATURES_ORDER, r)) for r in _rows(8, seed=1)]
+
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/predict", json={"features": f}) for f in rows))
+
+    responses = asyncio.run(go())
+    assert batcher.rows == 8 and batcher.batches < 8
+    m = main.registry.active
+    for f, r in zip(rows, responses):
+        assert r.status_code == 200
+        data = r.json()
+        assert set(data) == {"request_id", "probability", "prediction", "threshold"}
+        expected = m.predictor.predict_one([f[k] for k in main.FEATURES_ORDER])
+        assert data["probability"] == pytest.approx(expected, abs=1e-12)
+        assert data["prediction"] == int(data["probability"] >= data["threshold"])
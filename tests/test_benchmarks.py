@@ -0,0 +1,31 @@
+from benchmarks.suite import compare, time_calls
+
+
+def _result(throughput, p95):
+    return {"throughput": throughput, "p95_ms": p95}
+
+
+def test_compare_flags_throughput_drop_and_latency_growth():
+    baseline = {"results": {
+        "a": _result(1000, 1.0),
+        "b": _result(1000, 1.0),
+        "c": _result(1000, 1.0),
+        "gone": _result(1000, 1.0),
+    }}
+    current = {"results": {
+        "a": _result(900, 1.1),   # dans le seuil
+        "b": _result(600, 1.0),   # débit -40 %
+        "c": _result(1000, 1.5),  # p95 +50 %
+        "new": _result(1, 100.0),
+    }}
+    rows = {r["name"]: r for r in compare(current, baseline, threshold=0.25)}
+    assert set(rows) == {"a", "b", "c"}
+    assert not rows["a"]["regression"]
+    assert rows["b"]["regression"] and rows["c"]["regression"]
+
+
+def test_time_calls_reports_percentiles_and_memory():
+    r = time_calls(lambda: sum(range(100)), repeat=50, rows_per_call=10)
+    assert r["samples"] == 50
+    assert r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+    assert r["throughput"] > 0 and r["rss_mb"] > 0
@@ -0,0 +1,60 @@
+from api.cache import PredictionCache, canonical_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_canonical_key_ignores_number_spelling():
+    assert canonical_key([1, 0, -0.0], "v1") == canonical_key([1.0, 0.0, 0.0], "v1")
+    assert canonical_key([1.0, 2.0], "v1") != canonical_key([2.0, 1.0], "v1")
+    assert canonical_key([1.0, 2.0], "v1") != canonical_key([1.0, 2.0], "v2")
+
+
+def test_lru_eviction_and_stats():
+    cache = PredictionCache(maxsize=2)
+    cache.set(b"a", 0.1)
+    cache.set(b"b", 0.2)
+    assert cache.get(b"a") == 0.1  # "a" devient le plus récent
+    cache.set(b"c", 0.3)  # évince "b"
+
+    assert cache.get(b"b") is None
+    assert cache.get(b"c") == 0.3
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_ttl_expiration():
+    clock = FakeClock()
+    cache = PredictionCache(maxsize=10, ttl=5.0, clock=clock)
+    cache.set(b"a", 0.5)
+    clock.now = 4.0
+    assert cache.get(b"a") == 0.5
+    clock.now = 10.0
+    assert cache.get(b"a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_model_version_change_invalidates():
+    cache = PredictionCache(maxsize=10)
+    cache.bind_version("v1")
+    cache.set(b"a", 0.5)
+    cache.bind_version("v1")
+    assert cache.get(b"a") == 0.5
+    cache.bind_version("v2")
+    assert cache.get(b"a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_disabled_cache():
+    cache = PredictionCache(maxsize=0)
+    cache.set(b"a", 0.5)
+    assert cache.get(b"a") is None
+    assert cache.stats()["enabled"] is False
@@ -7,28 +7,8 @@ from fastapi.testclient import TestClient
 
 import api.main as main
 
-class FakeSession:
-    def __init__(self):
-        self.executed = 0
 
-    def execute(self, *args, **kwargs):
-        self.executed += 1
-        return None
-
-    def commit(self):
-        return None
-
-    def rollback(self):
-        return None
-
-    def close(self):
-        return None
-
-
-@pytest.fixture(autouse=True)
-def mock_db(monkeypatch):
-    """Remplace SessionLocal par une session fake pour éviter PostgreSQL en CI."""
-    monkeypatch.setattr(main, "SessionLocal", lambda: FakeSession())
+pytestmark = pytest.mark.usefixtures("mock_db")
 
 
 @pytest.fixture()
@@ -44,11 +24,6 @@ def rng():
     return np.random.default_rng(42)
 
 
-def make_valid_features(fill_value: float = 0.0) -> dict:
-    """Construit un payload complet conforme à FEATURES_ORDER."""
-    return {f: float(fill_value) for f in main.FEATURES_ORDER}
-
-
 # UNIT TESTS (composants)
 
 def test_metadata_contract(client):
@@ -87,14 +62,14 @@ def test_predict_rejects_wrong_key_case(client):
     assert r.status_code == 422
 
 
-def test_predict_rejects_null_value(client):
+def test_predict_rejects_null_value(client, make_valid_features):
     features = make_valid_features(0.0)
     features[main.FEATURES_ORDER[0]] = None
     r = client.post("/predict", json={"features": features})
     assert r.status_code == 422
 
 
-def test_predict_rejects_nan_or_inf_raw_json(client):
+def test_predict_rejects_nan_or_inf_raw_json(client, make_valid_features):
     first = main.FEATURES_ORDER[0]
 
     payload_nan = {"features": make_valid_features(0.0)}
@@ -118,7 +93,7 @@ def test_predict_rejects_nan_or_inf_raw_json(client):
 
 # FUNCTIONAL TESTS (end-to-end modèle via l'API)
 
-def test_predict_endpoint_happy_path(client):
+def test_predict_endpoint_happy_path(client, make_valid_features):
     features = make_valid_features(0.0)
     r = client.post("/predict", json={"features": features})
     assert r.status_code == 200
@@ -139,7 +114,7 @@ def test_predict_endpoint_happy_path(client):
     assert len(data["request_id"]) > 10
 
 
-def test_predict_varied_inputs_smoke(client, rng):
+def test_predict_varied_inputs_smoke(client, rng, make_valid_features):
     """
     Test fonctionnel: envoie plusieurs cas synthétiques et vérifie:
     - pas d'erreur serveur
@@ -161,7 +136,7 @@ def test_predict_varied_inputs_smoke(client, rng):
         assert int(data["prediction"]) in (0, 1)
 
 
-def test_predict_extreme_values(client):
+def test_predict_extreme_values(client, make_valid_features):
     """
     Cas limites: valeurs très grandes/petites.
     Vérifie que l'API ne crash pas.
@@ -177,4 +152,139 @@ def test_predict_extreme_values(client):
     for k in features:
         features[k] = -1e6
     r = client.post("/predict", json={"features": features})
-    assert r.status_code in (200, 422, 500)
\ No newline at end of file
+    assert r.status_code in (200, 422, 500)
+
+# BATCH (/predict/batch)
+
+def test_predict_batch_matches_single_predict(client, rng, make_valid_features):
+    rows = []
+    for _ in range(5):
+        features = make_valid_features(0.0)
+        for k in rng.choice(main.FEATURES_ORDER, size=5, replace=False):
+            features[k] = float(rng.normal(loc=0.0, scale=1.0))
+        rows.append(features)
+
+    r = client.post("/predict/batch", json={"rows": rows})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["n_rows"] == 5
+    assert data["n_scored"] == 5
+    assert data["n_errors"] == 0
+
+    for row, res in zip(rows, data["results"]):
+        single = client.post("/predict", json={"features": row}).json()
+        assert res["error"] is None
+        assert res["probability"] == pytest.approx(single["probability"], abs=1e-12)
+        assert res["prediction"] == single["prediction"]
+
+
+def test_predict_batch_accepts_vectors(client, make_valid_features):
+    features = make_valid_features(1.0)
+    vector = [features[f] for f in main.FEATURES_ORDER]
+
+    r = client.post("/predict/batch", json={"rows": [features], "vectors": [vector]})
+    assert r.status_code == 200
+    res = r.json()["results"]
+    assert [x["index"] for x in res] == [0, 1]
+    assert res[0]["probability"] == pytest.approx(res[1]["probability"], abs=1e-12)
+
+
+def test_predict_batch_reports_row_errors(client, make_valid_features):
+    good = make_valid_features(0.0)
+    missing = {"age": 30.0}
+    null_value = make_valid_features(0.0)
+    null_value[main.FEATURES_ORDER[0]] = None
+    bad_string = make_valid_features(0.0)
+    bad_string[main.FEATURES_ORDER[1]] = "abc"
+    short_vector = [0.0, 1.0]
+
+    r = client.post(
+        "/predict/batch",
+        json={"rows": [good, missing, null_value, bad_string], "vectors": [short_vector]},
+    )
+    assert r.status_code == 200
+    data = r.json()
+    assert data["n_scored"] == 1
+    assert data["n_errors"] == 4
+
+    res = data["results"]
+    assert res[0]["error"] is None and res[0]["request_id"]
+    assert "Missing features" in res[1]["error"]
+    assert main.FEATURES_ORDER[0] in res[2]["error"]
+    assert main.FEATURES_ORDER[1] in res[3]["error"]
+    assert "Expected" in res[4]["error"]
+    assert all(x["probability"] is None for x in res[1:])
+
+
+def test_predict_batch_logs_with_multi_row_inserts(client, mock_db, make_valid_features):
+    sessions = mock_db.sync
+    rows = [make_valid_features(0.0) for _ in range(20)]
+    r = client.post("/predict/batch", json={"rows": rows})
+    assert r.status_code == 200
+
+    # une session, 3 INSERT (vecteurs + requests + results) quel que soit le nombre de lignes
+    assert len(sessions) == 1
+    assert sessions[0].executed == 3
+
+
+def test_predict_batch_rejects_empty_and_oversized(client, monkeypatch, make_valid_features):
+    assert client.post("/predict/batch", json={"rows": []}).status_code == 422
+
+    monkeypatch.setattr(main, "MAX_BATCH_ROWS", 2)
+    rows = [make_valid_features(0.0) for _ in range(3)]
+    assert client.post("/predict/batch", json={"rows": rows}).status_code == 413
+
+
+# WRITE-BEHIND LOGGING
+
+def test_predict_with_write_behind_logger(client, monkeypatch, mock_db, make_valid_features):
+    sessions = mock_db.sync
+    writer = main.PredictionLogWriter(main.write_prediction_logs, batch_size=100, flush_interval=1.0)
+    monkeypatch.setattr(main, "log_writer", writer)
+
+    for _ in range(5):
+        r = client.post("/predict", json={"features": make_valid_features(0.0)})
+        assert r.status_code == 200
+    writer.stop()
+
+    # les 5 prédictions sont écrites en lot(s), 3 INSERT par transaction
+    assert writer.stats()["written"] == 5
+    assert 1 <= len(sessions) < 5
+    assert all(s.executed == 3 for s in sessions)
+
+
+# CACHE
+
+def test_predict_cache_hits_are_logged_and_flagged(client, monkeypatch, make_valid_features):
+    logged = []
+
+    async def fake_log(reqs, res):
+        logged.extend(res)
+
+    monkeypatch.setattr(main, "log_predictions_async", fake_log)
+    monkeypatch.setattr(main, "prediction_cache", main.PredictionCache(maxsize=16))
+    main.prediction_cache.bind_version(main.registry.active.version)
+
+    features = make_valid_features(2.0)
+    r1 = client.post("/predict", json={"features": features}).json()
+    r2 = client.post("/predict", json={"features": features}).json()
+
+    assert r1["probability"] == r2["probability"]
+    assert r1["request_id"] != r2["request_id"]
+    assert [x["cached"] for x in logged] == [False, True]
+
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["model_version"] == main.registry.active.version
+
+
+
+# ASYNC DB
+
+def test_predict_logs_through_async_session(client, mock_db, make_valid_features):
+    sessions = mock_db.aio
+    r = client.post("/predict", json={"features": make_valid_features(0.0)})
+    assert r.status_code == 200
+    assert len(sessions) == 1
+    assert sessions[0].executed == 3
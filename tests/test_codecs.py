@@ -0,0 +1,146 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api import codecs
+
+
+pytestmark = pytest.mark.usefixtures("mock_db")
+
+
+@pytest.fixture()
+def client():
+    return TestClient(main.app)
+
+
+def _vector(seed=0):
+    return np.random.default_rng(seed).normal(size=main.N_FEATURES).round(6).tolist()
+
+
+def test_metadata_exposes_schema_hash(client):
+    data = client.get("/metadata").json()
+    assert data["schema_hash"] == codecs.schema_hash(data["features_order"])
+    assert codecs.JSON in data["input_formats"]
+
+
+def test_vector_matches_named_features(client):
+    vec = _vector()
+    named = client.post("/predict", json={"features": dict(zip(main.FEATURES_ORDER, vec))}).json()
+    r = client.post("/predict/vector", json={"vector": vec, "schema_hash": main.SCHEMA_HASH})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == codecs.JSON
+    data = r.json()
+    assert set(data) == {"request_id", "probability", "prediction", "threshold"}
+    assert data["probability"] == named["probability"]
+    assert data["prediction"] == named["prediction"]
+
+
+@pytest.mark.parametrize(
+    "vector, schema, status",
+    [
+        ([0.0] * 3, "ok", 422),             # longueur
+        ([0.0] * 44, None, 422),            # schema_hash absent
+        ([0.0] * 44, "deadbeef", 409),      # dérive du schéma
+        (["1"] + [0.0] * 43, "ok", 422),    # pas de conversion de chaînes
+        ([None] + [0.0] * 43, "ok", 422),
+    ],
+)
+def test_vector_validation(client, vector, schema, status):
+    body = {"vector": vector}
+    if schema is not None:
+        body["schema_hash"] = main.SCHEMA_HASH if schema == "ok" else schema
+    assert client.post("/predict/vector", json=body).status_code == status
+
+
+def test_unknown_or_malformed_bodies(client):
+    r = client.post("/predict/vector", content=b"a,b", headers={"content-type": "text/csv"})
+    assert r.status_code == 415
+    r = client.post("/predict/vector", content=b"{not json", headers={"content-type": "application/json"})
+    assert r.status_code == 400
+
+
+def test_vectors_report_row_errors(client):
+    good = _vector(1)
+    body = {"vectors": [good, good[:-1], [None] + good[1:]], "schema_hash": main.SCHEMA_HASH}
+    r = client.post("/predict/vectors", json=body)
+    data = r.json()
+    assert r.status_code == 200
+    assert data["n_scored"] == 1 and data["n_errors"] == 2
+    assert data["results"][1]["error"].startswith("Expected 44 values")
+    assert data["results"][2]["error"].startswith("Invalid values for features")
+
+
+def test_vectors_reject_booleans_like_the_row_validator(client):
+    good = _vector(1)
+    mixed = [True] + good[1:]  # np.asarray en ferait 1.0 sans erreur
+    body = {"vectors": [good, mixed], "schema_hash": main.SCHEMA_HASH}
+    fast = client.post("/predict/vectors", json=body).json()
+    strict = client.post("/predict/batch", json=body).json()
+    assert fast["n_scored"] == strict["n_scored"] == 1
+    assert fast["results"][1]["error"] == strict["results"][1]["error"]
+    assert fast["results"][1]["error"].startswith("Invalid values for features")
+    assert client.post("/predict/vector", json={"vector": mixed, "schema_hash": main.SCHEMA_HASH}).status_code == 422
+
+
+def test_batch_rejects_schema_drift(client):
+    r = client.post("/predict/batch", json={"vectors": [_vector()], "schema_hash": "deadbeef"})
+    assert r.status_code == 409
+
+
+def test_arrow_round_trip(client):
+    pa = pytest.importorskip("pyarrow")
+    rows = [_vector(i) for i in range(5)]
+    columns = {f: [r[j] for r in rows] for j, f in enumerate(main.FEATURES_ORDER)}
+    columns[main.FEATURES_ORDER[0]][3] = None  # valeur manquante -> erreur de ligne
+    table = pa.table(columns, metadata={"schema_hash": main.SCHEMA_HASH})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as w:
+        w.write_table(table)
+
+    r = client.post(
+        "/predict/vectors",
+        content=sink.getvalue().to_pybytes(),
+        headers={"content-type": codecs.ARROW, "accept": codecs.ARROW},
+    )
+    assert r.status_code == 200
+    out = pa.ipc.open_stream(r.content).read_all().to_pydict()
+    assert out["index"] == [0, 1, 2, 3, 4]
+    assert out["error"][3] is not None and out["probability"][3] is None
+    expected = main.registry.active.predictor.predict_proba(np.array(rows[:3]))
+    np.testing.assert_allclose(out["probability"][:3], expected, rtol=0, atol=1e-12)
+
+
+def test_msgpack_round_trip(client):
+    msgpack = pytest.importorskip("msgpack")
+    body = msgpack.packb({"vector": _vector(), "schema_hash": main.SCHEMA_HASH})
+    r = client.post(
+        "/predict/vector", content=body,
+        headers={"content-type": codecs.MSGPACK, "accept": codecs.MSGPACK},
+    )
+    assert r.status_code == 200
+    assert set(msgpack.unpackb(r.content)) == {"request_id", "probability", "prediction", "threshold"}
+
+
+def test_pyarrow_is_imported_by_the_first_arrow_request():
+    out = subprocess.run(
+        [sys.executable, "-c", "import sys, api.codecs; print('pyarrow' in sys.modules)"],
+        capture_output=True, text=True, check=True,
+    )
+    assert out.stdout.strip() == "False"
+
+
+def test_batch_response_is_encoded_without_revalidation(client, monkeypatch):
+    encoded = []
+    encode = codecs.encode
+    monkeypatch.setattr(codecs, "encode", lambda obj, mt: encoded.append(mt) or encode(obj, mt))
+    row = dict(zip(main.FEATURES_ORDER, _vector()))
+    r = client.post("/predict/batch", json={"rows": [row, {**row, "age": None}]})
+    assert r.status_code == 200 and r.headers["content-type"] == codecs.JSON
+    assert encoded == [codecs.JSON]
+    ok, bad = r.json()["results"]
+    assert ok["error"] is None and ok["explanation"] is None and 0.0 <= ok["probability"] <= 1.0
+    assert bad["request_id"] is None and bad["probability"] is None and bad["error"]
@@ -0,0 +1,64 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import db.create_db as create_db
+from db.create_db import chunk_to_copy_buffer, parse_args
+
+# Base PostgreSQL jetable (le schéma y est supprimé puis recréé)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_copy_buffer_is_one_json_object_per_line():
+    chunk = pd.DataFrame({
+        "age": [41, 49],
+        "poste_Représentant Commercial": [0, 1],
+        "note": [0.1, 2.5],
+        "texte": ['a\\b "c"', "tab\tnewline\n"],
+    })
+    lines = chunk_to_copy_buffer(chunk).getvalue().splitlines()
+    assert len(lines) == 2
+
+    # format texte de COPY: les antislashs sont doublés, puis PostgreSQL les dé-double
+    rows = [json.loads(line.replace("\\\\", "\\")) for line in lines]
+    assert rows[0] == {"age": 41, "poste_Représentant Commercial": 0, "note": 0.1, "texte": 'a\\b "c"'}
+    assert rows[1]["texte"] == "tab\tnewline\n"
+    assert all("\t" not in line for line in lines)
+
+
+def test_cli_defaults_keep_historical_behaviour():
+    args = parse_args([])
+    assert args.mode == "truncate"
+    assert not args.resume and not args.skip_schema
+    assert args.workers == 1
+
+
+def test_copy_buffer_keeps_full_float_precision():
+    values = [0.1 + 0.2, 1 / 3, 123456.78901234567, 5e-324]
+    chunk = pd.DataFrame({"x": values, "missing": [float("nan"), 1.0, 2.0, 3.0]})
+    rows = [json.loads(line) for line in chunk_to_copy_buffer(chunk).getvalue().splitlines()]
+    assert [r["x"] for r in rows] == values
+    assert rows[0]["missing"] is None
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (disposable PostgreSQL database)")
+def test_resume_refuses_another_file_or_chunk_size(tmp_path, monkeypatch):
+    engine = create_engine(TEST_DATABASE_URL)
+    monkeypatch.setattr(create_db, "engine", engine)
+    create_db.run_schema()
+    csv_path = tmp_path / "rh.csv"
+    pd.DataFrame({"age": range(5), "note": [0.5] * 5}).to_csv(csv_path, index=False)
+
+    assert create_db.load_dataset(csv_path, chunk_size=2, defer_index=False) == 5
+    assert create_db.load_dataset(csv_path, chunk_size=2, resume=True, defer_index=False) == 0
+    with pytest.raises(ValueError, match="chunk size"):
+        create_db.load_dataset(csv_path, chunk_size=3, resume=True, defer_index=False)
+
+    pd.DataFrame({"age": range(6), "note": [0.5] * 6}).to_csv(csv_path, index=False)
+    with pytest.raises(ValueError, match="Cannot resume"):
+        create_db.load_dataset(csv_path, chunk_size=2, resume=True, defer_index=False)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM employees")).scalar() == 5
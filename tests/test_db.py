@@ -0,0 +1,24 @@
+import api.db as db
+
+
+def test_to_async_url_maps_drivers():
+    assert db.to_async_url("postgresql+psycopg2://u:p@h:5432/d") == "postgresql+asyncpg://u:p@h:5432/d"
+    assert db.to_async_url("postgresql://u:p@h/d") == "postgresql+asyncpg://u:p@h/d"
+    assert db.to_async_url("sqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+
+def test_engine_options_for_postgres(monkeypatch):
+    monkeypatch.setattr(db, "DB_POOL_SIZE", 7)
+    monkeypatch.setattr(db, "DB_STATEMENT_TIMEOUT_MS", 1500)
+
+    sync_opts = db.engine_options("postgresql+psycopg2://u:p@h/d")
+    assert sync_opts["pool_size"] == 7
+    assert sync_opts["pool_pre_ping"] is db.DB_POOL_PRE_PING
+    assert sync_opts["connect_args"] == {"options": "-c statement_timeout=1500"}
+
+    async_opts = db.engine_options("postgresql+asyncpg://u:p@h/d")
+    assert async_opts["connect_args"] == {"server_settings": {"statement_timeout": "1500"}}
+
+
+def test_engine_options_for_sqlite():
+    assert db.engine_options("sqlite:///x.db") == {}
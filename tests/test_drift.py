@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+
+import api.main as main
+from api.db import drift_checkpoints
+from api.drift import (
+    DriftCheckpointer, DriftMonitor, ReferenceProfile, delete_checkpoint, merged_state, touch_checkpoint,
+    write_checkpoint,
+)
+
+
+pytestmark = pytest.mark.usefixtures("mock_db")
+
+
+def make_reference(seed=0, n=500):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 3, n),       # discrète: un bin par valeur
+        rng.normal(50, 10, n),       # continue: déciles
+    ]).astype(float)
+    return ReferenceProfile(["grade", "score"], X), X
+
+
+def test_reference_bins_discrete_values_and_deciles():
+    ref, X = make_reference()
+    assert ref.n_bins.tolist() == [3, 10]
+    assert ref.counts.sum(axis=1).tolist() == [500, 500]
+    assert ref.counts[0, :3].tolist() == np.bincount(X[:, 0].astype(int)).tolist()
+
+
+def test_streaming_stats_match_numpy():
+    ref, X = make_reference()
+    mon = DriftMonitor(ref, fold_size=7)
+    for row in X[:123]:
+        mon.observe(row.tolist())
+    mon.observe_many(X[123:])
+
+    state = mon.snapshot()
+    assert state.n == 500
+    assert np.allclose(state.mean, X.mean(axis=0))
+    assert np.allclose(state.m2 / (state.n - 1), X.var(axis=0, ddof=1))
+    assert (state.counts == ref.counts).all()
+
+    report = mon.report()
+    assert report["max_psi"] == pytest.approx(0.0, abs=1e-9)
+    assert all(f["status"] == "stable" for f in report["features"])
+
+
+def test_shifted_inputs_are_flagged():
+    ref, X = make_reference()
+    mon = DriftMonitor(ref)
+    shifted = X.copy()
+    shifted[:, 1] += 15
+    mon.observe_many(shifted)
+
+    by_name = {f["feature"]: f for f in mon.report()["features"]}
+    assert by_name["score"]["status"] == "significant"
+    assert by_name["score"]["mean_shift"] == pytest.approx(15 / ref.std[1])
+    assert by_name["score"]["ks"] > 0.4
+    assert by_name["grade"]["status"] == "stable"
+
+
+def test_checkpoints_merge_across_workers():
+    engine = create_engine("sqlite://")
+    drift_checkpoints.create(engine)
+    ref, X = make_reference()
+
+    other = DriftMonitor(ref)
+    other.instance_id = "host-1"
+    other.observe_many(X[:200])
+    write_checkpoint(engine, other)
+    other.observe_many(X[200:300])
+    write_checkpoint(engine, other)  # remplace la ligne du worker
+
+    me = DriftMonitor(ref)
+    me.observe_many(X[300:])
+    state = merged_state(engine, me)
+    assert state.n == 500
+    assert np.allclose(state.mean, X.mean(axis=0))
+    assert (state.counts == ref.counts).all()
+
+
+def test_stale_checkpoints_are_left_out_of_the_merge():
+    engine = create_engine("sqlite://")
+    drift_checkpoints.create(engine)
+    ref, X = make_reference()
+
+    live, dead = DriftMonitor(ref), DriftMonitor(ref)
+    live.instance_id, dead.instance_id = "host-1", "host-2"
+    live.observe_many(X[:100])
+    dead.observe_many(X[100:300])
+    write_checkpoint(engine, live)
+    write_checkpoint(engine, dead)
+    # Worker tué sans arrêt propre: sa ligne n'est plus rafraîchie
+    with engine.begin() as conn:
+        conn.execute(
+            update(drift_checkpoints)
+            .where(drift_checkpoints.c.instance_id == "host-2")
+            .values(updated_at=datetime.now(timezone.utc) - timedelta(minutes=10))
+        )
+
+    me = DriftMonitor(ref)
+    me.observe_many(X[300:])
+    assert merged_state(engine, me).n == 500
+    assert merged_state(engine, me, max_age=180).n == 300
+
+    # Un worker inactif rafraîchit sa ligne au lieu de la réécrire
+    dead.dirty = False
+    DriftCheckpointer(dead, write=None, touch=lambda mon: touch_checkpoint(engine, mon)).checkpoint()
+    assert merged_state(engine, me, max_age=180).n == 500
+
+
+def test_checkpointer_removes_its_row_on_stop():
+    engine = create_engine("sqlite://")
+    drift_checkpoints.create(engine)
+    ref, X = make_reference()
+    other = DriftMonitor(ref)
+    other.instance_id = "host-1"
+    other.observe_many(X[:100])
+
+    checkpointer = DriftCheckpointer(
+        other, lambda mon: write_checkpoint(engine, mon), interval=3600,
+        remove=lambda mon: delete_checkpoint(engine, mon),
+    )
+    assert checkpointer.checkpoint()
+    assert merged_state(engine, DriftMonitor(ref)).n == 100
+    checkpointer.stop()
+    assert merged_state(engine, DriftMonitor(ref)).n == 0
+
+
+def test_drift_endpoint_reports_live_predictions(monkeypatch, make_valid_features):
+    monkeypatch.setattr(main, "drift_monitor", DriftMonitor(main.drift_monitor.reference))
+    client = TestClient(main.app)
+    assert client.post("/predict", json={"features": make_valid_features(0.3)}).status_code == 200
+    r = client.post("/predict/batch", json={"rows": [make_valid_features(0.1), make_valid_features(0.2)]})
+    assert r.status_code == 200
+
+    r = client.get("/monitoring/drift")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["scope"] == "worker"
+    assert body["n_observations"] == 3
+    assert body["reference_rows"] == 1470
+    assert len(body["features"]) == main.N_FEATURES
+
+    monkeypatch.setattr(main, "drift_monitor", None)
+    assert client.get("/monitoring/drift").status_code == 404
@@ -0,0 +1,153 @@
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import api.main as main
+from api.explain import Explainer, ExplanationUnsupported
+from api.flat_model import compile_flat, save_flat
+from api.registry import ModelRegistry, load_model
+
+DATA = main.ROOT / "data" / "dataset_clean.csv"
+# Budget: temps d'une explication / temps du scoring seul, sur le même chemin
+MATRIX_BUDGET = 2.0
+ENDPOINT_BUDGET = 2.5
+
+
+@pytest.fixture(scope="module")
+def X():
+    return pd.read_csv(DATA)[main.FEATURES_ORDER].to_numpy(dtype=float)
+
+
+@pytest.fixture()
+def logged(monkeypatch):
+    rows = []
+
+    async def fake_log(reqs, res):
+        rows.extend(res)
+
+    monkeypatch.setattr(main, "log_predictions_async", fake_log)
+    monkeypatch.setattr(main, "log_predictions", lambda reqs, res: rows.extend(res))
+    return rows
+
+
+def _best(fn, repeat):
+    fn()
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def test_contributions_are_linear_shapley_values(X):
+    m = main.registry.active
+    explainer = main.explanations.get(m)
+    phi = explainer.contributions(X)
+
+    # Additivité: base + somme des contributions = log-odds de la probabilité servie
+    p = m.predictor.predict_proba(X)
+    np.testing.assert_allclose(explainer.base_value + phi.sum(axis=1), np.log(p / (1 - p)), rtol=0, atol=1e-10)
+
+    # Même valeurs calculées dans l'espace standardisé du modèle sklearn
+    Z = pd.DataFrame(X, columns=main.FEATURES_ORDER)
+    Z[m.cols_to_scale] = m.scaler.transform(Z[m.cols_to_scale])
+    expected = (Z.to_numpy() - Z.to_numpy().mean(axis=0)) * m.model.coef_[0]
+    np.testing.assert_allclose(phi, expected, rtol=0, atol=1e-10)
+
+    # Backend plat: mêmes attributions
+    flat = load_model(main.MODEL_PATH, backend="flat")
+    np.testing.assert_allclose(
+        Explainer.for_model(flat, explainer.background_mean).contributions(X), phi, rtol=0, atol=1e-10
+    )
+
+
+def test_explain_endpoint_and_cache(logged, make_valid_features):
+    client = TestClient(main.app)
+    features = make_valid_features(0.3)
+    hits = main.explanations.cache.stats()["hits"]
+
+    r = client.post("/explain", json={"features": features})
+    assert r.status_code == 200
+    body = r.json()
+    contributions = body["explanation"]["contributions"]
+    assert len(contributions) == main.N_FEATURES
+    magnitudes = [abs(c["contribution"]) for c in contributions]
+    assert magnitudes == sorted(magnitudes, reverse=True)
+    assert all(features[c["feature"]] == c["value"] for c in contributions)
+    logit = np.log(body["probability"] / (1 - body["probability"]))
+    assert body["explanation"]["base_value"] + sum(c["contribution"] for c in contributions) == pytest.approx(logit, abs=1e-10)
+    assert logged == []  # pas de log pour /explain
+
+    top = client.post("/explain?top=3", json={"features": features}).json()["explanation"]["contributions"]
+    assert top == contributions[:3]
+    assert main.explanations.cache.stats()["hits"] == hits + 1
+
+    predicted = client.post("/predict", json={"features": features}).json()
+    assert "explanation" not in predicted
+    assert predicted["probability"] == pytest.approx(body["probability"], abs=1e-12)
+    explained = client.post("/predict?explain=true&top=3", json={"features": features}).json()
+    assert explained["explanation"]["contributions"] == top
+    assert len(logged) == 2
+
+
+def test_batch_explanations_match_single_rows(logged, make_valid_features):
+    client = TestClient(main.app)
+    rows = [make_valid_features(0.1), {"age": 30}, make_valid_features(0.7)]
+    r = client.post("/predict/batch?explain=true", json={"rows": rows})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert results[1]["error"] is not None and results[1]["explanation"] is None
+    for i in (0, 2):
+        single = client.post("/explain", json={"features": rows[i]}).json()
+        assert results[i]["explanation"] == single["explanation"]
+
+    r = client.post("/explain/batch?top=2", json={"rows": [rows[0], rows[2]]})
+    assert r.status_code == 200
+    items = r.json()["results"]
+    assert [len(i["explanation"]["contributions"]) for i in items] == [2, 2]
+    assert items[1]["probability"] == pytest.approx(results[2]["probability"], abs=1e-12)
+    assert client.post("/explain/batch", json={"rows": rows}).status_code == 422
+
+
+def test_non_linear_model_is_refused(tmp_path, X, monkeypatch, logged, make_valid_features):
+    obj = joblib.load(main.MODEL_PATH)
+    y = pd.read_csv(DATA)["a_quitte_l_entreprise"]
+    obj["model"] = RandomForestClassifier(n_estimators=5, max_depth=3, random_state=0).fit(
+        pd.DataFrame(X, columns=main.FEATURES_ORDER), y
+    )
+    path = save_flat(tmp_path / "forest.npz", *compile_flat(obj))
+    registry = ModelRegistry(tmp_path, path)
+    with pytest.raises(ExplanationUnsupported):
+        Explainer.for_model(registry.active, main.explanations.background_mean)
+
+    monkeypatch.setattr(main, "registry", registry)
+    client = TestClient(main.app)
+    features = make_valid_features(0.5)
+    assert client.post("/explain", json={"features": features}).status_code == 501
+    assert client.post("/predict?explain=true", json={"features": features}).status_code == 501
+    assert logged == []  # refusé avant scoring et log
+    assert client.post("/predict", json={"features": features}).status_code == 200
+
+
+@pytest.mark.perf
+def test_explanation_latency_budget(X, logged, monkeypatch, make_valid_features):
+    m = main.registry.active
+    explainer = main.explanations.get(m)
+    score = _best(lambda: m.predictor.predict_proba(X), 30)
+    explain = _best(lambda: explainer.contributions(X), 30)
+    assert explain <= MATRIX_BUDGET * score, (explain, score)
+
+    # Chemin HTTP complet, caches désactivés: une explication ne doit pas multiplier la latence de /predict
+    monkeypatch.setattr(main.prediction_cache, "maxsize", 0)
+    monkeypatch.setattr(main.explanations.cache, "maxsize", 0)
+    client = TestClient(main.app)
+    payload = {"features": make_valid_features(0.4)}
+    plain = _best(lambda: client.post("/predict", json=payload), 100)
+    explained = _best(lambda: client.post("/predict?explain=true", json=payload), 100)
+    assert explained <= ENDPOINT_BUDGET * plain, (explained, plain)
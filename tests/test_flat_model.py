@@ -0,0 +1,96 @@
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+import api.main as main
+from api.flat_model import FlatModel, compile_flat, load_flat, main as flat_cli, parity_report, save_flat
+from api.registry import ModelRegistry, artifact_version, load_model
+
+DATA = main.ROOT / "data" / "dataset_clean.csv"
+
+
+@pytest.fixture(scope="module")
+def artifact():
+    return joblib.load(main.MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def dataset(artifact):
+    df = pd.read_csv(DATA)
+    return df, df[list(artifact["model"].feature_names_in_)].to_numpy(dtype=float)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_linear_parity_on_dataset(tmp_path, artifact, dataset, mmap):
+    _, X = dataset
+    path = save_flat(tmp_path / "m.npz", *compile_flat(artifact))
+    flat = load_flat(path, mmap=mmap)
+    report = parity_report(flat, artifact, X)
+    assert report["max_abs_diff"] < 1e-12 and report["label_mismatches"] == 0
+    assert flat.threshold == float(artifact["seuil"])
+    assert flat.predict_one(X[0]) == pytest.approx(flat.predict_proba(X[:1])[0], abs=1e-15)
+
+    path32 = save_flat(tmp_path / "m32.npz", *compile_flat(artifact), dtype=np.float32)
+    assert path32.stat().st_size < path.stat().st_size
+    report = parity_report(load_flat(path32, mmap=mmap), artifact, X)
+    assert report["max_abs_diff"] < 1e-5 and report["label_mismatches"] == 0
+
+
+@pytest.mark.parametrize("estimator", [
+    RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+    GradientBoostingClassifier(n_estimators=20, random_state=0),
+])
+def test_tree_ensemble_parity_on_dataset(tmp_path, artifact, dataset, estimator):
+    df, X = dataset
+    features = list(artifact["model"].feature_names_in_)
+    X_scaled = df[features].copy()
+    X_scaled[artifact["cols_to_scale"]] = artifact["scaler"].transform(X_scaled[artifact["cols_to_scale"]])
+    obj = {**artifact, "model": estimator.fit(X_scaled, df["a_quitte_l_entreprise"])}
+
+    flat = load_flat(save_flat(tmp_path / "trees.npz", *compile_flat(obj)))
+    report = parity_report(flat, obj, X)
+    assert report["max_abs_diff"] < 1e-12 and report["label_mismatches"] == 0
+    assert flat.predict_one(X[5]) == pytest.approx(flat.predict_proba(X[5:6])[0], abs=1e-15)
+
+
+def test_cli_export_and_check(tmp_path, capsys):
+    out = tmp_path / "classifier_employee.npz"
+    flat_cli(["export", str(main.MODEL_PATH), str(out)])
+    flat_cli(["check", str(out), "--source", str(main.MODEL_PATH), "--data", str(DATA)])
+    assert '"label_mismatches": 0' in capsys.readouterr().out
+
+
+def test_api_serves_flat_artifact(tmp_path, artifact, dataset, monkeypatch):
+    _, X = dataset
+    shutil.copy(main.MODEL_PATH, tmp_path / "v1.pkl")
+    save_flat(tmp_path / "v1.npz", *compile_flat(artifact))
+    v_flat = artifact_version(tmp_path / "v1.npz")
+
+    registry = ModelRegistry(tmp_path, tmp_path / "v1.npz")
+    m = registry.active
+    assert m.version == v_flat and m.model is None and isinstance(m.predictor, FlatModel)
+    assert len(registry.list()) == 2
+
+    monkeypatch.setattr(main, "registry", registry)
+    logged = []
+
+    async def fake_log(reqs, res):
+        logged.extend(res)
+
+    monkeypatch.setattr(main, "log_predictions_async", fake_log)
+    features = dict(zip(m.features_order, X[0].tolist()))
+    r = TestClient(main.app).post("/predict", json={"features": features})
+    assert r.status_code == 200
+    assert logged[-1]["model_version"] == v_flat
+    reference = load_model(main.MODEL_PATH, backend="sklearn").predictor.predict_one(X[0])
+    assert r.json()["probability"] == pytest.approx(reference, abs=1e-12)
+
+    # Backend "flat" sur un artefact joblib: même évaluateur, compilé au chargement
+    compiled = load_model(tmp_path / "v1.pkl", backend="flat")
+    assert isinstance(compiled.predictor, FlatModel)
+    assert compiled.predictor.predict_one(list(features.values())) == pytest.approx(reference, abs=1e-12)
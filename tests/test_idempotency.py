@@ -0,0 +1,139 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import api.main as main
+from api.db import feature_vectors, idempotency_keys, metadata, prediction_requests, prediction_results
+from api.idempotency import IdempotencyKeyReused, IdempotencyStore, release_expired_keys
+
+
+@pytest.fixture()
+def db(tmp_path, monkeypatch, mock_db):
+    """SQLite file database behind the async session used by /predict; fresh in-memory key store."""
+    path = tmp_path / "log.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    metadata.create_all(sync_engine, tables=[feature_vectors, prediction_requests, prediction_results, idempotency_keys])
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    monkeypatch.setattr(main, "AsyncSessionLocal", async_sessionmaker(async_engine, expire_on_commit=False))
+    monkeypatch.setattr(main, "idempotency_store", IdempotencyStore(ttl=main.IDEMPOTENCY_TTL))
+    return sync_engine
+
+
+def count_rows(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(prediction_requests)).scalar_one()
+
+
+def test_store_owner_waiters_and_reuse():
+    async def scenario():
+        clock = [0.0]
+        store = IdempotencyStore(ttl=10, clock=lambda: clock[0])
+        owner, fut = store.begin("k", b"a")
+        assert owner
+        again, fut2 = store.begin("k", b"a")
+        assert not again and fut2 is fut
+        with pytest.raises(IdempotencyKeyReused):
+            store.begin("k", b"b")
+
+        store.complete("k", {"request_id": "r1"})
+        assert (await fut2) == {"request_id": "r1"}
+
+        clock[0] = 11  # expirée: la clé est de nouveau libre
+        owner, _ = store.begin("k", b"b")
+        assert owner
+        store.abandon("k")
+        assert len(store) == 0
+
+    asyncio.run(scenario())
+
+
+def test_replay_returns_original_result_without_new_rows(db, make_valid_features):
+    client = TestClient(main.app)
+    payload = {"features": make_valid_features(0.4)}
+    first = client.post("/predict", json=payload, headers={"Idempotency-Key": "retry-1"})
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    second = client.post("/predict", json=payload, headers={"Idempotency-Key": "retry-1"})
+    assert second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert count_rows(db) == 1
+
+    # Autre worker (index mémoire vide): la ligne en base fait foi
+    main.idempotency_store = IdempotencyStore(ttl=main.IDEMPOTENCY_TTL)
+    third = client.post("/predict", json=payload, headers={"Idempotency-Key": "retry-1"})
+    assert third.json()["request_id"] == first.json()["request_id"]
+    assert count_rows(db) == 1
+
+    reused = client.post("/predict", json={"features": make_valid_features(0.9)}, headers={"Idempotency-Key": "retry-1"})
+    assert reused.status_code == 422
+    assert client.post("/predict", json=payload, headers={"Idempotency-Key": "x" * 300}).status_code == 400
+
+
+def test_concurrent_duplicates_are_scored_once(db, make_valid_features):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payload = {"features": make_valid_features(0.2)}
+            return await asyncio.gather(*[
+                client.post("/predict", json=payload, headers={"Idempotency-Key": "burst"}) for _ in range(10)
+            ])
+
+    responses = asyncio.run(scenario())
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.json()["request_id"] for r in responses}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 9
+    assert count_rows(db) == 1
+
+
+def test_race_between_workers_resolved_by_unique_index(db, monkeypatch, make_valid_features):
+    client = TestClient(main.app)
+    payload = {"features": make_valid_features(0.3)}
+    first = client.post("/predict", json=payload, headers={"Idempotency-Key": "race"}).json()
+
+    # Simule un worker qui n'a pas encore vu la ligne: la première lecture ne trouve rien
+    lookups = []
+    real_lookup = main.key_lookup_query
+
+    def first_lookup_misses(key):
+        lookups.append(key)
+        return real_lookup(key if len(lookups) > 1 else "no-such-key")
+
+    monkeypatch.setattr(main, "key_lookup_query", first_lookup_misses)
+    main.idempotency_store = IdempotencyStore(ttl=main.IDEMPOTENCY_TTL)
+
+    r = client.post("/predict", json=payload, headers={"Idempotency-Key": "race"})
+    assert r.status_code == 200
+    assert r.headers["Idempotent-Replayed"] == "true"
+    assert r.json()["request_id"] == first["request_id"]
+    assert len(lookups) == 2
+    assert count_rows(db) == 1
+
+
+def test_expired_keys_are_released(db, make_valid_features):
+    old = datetime.now(timezone.utc) - timedelta(seconds=main.IDEMPOTENCY_TTL + 60)
+    with db.begin() as conn:
+        conn.execute(insert(idempotency_keys), [
+            {"idempotency_key": "old-1", "request_id": str(uuid.uuid4()), "requested_at": old},
+            {"idempotency_key": "old-2", "request_id": str(uuid.uuid4()), "requested_at": old},
+        ])
+
+    # Clé expirée réutilisée avant le nettoyage: nouvelle prédiction
+    client = TestClient(main.app)
+    r = client.post("/predict", json={"features": make_valid_features(0.1)}, headers={"Idempotency-Key": "old-1"})
+    assert r.status_code == 200
+    assert "Idempotent-Replayed" not in r.headers
+
+    assert release_expired_keys(db, main.IDEMPOTENCY_TTL) == 1
+    with db.connect() as conn:
+        keys = conn.execute(select(idempotency_keys.c.idempotency_key)).scalars().all()
+    assert keys == ["old-1"]
+    assert count_rows(db) == 1  # la ligne d'audit de la nouvelle prédiction est conservée
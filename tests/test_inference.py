@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import api.main as main
+from api.inference import pandas_predict_proba
+
+CSV_PATH = main.ROOT / "data" / "dataset_clean.csv"
+
+
+@pytest.fixture(scope="module")
+def dataset_matrix():
+    df = pd.read_csv(CSV_PATH)
+    return df[main.FEATURES_ORDER].to_numpy(dtype=float)
+
+
+def reference(X):
+    m = main.registry.active
+    return pandas_predict_proba(m.model, m.scaler, m.cols_to_scale, m.features_order, X)
+
+
+def test_compiled_batch_matches_pandas_bit_for_bit(dataset_matrix):
+    X = dataset_matrix.copy()
+    got = main.registry.active.predictor.predict_proba(X)
+    assert np.array_equal(got, reference(dataset_matrix))
+    # l'entrée n'est pas modifiée (copie par défaut)
+    assert np.array_equal(X, dataset_matrix)
+
+
+def test_compiled_single_row_matches_pandas_bit_for_bit(dataset_matrix):
+    for row in dataset_matrix[:200]:
+        assert main.registry.active.predictor.predict_one(row.tolist()) == reference(row[None, :])[0]
+
+
+def test_compiled_random_batches_match_pandas():
+    rng = np.random.default_rng(42)
+    for n in (1, 7, 500):
+        X = rng.normal(scale=100.0, size=(n, main.N_FEATURES))
+        assert np.array_equal(main.registry.active.predictor.predict_proba(X), reference(X))
+
+
+def test_preprocessor_scales_only_cols_to_scale():
+    X = np.ones((2, main.N_FEATURES))
+    main.registry.active.predictor.preprocessor.transform_(X)
+    scaled = {main.FEATURES_ORDER[i] for i in np.flatnonzero(X[0] != 1.0)}
+    assert scaled <= set(main.registry.active.cols_to_scale)
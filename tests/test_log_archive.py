@@ -0,0 +1,102 @@
+import csv
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+import api.main as main
+from api.db import feature_vectors, idempotency_keys, metadata, prediction_requests, prediction_results
+from api.log_archive import add_months, month_start, partition_month, partition_name, run_maintenance
+from api.prediction_log import features_digest, storage_rows
+
+# Base PostgreSQL jetable (le schéma y est supprimé puis recréé)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+NOW = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+
+def _rows(request_id, ts, values):
+    return (
+        {"request_id": request_id, "features": values, "requested_at": ts},
+        {
+            "request_id": request_id, "probability": 0.25, "prediction": 0, "threshold": 0.5,
+            "predicted_at": ts, "cached": False, "model_version": "v1",
+        },
+    )
+
+
+def test_month_helpers():
+    month = month_start(datetime(2026, 1, 31, 23, 59, tzinfo=timezone.utc))
+    assert month == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert add_months(month, -1) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert add_months(month, 13) == datetime(2027, 2, 1, tzinfo=timezone.utc)
+    assert partition_name("prediction_results", month) == "prediction_results_p202601"
+    assert partition_month("prediction_results_p202601") == month
+    assert partition_month("prediction_results_default") is None
+
+
+def test_identical_vectors_are_stored_once(monkeypatch, make_valid_features):
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine, tables=[feature_vectors, prediction_requests, prediction_results])
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=engine))
+
+    values = [make_valid_features(0.5)[f] for f in main.FEATURES_ORDER]
+    for _ in range(2):
+        request_row, result_row = _rows(str(uuid.uuid4()), NOW, values)
+        main.write_prediction_logs([request_row], [result_row])
+    with engine.connect() as conn:
+        stored = conn.execute(select(feature_vectors)).all()
+        hashes = conn.execute(select(prediction_requests.c.features_hash)).scalars().all()
+    assert len(stored) == 1 and stored[0].features == values
+    assert hashes == [features_digest(values)] * 2
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (disposable PostgreSQL database)")
+def test_archive_exports_then_drops_expired_months(tmp_path):
+    from db.create_db import SCHEMA_PATH
+
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA_PATH.read_text(encoding="utf-8")))
+
+    old, recent = datetime(2025, 8, 3, tzinfo=timezone.utc), datetime(2026, 10, 2, tzinfo=timezone.utc)
+    shared = [1.0] * main.N_FEATURES
+    expired_only = [2.0] * main.N_FEATURES
+    logs = [_rows(str(uuid.uuid4()), old, shared), _rows(str(uuid.uuid4()), old, expired_only),
+            _rows(str(uuid.uuid4()), recent, shared)]
+    vectors, reqs = storage_rows([q for q, _ in logs])
+    with engine.begin() as conn:
+        # Avant toute partition mensuelle: lignes dans les partitions DEFAULT
+        conn.execute(insert(feature_vectors), vectors)
+        conn.execute(insert(prediction_requests), reqs)
+        conn.execute(insert(prediction_results), [r for _, r in logs])
+        conn.execute(insert(idempotency_keys), [{"idempotency_key": "k", "request_id": logs[0][0]["request_id"],
+                                                  "requested_at": old}])
+
+    report = run_maintenance(engine, main.FEATURES_ORDER, retention_months=12, archive_dir=tmp_path, now=NOW)
+    assert "prediction_requests_p202508" in report["created"]
+    assert "prediction_results_p202612" in report["created"]
+    (archived,) = report["archived"]
+    assert archived["month"] == "2025-08" and archived["rows"] == 2
+    assert archived["vectors_deleted"] == 1 and archived["keys_deleted"] == 1
+
+    with gzip.open(tmp_path / "predictions_2025_08.csv.gz", "rt", newline="") as fh:
+        exported = list(csv.DictReader(fh))
+    assert sorted(float(r[main.FEATURES_ORDER[0]]) for r in exported) == [1.0, 2.0]
+    assert {r["request_id"] for r in exported} == {logs[0][0]["request_id"], logs[1][0]["request_id"]}
+    manifest = json.loads((tmp_path / "predictions_2025_08.json").read_text())
+    assert manifest["rows"] == 2 and manifest["features_order"] == main.FEATURES_ORDER
+
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(prediction_requests)).scalar_one() == 1
+        assert conn.execute(select(func.count()).select_from(text("prediction_requests_default"))).scalar_one() == 0
+        assert conn.execute(select(feature_vectors.c.features)).scalars().all() == [shared]
+
+    # Relancé: rien de plus à créer ni à archiver
+    assert run_maintenance(engine, main.FEATURES_ORDER, retention_months=12, archive_dir=tmp_path, now=NOW) == {
+        "created": [], "archived": []
+    }
@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.metrics import MetricsRegistry, StageTimer
+
+
+pytestmark = pytest.mark.usefixtures("mock_db")
+
+
+def test_histogram_renders_cumulative_buckets():
+    reg = MetricsRegistry(enabled=True)
+    h = reg.histogram("t_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v, "a")
+    text = reg.render()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="1.0"} 3' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 4' in text
+    assert 't_seconds_count{stage="a"} 4' in text
+    assert "# TYPE t_seconds histogram" in text
+
+
+def test_callback_counter_renders_as_counter():
+    reg = MetricsRegistry(enabled=True)
+    reg.counter_fn("hits_total", "Test.", lambda: 3)
+    assert "# TYPE hits_total counter\nhits_total 3" in reg.render()
+    with pytest.raises(ValueError):
+        reg.counter_fn("hits", "Test.", lambda: 3)
+
+
+def test_disabled_registry_records_nothing():
+    reg = MetricsRegistry(enabled=False)
+    c = reg.counter("c_total", "Test.", ("status",))
+    h = reg.histogram("h_seconds", "Test.", ("endpoint", "stage"))
+    c.inc("200")
+    StageTimer(h, "predict").mark("parse")
+    assert c.value("200") == 0
+    assert h.count("predict", "parse") == 0
+
+
+def test_metrics_endpoint_exposes_predict_stages(make_valid_features):
+    client = TestClient(main.app)
+    assert client.post("/predict", json={"features": make_valid_features(0.3)}).status_code == 200
+    assert client.post("/predict", json={"features": {}}).status_code == 422
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    text = r.text
+    for stage in ("parse", "validate", "cache_lookup", "log"):
+        assert f'hrpredict_predict_stage_seconds_count{{endpoint="predict",stage="{stage}"}}' in text
+    for step in ("checkout", "insert_requests", "insert_results", "commit"):
+        assert f'hrpredict_db_write_seconds_count{{step="{step}"}}' in text
+    assert 'hrpredict_http_requests_total{method="POST",route="/predict",status="200"}' in text
+    assert 'hrpredict_http_requests_total{method="POST",route="/predict",status="422"}' in text
+    assert "hrpredict_prediction_cache_size " in text
+    assert "# TYPE hrpredict_prediction_cache_hits_total counter" in text
+    assert "hrpredict_prediction_cache_misses_total " in text
+    assert 'hrpredict_db_pool_checked_out{engine="sync"}' in text
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from api.prediction_log import PredictionLogWriter
+
+
+class RecordingWriter:
+    """Collecte les lots écrits par le writer (à la place de PostgreSQL)."""
+
+    def __init__(self, fail: bool = False, block: threading.Event | None = None):
+        self.batches = []
+        self.fail = fail
+        self.block = block
+
+    def __call__(self, request_rows, result_rows):
+        if self.block is not None:
+            self.block.wait()
+        if self.fail:
+            raise RuntimeError("db down")
+        self.batches.append((list(request_rows), list(result_rows)))
+
+
+def make_records(n: int, start: int = 0):
+    reqs = [{"request_id": str(i)} for i in range(start, start + n)]
+    res = [{"request_id": str(i)} for i in range(start, start + n)]
+    return reqs, res
+
+
+def test_writer_batches_and_keeps_tables_consistent():
+    sink = RecordingWriter()
+    writer = PredictionLogWriter(sink, batch_size=50, flush_interval=0.05)
+
+    for i in range(10):
+        assert writer.submit(*make_records(10, start=10 * i))
+    writer.flush()
+
+    written = [r["request_id"] for reqs, _ in sink.batches for r in reqs]
+    assert written == [str(i) for i in range(100)]
+    # chaque lot écrit les deux tables avec les mêmes request_id
+    for reqs, res in sink.batches:
+        assert [r["request_id"] for r in reqs] == [r["request_id"] for r in res]
+    assert len(sink.batches) < 10
+
+    stats = writer.stats()
+    assert stats["written"] == 100
+    assert stats["queue_depth"] == 0
+    writer.stop()
+
+
+def test_writer_flushes_on_stop():
+    sink = RecordingWriter()
+    writer = PredictionLogWriter(sink, batch_size=1000, flush_interval=60)
+    writer.submit(*make_records(3))
+    writer.stop()
+
+    assert sum(len(reqs) for reqs, _ in sink.batches) == 3
+    # après arrêt, les écritures deviennent synchrones
+    writer.submit(*make_records(2, start=3))
+    assert writer.stats()["written"] == 5
+
+
+def test_best_effort_drops_when_queue_full():
+    gate = threading.Event()
+    sink = RecordingWriter(block=gate)
+    writer = PredictionLogWriter(sink, durability="best_effort", max_queue=1, batch_size=1)
+
+    results = [writer.submit(*make_records(1, start=i)) for i in range(10)]
+    assert not all(results)
+    assert writer.stats()["dropped"] >= 1
+
+    gate.set()
+    writer.stop()
+    stats = writer.stats()
+    assert stats["written"] + stats["dropped"] == 10
+
+
+def test_failed_batches_are_counted():
+    writer = PredictionLogWriter(RecordingWriter(fail=True), batch_size=10, flush_interval=0.01)
+    writer.submit(*make_records(4))
+    writer.flush()
+    stats = writer.stats()
+    assert stats["failed"] == 4
+    assert stats["queue_depth"] == 0
+    writer.stop()
+
+
+def test_sync_is_not_a_write_behind_mode():
+    with pytest.raises(ValueError):
+        PredictionLogWriter(RecordingWriter(), durability="sync")
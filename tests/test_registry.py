@@ -0,0 +1,186 @@
+import copy
+import shutil
+import time
+
+import joblib
+import pytest
+from fastapi.testclient import TestClient
+
+from sqlalchemy import create_engine
+
+import api.main as main
+from api.db import metadata
+from api.model_sync import ModelSync, target_version
+from api.registry import ModelRegistry, artifact_version
+
+ADMIN = {"Authorization": "Bearer s3cret"}
+
+
+@pytest.fixture()
+def model_dir(tmp_path):
+    """Répertoire avec l'artefact courant + une variante (coefficients et seuil modifiés)."""
+    shutil.copy(main.MODEL_PATH, tmp_path / "v1.pkl")
+    obj = joblib.load(main.MODEL_PATH)
+    variant = copy.deepcopy(obj)
+    variant["model"].coef_ = variant["model"].coef_ * 0.5
+    variant["seuil"] = 0.5
+    joblib.dump(variant, tmp_path / "v2.pkl")
+    return tmp_path
+
+
+def wait_ready(registry, version, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if registry.get(version)["status"] in ("ready", "failed"):
+            return registry.get(version)
+        time.sleep(0.01)
+    raise TimeoutError(version)
+
+
+def test_registry_scans_and_activates_in_background(model_dir):
+    registry = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    v1 = registry.active.version
+    v2 = artifact_version(model_dir / "v2.pkl")
+    assert {e["version"] for e in registry.list()} == {v1, v2}
+
+    in_flight = registry.active
+    assert registry.activate(v2) == "loading"
+    assert wait_ready(registry, v2)["status"] == "ready"
+
+    assert registry.active.version == v2
+    assert registry.active.threshold == 0.5
+    # une requête en cours garde le modèle avec lequel elle a commencé
+    assert in_flight.version == v1
+
+    previous = registry.rollback()
+    assert previous.version == v1
+    assert registry.active.version == v1
+    with pytest.raises(LookupError):
+        registry.rollback()
+
+
+def test_registry_rejects_incompatible_features(model_dir):
+    obj = joblib.load(model_dir / "v1.pkl")
+    obj["model"].feature_names_in_ = obj["model"].feature_names_in_[::-1].copy()
+    joblib.dump(obj, model_dir / "bad.pkl")
+
+    registry = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    bad = artifact_version(model_dir / "bad.pkl")
+    assert registry.activate(bad, background=False) == "failed"
+    assert "Feature layout" in registry.get(bad)["error"]
+    assert registry.active.version == artifact_version(model_dir / "v1.pkl")
+
+
+def test_admin_endpoints_swap_model_and_log_version(model_dir, monkeypatch):
+    registry = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    registry.on_activate(lambda m: main.prediction_cache.bind_version(m.version))
+    monkeypatch.setattr(main, "registry", registry)
+    logged = []
+
+    async def fake_log(reqs, res):
+        logged.extend(res)
+
+    monkeypatch.setattr(main, "log_predictions_async", fake_log)
+    monkeypatch.setattr(main, "model_sync", None)  # un seul worker: bascule locale
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    client = TestClient(main.app, headers=ADMIN)
+    v1 = registry.active.version
+    v2 = artifact_version(model_dir / "v2.pkl")
+
+    assert len(client.get("/admin/models").json()) == 2
+    assert client.post("/admin/models/unknown/activate").status_code == 404
+
+    r = client.post(f"/admin/models/{v2}/activate", params={"wait": True})
+    assert r.status_code == 200
+    assert r.json()["active"] is True
+    assert client.get("/metadata").json()["model_version"] == v2
+
+    features = {f: 1.0 for f in main.FEATURES_ORDER}
+    assert client.post("/predict", json={"features": features}).json()["threshold"] == 0.5
+    assert logged[-1]["model_version"] == v2
+
+    r = client.post("/admin/models/rollback")
+    assert r.status_code == 200
+    assert r.json()["version"] == v1
+    client.post("/predict", json={"features": features})
+    assert logged[-1]["model_version"] == v1
+    assert client.post("/admin/models/rollback").status_code == 409
+
+
+def test_admin_endpoints_require_the_token(model_dir, monkeypatch):
+    registry = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    monkeypatch.setattr(main, "registry", registry)
+    v2 = artifact_version(model_dir / "v2.pkl")
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.post(f"/admin/models/{v2}/activate", headers=ADMIN).status_code == 403
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    r = client.post(f"/admin/models/{v2}/activate")
+    assert r.status_code == 401 and r.headers["www-authenticate"] == "Bearer"
+    wrong = {"Authorization": "Bearer nope"}
+    assert client.post("/admin/models/rollback", headers=wrong).status_code == 401
+    assert registry.active.version == artifact_version(model_dir / "v1.pkl")
+    assert client.get("/admin/models").status_code == 200  # lecture libre
+
+
+def test_activation_and_rollback_reach_every_worker(model_dir, monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    metadata.create_all(engine)
+    # Deux workers: registres distincts, même base
+    serving = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    other = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    other_sync = ModelSync(other, engine)
+    monkeypatch.setattr(main, "registry", serving)
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "model_sync", ModelSync(serving, engine))
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    client = TestClient(main.app, headers=ADMIN)
+    v1 = serving.active.version
+    v2 = artifact_version(model_dir / "v2.pkl")
+
+    assert client.post("/admin/models/rollback").status_code == 409  # rien de publié
+    assert client.post(f"/admin/models/{v2}/activate", params={"wait": True}).status_code == 200
+    assert target_version(engine) == v2
+    assert other.active.version == v1
+    other_sync.sync(wait=True)
+    assert other.active.version == v2
+
+    r = client.post("/admin/models/rollback")
+    assert r.status_code == 200 and r.json()["version"] == v1
+    assert target_version(engine) == v1
+    other_sync.sync(wait=True)
+    assert other.active.version == v1
+    assert client.post("/admin/models/rollback").status_code == 409
+
+    # Un worker qui redémarre reprend la version publiée
+    client.post(f"/admin/models/{v2}/activate", params={"wait": True})
+    restarted = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    ModelSync(restarted, engine).sync(wait=True)
+    assert restarted.active.version == v2
+
+
+def test_scan_reuses_hashes_of_unchanged_artifacts(model_dir, monkeypatch):
+    registry = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    hashed = []
+    monkeypatch.setattr("api.registry.artifact_version", lambda p: hashed.append(p) or "f" * 12)
+    registry.scan()
+    assert hashed == []
+    shutil.copy(model_dir / "v2.pkl", model_dir / "v3.pkl")
+    registry.scan()
+    assert hashed == [model_dir / "v3.pkl"]
+
+
+def test_model_arrays_are_memory_mapped(model_dir, monkeypatch):
+    registry = ModelRegistry(model_dir, model_dir / "v1.pkl")
+    monkeypatch.setattr(main, "registry", registry)  # /admin/memory lit main.registry
+    client = TestClient(main.app)
+    mem = client.get("/admin/memory").json()
+    assert mem["rss"] > 0
+    assert mem["model_version"] == registry.active.version
+    assert mem["model_mapped_bytes"] > 0
+
+    # les tableaux projetés restent en lecture seule, y compris dans le prédicteur compilé
+    m = registry.active
+    assert not m.model.coef_.flags.writeable
+    assert not m.predictor.preprocessor.mean.flags.writeable
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import api.main as main
+from api.score_file import main as score_file_cli, score_file
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+DATA = main.ROOT / "data" / "dataset_clean.csv"
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return pd.read_csv(DATA)
+
+
+def expected_probas(df: pd.DataFrame) -> np.ndarray:
+    m = main.registry.active
+    return m.predictor.predict_proba(df[m.features_order].to_numpy(dtype=float))
+
+
+def test_csv_chunks_match_vectorized_scoring(tmp_path, dataset):
+    out = tmp_path / "scores.csv"
+    seen = []
+    summary = score_file(main.registry.active, DATA, out, chunk_size=200, progress=lambda s: seen.append(s.rows))
+
+    assert summary.rows == summary.rows_scored == len(dataset)
+    assert summary.chunks == 8 and seen == [min(200 * (i + 1), len(dataset)) for i in range(8)]
+    assert summary.rows_per_sec > 0
+    assert not (tmp_path / "scores.csv.part").exists()
+
+    got = pd.read_csv(out)
+    assert list(got.columns) == [*dataset.columns, "probability", "prediction"]
+    pd.testing.assert_frame_equal(got[dataset.columns], dataset)
+    np.testing.assert_allclose(got["probability"], expected_probas(dataset), rtol=0, atol=1e-15)
+    assert (got["prediction"] == (got["probability"] >= main.registry.active.threshold)).all()
+
+
+def test_invalid_rows_are_kept_without_score(tmp_path, dataset):
+    df = dataset.head(300).copy()
+    df["age"] = df["age"].astype(object)
+    df.loc[250, "age"] = "abc"
+    df["revenu_mensuel"] = df["revenu_mensuel"].astype("Int64")
+    df.loc[260, "revenu_mensuel"] = pd.NA
+    src = tmp_path / "in.csv"
+    df.to_csv(src, index=False)
+
+    out = tmp_path / "scores.csv"
+    summary = score_file(main.registry.active, src, out, chunk_size=200)
+    assert summary.rows == 300 and summary.rows_skipped == 2
+
+    got = pd.read_csv(out)
+    assert got.loc[[250, 260], ["probability", "prediction"]].isna().all().all()
+    ok = got["probability"].notna().to_numpy()
+    np.testing.assert_allclose(got.loc[ok, "probability"], expected_probas(dataset.head(300)[ok]), rtol=0, atol=1e-15)
+
+    # Parquet: colonne entière dans le 1er bloc, valeurs manquantes dans le 2e -> nulls, même schéma
+    df.loc[250, "age"] = 30
+    df.to_csv(src, index=False)
+    out = tmp_path / "scores.parquet"
+    assert score_file(main.registry.active, src, out, chunk_size=200).rows_skipped == 1
+    assert str(pq.read_schema(out).field("revenu_mensuel").type) == "int64"
+    got = pd.read_parquet(out)
+    assert got["revenu_mensuel"].isna().sum() == 1 and got["prediction"].isna().sum() == 1
+
+
+def test_parquet_input_with_workers(tmp_path, dataset):
+    src = tmp_path / "in.parquet"
+    dataset.to_parquet(src)
+    out = tmp_path / "scores.csv"
+    summary = score_file_cli([str(src), str(out), "--chunk-size", "500", "--workers", "2", "--quiet"])
+    assert summary.rows_scored == len(dataset) and summary.chunks == 3
+    np.testing.assert_allclose(pd.read_csv(out)["probability"], expected_probas(dataset), rtol=0, atol=1e-15)
+
+
+def test_missing_feature_column_leaves_no_output(tmp_path, dataset):
+    src = tmp_path / "in.csv"
+    dataset.drop(columns=["age"]).head(10).to_csv(src, index=False)
+    out = tmp_path / "scores.csv"
+    with pytest.raises(ValueError, match="age"):
+        score_file(main.registry.active, src, out)
+    assert not out.exists() and not (tmp_path / "scores.csv.part").exists()
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import api.main as main
+import api.scoring_job as scoring_job
+from api.scoring_job import run_scoring_job, scores_copy_buffer, select_features_sql
+
+ADMIN = {"Authorization": "Bearer s3cret"}
+
+# Base PostgreSQL jetable (le schéma y est supprimé puis recréé)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_select_binds_feature_names_in_model_order():
+    sql, params = select_features_sql(["age", "poste_Représentant Commercial"], incremental=True)
+    assert "ARRAY[(features->>:f0)::float8, (features->>:f1)::float8]" in sql
+    assert "updated_at >= :since" in sql
+    assert params == {"f0": "age", "f1": "poste_Représentant Commercial"}
+
+    sql, _ = select_features_sql(["age"], incremental=False)
+    assert "WHERE" not in sql
+
+
+def test_copy_buffer_keeps_full_float_precision():
+    buf = scores_copy_buffer(["e1", "e2"], [0.1 + 0.2, 0.9], [0, 1], "abc123", 0.76, "run-1")
+    rows = [line.split("\t") for line in buf.getvalue().splitlines()]
+    assert rows[0] == ["e1", "abc123", repr(0.1 + 0.2), "0", "0.76", "run-1"]
+    assert float(rows[0][2]) == 0.1 + 0.2
+    assert rows[1][3] == "1"
+
+
+def test_scoring_job_endpoint_runs_one_job_at_a_time(monkeypatch):
+    release = threading.Event()
+
+    def fake_run(engine, m, mode, chunk_size, workers, run=None, progress=None):
+        release.wait(5)
+        run.rows_scored = 3
+        run.status = "succeeded"
+        return run
+
+    monkeypatch.setattr(scoring_job, "run_scoring_job", fake_run)
+    monkeypatch.setattr(main, "scoring_jobs", scoring_job.ScoringJobRunner(engine=None))
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    client = TestClient(main.app)
+
+    r = client.post("/jobs/score-employees", json={"mode": "incremental", "chunk_size": 100}, headers=ADMIN)
+    assert r.status_code == 202
+    run = r.json()
+    assert run["status"] == "running"
+    assert run["mode"] == "incremental"
+    assert run["model_version"] == main.registry.active.version
+
+    assert client.post("/jobs/score-employees", json={}, headers=ADMIN).status_code == 409
+
+    release.set()
+    for _ in range(100):
+        status = client.get(f"/jobs/score-employees/{run['run_id']}").json()
+        if status["status"] != "running":
+            break
+        time.sleep(0.02)
+    assert status["status"] == "succeeded"
+    assert status["rows_scored"] == 3
+
+    assert client.get("/jobs/score-employees/nope").status_code == 404
+    assert client.post("/jobs/score-employees", json={"mode": "bogus"}, headers=ADMIN).status_code == 422
+
+
+def test_scoring_job_endpoint_requires_the_admin_token_and_caps_workers(monkeypatch):
+    started = []
+    monkeypatch.setattr(main, "scoring_jobs", scoring_job.ScoringJobRunner(engine=None))
+    monkeypatch.setattr(main.scoring_jobs, "start", lambda *args: started.append(args))
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.post("/jobs/score-employees", json={}, headers=ADMIN).status_code == 403
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/jobs/score-employees", json={}).status_code == 401
+    assert client.post("/jobs/score-employees", json={}, headers={"Authorization": "Bearer nope"}).status_code == 401
+
+    too_many = {"workers": main.MAX_SCORING_JOB_WORKERS + 1}
+    assert client.post("/jobs/score-employees", json=too_many, headers=ADMIN).status_code == 422
+    assert started == []
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (disposable PostgreSQL database)")
+def test_incremental_run_rereads_rows_committed_after_the_scan():
+    from db.create_db import SCHEMA_PATH
+
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA_PATH.read_text(encoding="utf-8")))
+    m = main.registry.active
+    features = json.dumps({f: 1.0 for f in m.features_order})
+    insert_employee = text("INSERT INTO employees (features, updated_at) VALUES (CAST(:f AS jsonb), :ts)")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO employees (features) VALUES (CAST(:f AS jsonb))"), {"f": features})
+
+    first = run_scoring_job(engine, m, "incremental", watermark_margin=timedelta(seconds=60))
+    assert first.rows_scored == 1
+    assert first.watermark < first.started_at
+
+    # Transaction ouverte avant le run (updated_at = son NOW()), validée après sa lecture
+    with engine.begin() as conn:
+        conn.execute(insert_employee, {"f": features, "ts": first.started_at - timedelta(seconds=30)})
+    second = run_scoring_job(engine, m, "incremental", watermark_margin=timedelta(seconds=60))
+    assert second.since == first.watermark
+    assert second.rows_scored >= 1
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM employee_scores")).scalar() == 2
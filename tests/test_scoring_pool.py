@@ -0,0 +1,72 @@
+import os
+import signal
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.scoring_pool import ScoringPool
+
+
+@pytest.fixture(scope="module")
+def pool():
+    p = ScoringPool(1, main.registry.active, min_rows=100)
+    p.start()
+    yield p
+    p.shutdown()
+
+
+def test_pool_matches_in_process_scoring(pool):
+    m = main.registry.active
+    X = np.random.default_rng(0).normal(size=(1000, main.N_FEATURES))
+    expected = m.predictor.predict_proba(X)
+    got = pool.predict_proba(m, X)
+    # Découpage en blocs: au plus quelques ulp d'écart avec un seul appel
+    np.testing.assert_allclose(got, expected, rtol=0, atol=1e-12)
+
+    stats = pool.stats()
+    assert stats["healthy"] and stats["alive"] == 1
+    assert stats["pending_blocks"] == 0
+    assert stats["rows"] >= 1000
+    (worker,) = stats["per_worker"].values()
+    assert worker["rows"] >= 1000 and worker["rows_per_sec"] > 0
+
+
+def test_pool_recovers_from_dead_worker(pool):
+    m = main.registry.active
+    pid = int(next(iter(pool.stats()["per_worker"])))
+    os.kill(pid, signal.SIGKILL)
+
+    X = np.random.default_rng(1).normal(size=(200, main.N_FEATURES))
+    expected = m.predictor.predict_proba(X)
+    # Le lot en cours est scoré en process, le pool est recréé pour les suivants
+    for _ in range(2):
+        np.testing.assert_allclose(pool.predict_proba(m, X), expected, rtol=0, atol=1e-12)
+    stats = pool.stats()
+    assert stats["fallbacks"] == 1 and stats["restarts"] == 1
+
+
+def test_small_batches_stay_in_process(monkeypatch):
+    calls = []
+
+    class FakePool:
+        def should_offload(self, n_rows):
+            return n_rows >= 3
+
+        def predict_proba(self, m, X):
+            calls.append(X.shape[0])
+            return m.predictor.predict_proba(X)
+
+    monkeypatch.setattr(main, "scoring_pool", FakePool())
+    X = np.zeros((2, main.N_FEATURES))
+    main.score_matrix(X)
+    main.score_matrix(np.zeros((5, main.N_FEATURES)))
+    assert calls == [5]
+
+
+def test_scoring_pool_endpoint_when_disabled(monkeypatch):
+    monkeypatch.setattr(main, "scoring_pool", None)
+    r = TestClient(main.app).get("/admin/scoring-pool")
+    assert r.status_code == 200
+    assert r.json()["enabled"] is False
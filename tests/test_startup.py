@@ -0,0 +1,118 @@
+import json
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.artifacts import main as artifacts_cli
+from api.registry import ModelRegistry, artifact_version, read_schema, schema_path, write_schema
+from api.startup import StartupReport
+from benchmarks.bench_startup import import_times
+
+
+def test_import_does_not_load_the_model(tmp_path):
+    path = tmp_path / "v1.pkl"
+    shutil.copy(main.MODEL_PATH, path)
+    artifacts_cli(["schema", str(path)])  # étape d'export / build de l'image
+    res = import_times(repeat=1, MODEL_DIR=str(tmp_path), MODEL_PATH=str(path))
+    assert not res["sklearn_imported"]
+
+
+def test_schema_file_defers_the_model_load(tmp_path):
+    path = tmp_path / "v1.pkl"
+    shutil.copy(main.MODEL_PATH, path)
+
+    # Sans fichier de schéma: chargé tout de suite, et rien n'est écrit dans MODEL_DIR
+    eager = ModelRegistry(tmp_path, path, lazy=True)
+    assert eager.ready
+    assert not schema_path(path).exists()
+
+    assert write_schema(path) == schema_path(path)
+    assert read_schema(path) == main.FEATURES_ORDER
+
+    lazy = ModelRegistry(tmp_path, path, lazy=True)
+    assert not lazy.ready and lazy.features_order == main.FEATURES_ORDER
+    seen = []
+    lazy.on_activate(lambda m: seen.append(m.version))
+    assert lazy.active.version == artifact_version(path)  # premier accès: chargement
+    assert lazy.ready and lazy.warmup_seconds is not None
+    assert seen == [artifact_version(path)]
+
+    # Schéma d'un autre artefact: ignoré
+    schema_path(path).write_text(json.dumps({"version": "0" * 12, "features_order": ["x"]}))
+    assert read_schema(path) is None
+
+
+def test_readiness_follows_the_model_and_the_shutdown(monkeypatch, tmp_path):
+    path = tmp_path / "v1.pkl"
+    shutil.copy(main.MODEL_PATH, path)
+    write_schema(path)
+    registry = ModelRegistry(tmp_path, path, lazy=True)
+    monkeypatch.setattr(main, "registry", registry)
+    monkeypatch.setattr(main, "startup", StartupReport(import_seconds=0.5))
+    client = TestClient(main.app)
+
+    assert client.get("/health/live").json()["status"] == "alive"
+    r = client.get("/health/ready")
+    assert r.status_code == 503
+    assert r.json()["ready"] is False and r.json()["model_version"] is None
+
+    registry.start()
+    r = client.get("/health/ready")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["model_version"] == registry.active.version
+    assert body["import_seconds"] == 0.5 and body["database"] == "not_checked"
+
+    main.startup.stopping = True
+    assert client.get("/health/ready").status_code == 503
+
+
+@pytest.mark.parametrize("db_up", [True, False])
+def test_lifespan_loads_warms_up_and_preopens_the_pools(monkeypatch, db_up):
+    opened = []
+
+    def preopen(engine, n):
+        if not db_up:
+            raise ConnectionError("database unreachable")
+        opened.append(("sync", n))
+        return n
+
+    async def preopen_async(engine, n):
+        if not db_up:
+            raise ConnectionError("database unreachable")
+        opened.append(("async", n))
+        return n
+
+    def sync(wait=False):
+        if not db_up:
+            raise ConnectionError("database unreachable")
+        opened.append(("model_sync", wait))
+
+    monkeypatch.setattr(main, "preopen_pool", preopen)
+    monkeypatch.setattr(main, "preopen_async_pool", preopen_async)
+    monkeypatch.setattr(main.model_sync, "sync", sync)
+    monkeypatch.setattr(main, "DB_POOL_PREOPEN", 2)
+    monkeypatch.setattr(main, "startup", StartupReport(import_seconds=0.5))
+
+    with TestClient(main.app) as client:
+        r = client.get("/health/ready")
+        assert r.status_code == 200  # base injoignable: prêt quand même (mode dégradé)
+        body = r.json()
+    assert {"model_load", "request_warmup", "db_pool"} <= set(body["phases"])
+    assert body["startup_seconds"] >= body["phases"]["request_warmup"]
+    if db_up:
+        assert sorted(opened) == [("async", 2), ("model_sync", True), ("sync", 2)]
+        assert body["database"] == "ready" and body["errors"] == {}
+    else:
+        assert body["database"] == "unavailable"
+        assert "ConnectionError" in body["errors"]["db_pool"]
+        assert "ConnectionError" in body["errors"]["model_sync"]
+    assert main.startup.stopping
+
+
+def test_export_writes_the_schema_of_the_new_artifact(tmp_path):
+    dst = tmp_path / "v2.pkl"
+    artifacts_cli(["export", str(main.MODEL_PATH), str(dst)])
+    assert read_schema(dst) == main.FEATURES_ORDER
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import api.main as main
+from api.db import metadata, prediction_sweeps
+
+
+@pytest.fixture()
+def logged(monkeypatch):
+    rows = []
+
+    async def fake_log(row):
+        rows.append(row)
+
+    monkeypatch.setattr(main, "log_sweep_async", fake_log)
+    return rows
+
+
+def test_curve_matches_row_by_row_scoring(logged, make_valid_features):
+    base = make_valid_features(0.4)
+    r = TestClient(main.app).post("/predict/sweep", json={
+        "features": base,
+        "axes": [{"feature": "revenu_mensuel", "start": 1000, "stop": 20000, "steps": 20}],
+    })
+    assert r.status_code == 200
+    body = r.json()
+    (axis,) = body["axes"]
+    assert axis["feature"] == "revenu_mensuel" and len(axis["values"]) == 20
+    assert axis["values"][0] == 1000 and axis["values"][-1] == 20000
+
+    predictor = main.registry.active.predictor
+    expected = [predictor.predict_one([{**base, "revenu_mensuel": v}[f] for f in main.FEATURES_ORDER]) for v in axis["values"]]
+    np.testing.assert_allclose(body["probabilities"], expected, rtol=0, atol=1e-12)
+    assert body["base_probability"] == pytest.approx(predictor.predict_one([base[f] for f in main.FEATURES_ORDER]), abs=1e-12)
+
+    # Une seule ligne de log, résumé de la courbe
+    (row,) = logged
+    assert row["sweep_id"] == body["sweep_id"] and row["n_points"] == 20
+    assert row["min_probability"] == min(body["probabilities"]) and row["max_probability"] == max(body["probabilities"])
+    assert row["axes"] == body["axes"] and row["base_features"] == base
+
+
+def test_surface_layout(logged, make_valid_features):
+    base = make_valid_features(0.2)
+    r = TestClient(main.app).post("/predict/sweep", json={
+        "features": base,
+        "axes": [
+            {"feature": "age", "values": [25, 40, 55]},
+            {"feature": "annees_depuis_la_derniere_promotion", "start": 0, "stop": 10, "steps": 6},
+        ],
+    })
+    assert r.status_code == 200
+    surface = np.array(r.json()["probabilities"])
+    assert surface.shape == (3, 6)
+    predictor = main.registry.active.predictor
+    row = {**base, "age": 55.0, "annees_depuis_la_derniere_promotion": 4.0}
+    assert surface[2, 2] == pytest.approx(predictor.predict_one([row[f] for f in main.FEATURES_ORDER]), abs=1e-12)
+    assert logged[-1]["n_points"] == 18
+
+
+@pytest.mark.parametrize("axes, status", [
+    ([{"feature": "unknown", "values": [1]}], 422),
+    ([{"feature": "age", "values": [1]}, {"feature": "age", "values": [2]}], 422),
+    ([{"feature": "age", "start": 1}], 422),
+    ([{"feature": "age", "values": [1, 2]}] * 3, 422),
+    ([{"feature": "age", "start": 18, "stop": 60, "steps": 500},
+      {"feature": "revenu_mensuel", "start": 1000, "stop": 20000, "steps": 500}], 413),
+])
+def test_invalid_sweeps(logged, axes, status, make_valid_features):
+    r = TestClient(main.app).post("/predict/sweep", json={"features": make_valid_features(0.5), "axes": axes})
+    assert r.status_code == status
+    assert logged == []
+
+
+def test_sweep_summary_is_written(tmp_path, monkeypatch, make_valid_features):
+    path = tmp_path / "log.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    metadata.create_all(sync_engine, tables=[prediction_sweeps])
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    monkeypatch.setattr(main, "AsyncSessionLocal", async_sessionmaker(async_engine, expire_on_commit=False))
+
+    r = TestClient(main.app).post("/predict/sweep", json={
+        "features": make_valid_features(0.3),
+        "axes": [{"feature": "distance_domicile_travail", "values": [1, 10, 30]}],
+    })
+    assert r.status_code == 200
+    with sync_engine.connect() as conn:
+        rows = conn.execute(select(prediction_sweeps)).mappings().all()
+    assert len(rows) == 1
+    assert rows[0]["n_points"] == 3
+    assert rows[0]["axes"] == [{"feature": "distance_domicile_travail", "values": [1.0, 10.0, 30.0]}]
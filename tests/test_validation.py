@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.validation import FeatureValidator, build_features_model, feature_ranges_from_csv
+
+
+pytestmark = pytest.mark.usefixtures("mock_db")
+
+
+@pytest.fixture()
+def client():
+    return TestClient(main.app)
+
+
+def test_generated_model_follows_features_order():
+    model = build_features_model(["b", "a c"])
+    obj = model.model_validate({"a c": 2, "b": 1.5})
+    assert list(vars(obj).values()) == [1.5, 2.0]
+    assert set(model.model_json_schema()["properties"]) == {"b", "a c"}
+
+
+@pytest.mark.parametrize("value", [None, "1.5", True, float("nan"), float("inf")])
+def test_rows_require_strict_finite_floats(value):
+    v = FeatureValidator(["x", "y"])
+    values, err = v.row({"x": value, "y": 0})
+    assert values is None
+    assert err == "Invalid values for features: ['x']"
+
+
+def test_error_summary_lists_every_problem():
+    v = FeatureValidator(["x", "y", "z"])
+    _, err = v.row({"y": "abc", "z": 1, "extra": 0})
+    assert err == "Missing features: ['x']; Invalid values for features: ['y']; Unexpected features: ['extra']"
+    _, err = v.vector([1.0, None, 2.0])
+    assert err == "Invalid values for features: ['y']"
+    _, err = v.vector([1.0])
+    assert err.startswith("Expected 3 values")
+
+
+def test_optional_ranges_from_training_csv():
+    ranges = feature_ranges_from_csv(main.ROOT / "data" / "dataset_clean.csv", main.FEATURES_ORDER)
+    assert set(ranges) == set(main.FEATURES_ORDER)
+    lo, hi = ranges["age"]
+    v = FeatureValidator(main.FEATURES_ORDER, ranges)
+
+    row = {f: ranges[f][0] for f in main.FEATURES_ORDER}
+    assert v.row(row)[1] is None
+    row["age"] = hi + 1
+    assert v.row(row)[1] == f"Out of range values for features: ['age (<= {hi})']"
+
+    # même contrôle, vectorisé, pour les matrices (/predict/vectors, Arrow)
+    X = np.array([[ranges[f][0] for f in main.FEATURES_ORDER]] * 2)
+    X[1, main.FEATURES_ORDER.index("age")] = lo - 1
+    assert v.matrix_errors(X, {}) == {1: f"Out of range values for features: ['age (>= {lo})']"}
+
+
+def test_predict_keeps_one_line_error_detail(client, make_valid_features):
+    features = make_valid_features(0.0)
+    del features[main.FEATURES_ORDER[0]]
+    features["Age"] = 30.0
+    features[main.FEATURES_ORDER[1]] = "abc"
+
+    r = client.post("/predict", json={"features": features})
+    assert r.status_code == 422
+    body = r.json()
+    assert body["detail"] == (
+        f"Missing features: ['{main.FEATURES_ORDER[0]}']; "
+        f"Invalid values for features: ['{main.FEATURES_ORDER[1]}']; "
+        "Unexpected features: ['Age']"
+    )
+    assert {e["type"] for e in body["errors"]} == {"missing", "float_type", "extra_forbidden"}
+
+
+def test_predict_logs_features_by_name(client, monkeypatch, make_valid_features):
+    logged = []
+
+    async def fake_log(request_rows, result_rows):
+        logged.extend(request_rows)
+
+    monkeypatch.setattr(main, "log_predictions_async", fake_log)
+    features = make_valid_features(1.0)
+    assert client.post("/predict", json={"features": features}).status_code == 200
+    assert logged[0]["features"] == [features[f] for f in main.FEATURES_ORDER]